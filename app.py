@@ -1,27 +1,72 @@
-import duckdb
+import os
+from time import perf_counter
 import flask
 from flask import request
+from src.db.pool import get_pool
+from src.tiles.pmtiles import PMTilesReader
+from src.tiles.poi_tiles import PoiTileServer, stale_reason
+from src.utils.logger import logging, set_trace_id
+from src.utils.metrics import (
+    REGISTRY, CONTENT_TYPE, HTTP_REQUEST_SECONDS, DUCKDB_QUERY_SECONDS, TILE_RENDER_SECONDS, TILE_BYTES
+)
 
 # Initialize Flask app
 app = flask.Flask(__name__)
 
-# Setup a global DuckDB connection with spatial extension loaded
-# Connect to a persistent database file with the geometry data
+# Setup a global read-only DuckDB pool with spatial extension loaded
+# Connect to a persistent database file with the geometry data (override with TILES_DB)
+TILES_DB = os.environ.get("TILES_DB", os.path.join("data", "tiles.db"))
 config = {"allow_unsigned_extensions": "true"}
-con = duckdb.connect(r"data\tiles.db", True, config)
+pool = get_pool(
+    TILES_DB,
+    read_only=True,
+    size=int(os.environ.get("DUCKDB_POOL_SIZE", 8)),
+    threads=int(os.environ["DUCKDB_THREADS"]) if os.environ.get("DUCKDB_THREADS") else None,
+    memory_limit=os.environ.get("DUCKDB_MEMORY_LIMIT"),
+    extensions=("spatial",),
+    config=config,
+)
 
 # Install spatial from wherever you built it
-#con.execute("INSTALL spatial from <some path>")
-
-con.execute("load spatial")
-
-# Tile endpoint to serve vector tiles
-@app.route('/tiles/<int:z>/<int:x>/<int:y>.pbf')
-def get_tile(z, x, y):
-    # Get optional filters from URL query string (?class=...&subtype=...)
-    class_filter   = request.args.get('class')
-    subtype_filter = request.args.get('subtype')
-
+#pool.execute("INSTALL spatial from <some path>")
+
+# Pre-built PMTiles archive (e.g. from `python -m src.tiles.pmtiles extract`), served from a memory map
+PMTILES_PATH = os.environ.get("PMTILES_PATH", os.path.join("data", "india.pmtiles"))
+pmtiles = PMTilesReader(PMTILES_PATH) if os.path.exists(PMTILES_PATH) else None
+
+# Clustered Foursquare POI tiles, built beforehand with `python -m src.tiles.poi_tiles --if-stale`.
+# Workers only open an up-to-date database; a missing or stale one disables the /poi routes.
+POI_TILES_DB = os.environ.get("POI_TILES_DB", os.path.join("data", "poi_tiles.db"))
+POI_DATA_PATH = os.environ.get("POI_DATA_PATH", os.path.join("data", "output.geoparquet"))
+poi_tiles = None
+poi_tiles_error = stale_reason(POI_DATA_PATH, POI_TILES_DB)
+if poi_tiles_error is None:
+    try:
+        poi_tiles = PoiTileServer(POI_TILES_DB)
+    except Exception as e:
+        poi_tiles_error = f"{POI_TILES_DB} could not be opened: {e}"
+if poi_tiles_error is not None:
+    logging.warning(f"POI tiles disabled: {poi_tiles_error}")
+
+@app.before_request
+def start_trace():
+    # Reuse the caller's request id when given so logs can be joined across services
+    flask.g.trace_id = set_trace_id(request.headers.get("X-Request-ID"))
+    flask.g.request_start = perf_counter()
+
+@app.after_request
+def finish_trace(response):
+    endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+    HTTP_REQUEST_SECONDS.observe(perf_counter() - flask.g.request_start, app="tiles", endpoint=endpoint)
+    response.headers["X-Request-ID"] = flask.g.trace_id
+    return response
+
+@app.route('/metrics')
+def metrics():
+    return flask.Response(REGISTRY.render(), content_type=CONTENT_TYPE)
+
+def render_tile(cur, z, x, y, class_filter=None, subtype_filter=None) -> bytes:
+    """Render one MVT tile from t1, optionally filtered by class and subtype."""
     # Start building WHERE conditions and parameters
     where_conditions = [
         "ST_Intersects(geometry, ST_TileEnvelope($1, $2, $3))"
@@ -30,9 +75,11 @@ def get_tile(z, x, y):
 
     # Add filters only if provided
     if class_filter:
-        where_conditions.append(f"class = '{class_filter}'")
+        params.append(class_filter)
+        where_conditions.append(f"class = ${len(params)}")
     if subtype_filter:
-        where_conditions.append(f"subtype = '{subtype_filter}'")
+        params.append(subtype_filter)
+        where_conditions.append(f"subtype = ${len(params)}")
 
     # Join all WHERE parts
     where_clause = " AND ".join(where_conditions)
@@ -52,18 +99,60 @@ def get_tile(z, x, y):
         WHERE {where_clause}
     """
 
-    with con.cursor() as local_con:
+    tile_blob = cur.execute(query, params).fetchone()
+    return tile_blob[0] if tile_blob and tile_blob[0] else b''
+
+# Tile endpoint to serve vector tiles
+@app.route('/tiles/<int:z>/<int:x>/<int:y>.pbf')
+def get_tile(z, x, y):
+    # Get optional filters from URL query string (?class=...&subtype=...)
+    class_filter   = request.args.get('class')
+    subtype_filter = request.args.get('subtype')
+
+    with pool.cursor() as local_con:
         try:
-            tile_blob = local_con.execute(query, params).fetchone()
-            tile = tile_blob[0] if tile_blob and tile_blob[0] else b''
+            start = perf_counter()
+            tile = render_tile(local_con, z, x, y, class_filter, subtype_filter)
+            TILE_RENDER_SECONDS.observe(perf_counter() - start, layer="buildings")
+            TILE_BYTES.observe(len(tile), layer="buildings")
             return flask.Response(tile, mimetype='application/x-protobuf')
         except Exception as e:
-            # Print to terminal for debugging
-            print(f"Tile error at {z}/{x}/{y}: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            logging.exception(f"Tile error at {z}/{x}/{y}")
             return f"Error generating tile: {str(e)}", 500
 
+# POI tiles: clusters with count and dominant category below the point zoom, points above it
+@app.route('/poi/<int:z>/<int:x>/<int:y>.pbf')
+def get_poi_tile(z, x, y):
+    if poi_tiles is None:
+        return f"POI tiles are disabled: {poi_tiles_error}", 404
+    try:
+        start = perf_counter()
+        tile = poi_tiles.tile(z, x, y)
+        TILE_RENDER_SECONDS.observe(perf_counter() - start, layer="pois")
+        TILE_BYTES.observe(len(tile), layer="pois")
+        return flask.Response(tile, mimetype='application/x-protobuf')
+    except Exception as e:
+        logging.exception(f"POI tile error at {z}/{x}/{y}")
+        return f"Error generating tile: {str(e)}", 500
+
+# Tiles straight from the PMTiles archive: a directory lookup and a slice of the mapped file
+@app.route('/<int:z>/<int:x>/<int:y>')
+def get_pmtile(z, x, y):
+    if pmtiles is None:
+        return f"No PMTiles archive at {PMTILES_PATH}", 404
+    view = pmtiles.get_tile_view(z, x, y)
+    if view is None:
+        return "", 204
+    # WSGI servers only accept bytes, so this is the one copy, out of the page cache
+    with view:
+        tile = view.tobytes()
+    TILE_BYTES.observe(len(tile), layer="pmtiles")
+    response = flask.Response(tile, mimetype=pmtiles.mimetype)
+    # Payloads are stored compressed; pass them through as-is
+    if pmtiles.content_encoding:
+        response.headers["Content-Encoding"] = pmtiles.content_encoding
+    return response
+
 @app.route('/stats')
 def get_stats():
     # Get optional filters from query string (?class=...&subtype=...)
@@ -94,9 +183,10 @@ def get_stats():
         {where_clause}
     """
 
-    with con.cursor() as cur:
+    with pool.cursor() as cur:
         try:
-            result = cur.execute(query, params).fetchone()
+            with DUCKDB_QUERY_SECONDS.time(source="stats"):
+                result = cur.execute(query, params).fetchone()
             if result:
                 count, avg_height = result
                 response = {
@@ -109,9 +199,7 @@ def get_stats():
             return flask.jsonify(response), 200
 
         except Exception as e:
-            print(f"Stats error: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            logging.exception("Stats error")
             return flask.jsonify({"error": str(e)}), 500
         
 # HTML content for the index page
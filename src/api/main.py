@@ -1,13 +1,45 @@
-from fastapi import FastAPI, Request
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, Request, Query
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from src.langchain.pipeline import initiate_chat_bot
+from src.db.country_build import available_countries
+from src.api.results import ResultStore, RESULTS_DIR
 from langchain_core.prompts import ChatPromptTemplate
+from src.utils.logger import set_trace_id
+from src.utils.metrics import REGISTRY, CONTENT_TYPE, HTTP_REQUEST_SECONDS
+from time import perf_counter
+import importlib.util
 import os
+import threading
 
 app = FastAPI(title="Foursquare AI Bot API", description="API for querying POI data using DuckDB and LangChain.")
-BOT = initiate_chat_bot()
+DEFAULT_COUNTRY = os.environ.get("DEFAULT_COUNTRY", "IN").upper()
+BOTS = {DEFAULT_COUNTRY: initiate_chat_bot(DEFAULT_COUNTRY)}
+# One lock per country: loading a new country's bot does not hold up requests for the others
+BOT_LOCKS: dict[str, threading.Lock] = {}
+BOT_LOCKS_LOCK = threading.Lock()
+# Results larger than one page are spilled to parquet and fetched by cursor
+RESULTS = ResultStore(
+    directory=os.environ.get("RESULTS_DIR", RESULTS_DIR),
+    ttl_seconds=float(os.environ.get("RESULTS_TTL_SECONDS", 900)),
+    page_size=int(os.environ.get("RESULTS_PAGE_SIZE", 100)),
+)
+
+
+def get_bot(country: str | None):
+    """The bot for an ISO country code, built on first request for that country."""
+    country = (country or DEFAULT_COUNTRY).upper()
+    bot = BOTS.get(country)
+    if bot is None:
+        with BOT_LOCKS_LOCK:
+            lock = BOT_LOCKS.setdefault(country, threading.Lock())
+        with lock:
+            bot = BOTS.get(country)
+            if bot is None:
+                bot = initiate_chat_bot(country)
+                BOTS[country] = bot
+    return bot
 
 # Enable CORS for local development so the HTML UI can call this API from the browser
 app.add_middleware(
@@ -18,6 +50,18 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    # Reuse the caller's request id when given so logs can be joined across services
+    trace_id = set_trace_id(request.headers.get("x-request-id"))
+    start = perf_counter()
+    response = await call_next(request)
+    route = request.scope.get("route")
+    endpoint = route.path if route is not None else "unmatched"
+    HTTP_REQUEST_SECONDS.observe(perf_counter() - start, app="api", endpoint=endpoint)
+    response.headers["X-Request-ID"] = trace_id
+    return response
+
 @app.get("/")
 def read_root():
     return {"message": "Foursquare AI Bot API is running!"}
@@ -27,18 +71,116 @@ def read_root():
 def health_check():
     return JSONResponse(content={"status": "ok"})
 
+@app.get("/countries")
+def countries():
+    """Countries with built artefacts, plus the ones already loaded."""
+    built = {iso: {"name": m["name"], "rows": m["rows"]} for iso, m in available_countries().items()}
+    return {"default": DEFAULT_COUNTRY, "loaded": sorted(BOTS), "built": built}
+
+@app.get("/metrics")
+def metrics():
+    return PlainTextResponse(REGISTRY.render(), media_type=CONTENT_TYPE)
+
 class QueryRequest(BaseModel):
     question: str
+    country: str | None = None
+    page_size: int | None = Field(default=None, ge=1)
 
 @app.post("/ask")
 def ask_question(request: QueryRequest):
-    result = BOT.process_question(request.question)
+    try:
+        bot = get_bot(request.country)
+    except ValueError as e:
+        return JSONResponse(status_code=404, content={"error": str(e)})
+    state = bot.process_question(request.question)["state"]
+    rows, cursor, next_page = state.result, None, None
+    total_rows = None if state.truncated or not isinstance(rows, list) else len(rows)
+    page_size = min(request.page_size or RESULTS.page_size, RESULTS.max_page_size)
+    # Fast path results are already capped; generated queries can return whole exports
+    if isinstance(rows, list) and not state.fast_path and (state.truncated or len(rows) > page_size):
+        cursor = RESULTS.spill(bot.pool, state.query, state.columns or None).cursor
+        # Page one is read from the snapshot as well: a second run of unordered SQL may return its rows in another order
+        try:
+            page = RESULTS.page(cursor, 0, page_size)
+        except TimeoutError:
+            rows, next_page = [], f"/results/{cursor}?offset=0&limit={page_size}"
+        except RuntimeError:
+            rows, cursor = rows[:page_size], None
+        else:
+            rows, total_rows = page["rows"], page["total_rows"]
+            if page["next_offset"] is not None:
+                next_page = f"/results/{cursor}?offset={page['next_offset']}&limit={page_size}"
     return {
-        "query": result["state"].query,
-        "result": result["state"].result,
-        "answer": result["state"].answer
+        "query": state.query,
+        "result": rows,
+        "columns": state.columns,
+        "answer": state.answer,
+        "fast_path": state.fast_path,
+        "cursor": cursor,
+        "next": next_page,
+        "total_rows": total_rows,
     }
 
+def _snapshot(cursor: str, wait: float = 30.0):
+    """The snapshot for a cursor, or the error response to return instead."""
+    try:
+        return RESULTS.get(cursor, wait=wait), None
+    except KeyError:
+        return None, JSONResponse(status_code=404, content={"error": f"Unknown or expired result cursor: {cursor}"})
+    except TimeoutError as e:
+        return None, JSONResponse(status_code=202, content={"status": "pending", "error": str(e)})
+    except RuntimeError as e:
+        return None, JSONResponse(status_code=500, content={"error": str(e)})
+
+@app.get("/results/{cursor}")
+def result_page(cursor: str, offset: int = Query(default=0, ge=0), limit: int | None = Query(default=None, ge=1)):
+    """One page of a spilled /ask result; follow `next` until it is null."""
+    snapshot, error = _snapshot(cursor)
+    if error is not None:
+        return error
+    page = RESULTS.page(snapshot.cursor, offset, limit)
+    if page["next_offset"] is not None:
+        page["next"] = f"/results/{cursor}?offset={page['next_offset']}&limit={len(page['rows'])}"
+    return page
+
+@app.get("/results/{cursor}/ndjson")
+def result_ndjson(cursor: str):
+    """The whole result as newline-delimited JSON, streamed in batches."""
+    snapshot, error = _snapshot(cursor, wait=300.0)
+    if error is not None:
+        return error
+    return StreamingResponse(RESULTS.iter_ndjson(snapshot), media_type="application/x-ndjson")
+
+@app.get("/results/{cursor}/arrow")
+def result_arrow(cursor: str):
+    """The whole result as an Arrow IPC stream (requires pyarrow on the server)."""
+    if importlib.util.find_spec("pyarrow") is None:
+        return JSONResponse(status_code=501, content={"error": "Arrow streams need pyarrow installed on the server"})
+    snapshot, error = _snapshot(cursor, wait=300.0)
+    if error is not None:
+        return error
+    return StreamingResponse(RESULTS.iter_arrow(snapshot), media_type="application/vnd.apache.arrow.stream")
+
+@app.get("/nearby")
+def nearby(
+    lat: float | None = None,
+    lon: float | None = None,
+    near: str | None = None,
+    radius_km: float | None = Query(default=None, gt=0, le=500),
+    k: int = Query(default=10, ge=1, le=1000),
+    category: str | None = None,
+    country: str | None = None,
+):
+    """POIs nearest to a point, or within radius_km of it; `near` accepts a station or airport name/code."""
+    try:
+        bot = get_bot(country)
+    except ValueError as e:
+        return JSONResponse(status_code=404, content={"error": str(e)})
+    try:
+        return bot.find_nearby(lat=lat, lon=lon, near=near, radius_km=radius_km, k=k, category=category)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("src.api.main:app", host="127.0.0.1", port=8000, reload=True)
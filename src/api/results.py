@@ -0,0 +1,213 @@
+"""
+Server-side result snapshots for paginated `/ask` results.
+
+When a result is larger than one page, its query is run again in the background as
+`COPY (...) TO '<cursor>.parquet'`. DuckDB writes that file in row groups without
+materialising the result in Python, so large exports no longer sit in the API's
+memory. Every page, the first included, is read from that one file: generated SQL
+rarely has an ORDER BY, so another run could return the rows in a different order and
+pages would overlap or skip rows. Clients read the snapshot by cursor id, in one of
+three ways:
+
+- as JSON pages (`page`);
+- as newline-delimited JSON (`iter_ndjson`);
+- as an Arrow IPC stream (`iter_arrow`, needs pyarrow).
+
+Snapshots expire `ttl_seconds` after their last read, and their files are deleted then.
+
+Each process writes to its own subdirectory (`<directory>/<pid>`) and keeps its cursor
+index in memory. A cursor can therefore only be read through the process that created
+it: run the API with a single worker, or with sticky routing per client, when clients
+page through results.
+"""
+import atexit
+import io
+import json
+import os
+import shutil
+import threading
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from time import perf_counter, time
+from src.db.pool import get_pool
+from src.utils.logger import logging
+from src.utils.metrics import DUCKDB_QUERY_SECONDS, QUERY_ROWS, RESULT_SNAPSHOTS
+
+
+RESULTS_DIR = os.path.join("data", "results")
+PAGE_SIZE = 100
+MAX_PAGE_SIZE = 5000
+STREAM_BATCH_ROWS = 10_000
+
+
+class ResultSnapshot:
+    """One spilled result: its parquet file, columns and, once the spill finished, the row count."""
+
+    def __init__(self, cursor: str, path: str, columns: list[str] | None, ttl_seconds: float):
+        self.cursor = cursor
+        self.path = path
+        self.columns = columns
+        self.ttl_seconds = ttl_seconds
+        self.rows: int | None = None
+        self.error: str | None = None
+        self.future: Future | None = None
+        self.touch()
+
+    def touch(self):
+        self.expires_at = time() + self.ttl_seconds
+
+    @property
+    def ready(self) -> bool:
+        return self.future is not None and self.future.done()
+
+
+class ResultStore:
+    """Spills large query results to parquet snapshots and serves them back by cursor id."""
+
+    def __init__(
+        self,
+        directory: str = RESULTS_DIR,
+        ttl_seconds: float = 900,
+        page_size: int = PAGE_SIZE,
+        max_page_size: int = MAX_PAGE_SIZE,
+        max_spills: int = 2,
+    ):
+        """
+        Args:
+            directory (str): Root for snapshot files; this process uses and cleans up only `<directory>/<pid>`.
+            ttl_seconds (float): Idle time after which a snapshot and its file are dropped.
+            page_size (int): Rows per page unless the client asks for another size.
+            max_page_size (int): Upper bound on the page size a client can ask for.
+            max_spills (int): Spills that run at the same time; further ones queue.
+        """
+        self.directory = os.path.join(directory, str(os.getpid()))
+        self.ttl_seconds = ttl_seconds
+        self.page_size = page_size
+        self.max_page_size = max_page_size
+        # Other workers share the root; only this process's leftovers (a reused pid) are removed
+        shutil.rmtree(self.directory, ignore_errors=True)
+        os.makedirs(self.directory, exist_ok=True)
+        atexit.register(shutil.rmtree, self.directory, ignore_errors=True)
+        # Reads need no extensions and must not queue behind the bots' cursors
+        self.pool = get_pool(":memory:results", extensions=())
+        self._executor = ThreadPoolExecutor(max_workers=max_spills, thread_name_prefix="result-spill")
+        self._snapshots: dict[str, ResultSnapshot] = {}
+        self._lock = threading.Lock()
+
+    def spill(self, pool, sql: str, columns: list[str] | None = None) -> ResultSnapshot:
+        """
+        Start writing the full result of `sql` to a snapshot and return it without waiting.
+
+        Args:
+            pool: DuckDBPool the query was answered on (it holds the views the SQL refers to).
+            sql (str): The query, as run for the first page.
+            columns (list[str] | None): Column names already known from the first page.
+        """
+        self.sweep()
+        cursor = uuid.uuid4().hex
+        snapshot = ResultSnapshot(cursor, os.path.join(self.directory, f"{cursor}.parquet"), columns, self.ttl_seconds)
+        with self._lock:
+            self._snapshots[cursor] = snapshot
+        snapshot.future = self._executor.submit(self._write, pool, sql.strip().rstrip(";"), snapshot)
+        return snapshot
+
+    def _write(self, pool, sql: str, snapshot: ResultSnapshot):
+        start = perf_counter()
+        try:
+            with pool.cursor() as cur:
+                cur.execute(f"COPY ({sql}) TO '{snapshot.path}' (FORMAT PARQUET, CODEC ZSTD)")
+            with self.pool.cursor() as cur:
+                snapshot.rows = cur.execute("SELECT COUNT(*) FROM read_parquet(?)", [snapshot.path]).fetchone()[0]
+                if snapshot.columns is None:
+                    snapshot.columns = [d[0] for d in cur.execute("SELECT * FROM read_parquet(?) LIMIT 0", [snapshot.path]).description]
+        except Exception as e:
+            logging.error(f"Spilling result {snapshot.cursor} failed: {e}")
+            snapshot.error = str(e)
+            RESULT_SNAPSHOTS.inc(event="failed")
+            return
+        DUCKDB_QUERY_SECONDS.observe(perf_counter() - start, source="result_spill")
+        QUERY_ROWS.observe(snapshot.rows, source="result_spill")
+        RESULT_SNAPSHOTS.inc(event="created")
+        logging.info(f"Spilled result {snapshot.cursor}: {snapshot.rows} rows in {perf_counter() - start:.2f} seconds")
+
+    def get(self, cursor: str, wait: float | None = 30.0) -> ResultSnapshot:
+        """
+        The snapshot for `cursor`, waiting up to `wait` seconds for its spill to finish.
+
+        Raises:
+            KeyError: Unknown or expired cursor.
+            TimeoutError: The spill is still running after `wait` seconds.
+            RuntimeError: The spill failed.
+        """
+        self.sweep()
+        with self._lock:
+            snapshot = self._snapshots.get(cursor)
+        if snapshot is None:
+            raise KeyError(cursor)
+        snapshot.touch()
+        try:
+            snapshot.future.result(timeout=wait)
+        except TimeoutError:
+            raise TimeoutError(f"Result {cursor} is still being written")
+        if snapshot.error:
+            raise RuntimeError(f"Result {cursor} could not be stored: {snapshot.error}")
+        return snapshot
+
+    def page(self, cursor: str, offset: int = 0, limit: int | None = None, wait: float | None = 30.0) -> dict:
+        """Rows `offset` to `offset + limit` of a snapshot, with the offset of the next page (None at the end); raises as `get`."""
+        snapshot = self.get(cursor, wait=wait)
+        limit = min(limit or self.page_size, self.max_page_size)
+        with self.pool.cursor() as cur:
+            rows = cur.execute("SELECT * FROM read_parquet(?) LIMIT ? OFFSET ?", [snapshot.path, limit, offset]).fetchall()
+        next_offset = offset + len(rows)
+        return {
+            "cursor": cursor,
+            "columns": snapshot.columns,
+            "offset": offset,
+            "rows": rows,
+            "total_rows": snapshot.rows,
+            "next_offset": next_offset if next_offset < snapshot.rows else None,
+        }
+
+    def iter_ndjson(self, snapshot: ResultSnapshot, batch_rows: int = STREAM_BATCH_ROWS):
+        """One JSON object per row, fetched from the snapshot `batch_rows` at a time."""
+        with self.pool.cursor(timeout=None) as cur:
+            cur.execute("SELECT * FROM read_parquet(?)", [snapshot.path])
+            while True:
+                rows = cur.fetchmany(batch_rows)
+                if not rows:
+                    break
+                yield "".join(
+                    json.dumps(dict(zip(snapshot.columns, row)), default=str, ensure_ascii=False) + "\n" for row in rows
+                ).encode("utf-8")
+                snapshot.touch()
+
+    def iter_arrow(self, snapshot: ResultSnapshot, batch_rows: int = STREAM_BATCH_ROWS):
+        """The snapshot as an Arrow IPC stream, one record batch of up to `batch_rows` rows at a time."""
+        import pyarrow as pa
+
+        with self.pool.cursor(timeout=None) as cur:
+            reader = cur.execute("SELECT * FROM read_parquet(?)", [snapshot.path]).fetch_record_batch(batch_rows)
+            sink = io.BytesIO()
+            with pa.ipc.new_stream(sink, reader.schema) as writer:
+                for batch in reader:
+                    writer.write_batch(batch)
+                    yield sink.getvalue()
+                    sink.seek(0)
+                    sink.truncate()
+                    snapshot.touch()
+            yield sink.getvalue()
+
+    def sweep(self):
+        """Drop snapshots idle for longer than the TTL, and their files."""
+        now = time()
+        with self._lock:
+            expired = [s for s in self._snapshots.values() if s.ready and s.expires_at < now]
+            for snapshot in expired:
+                del self._snapshots[snapshot.cursor]
+        for snapshot in expired:
+            try:
+                os.remove(snapshot.path)
+            except FileNotFoundError:
+                pass
+            RESULT_SNAPSHOTS.inc(event="expired")
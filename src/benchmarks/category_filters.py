@@ -0,0 +1,190 @@
+"""
+Benchmark wildcard category scans against exact category label filters.
+
+Usage:
+    python -m src.benchmarks.category_filters --data-path data/output.geoparquet
+    python -m src.benchmarks.category_filters --data-path data/bench/pois.geoparquet --like-labels
+    python -m src.benchmarks.category_filters --calibrate   # distances for DEFAULT_MAX_DISTANCE
+"""
+import argparse
+import re
+import statistics
+from time import perf_counter
+from src.bot.categories import CategoryResolver, format_category_filter
+from src.db.duckdb_utils import get_duckdb_connection
+
+
+# Keyword patterns the prompt used to rely on, taken from the few-shot questions
+BENCHMARK_KEYWORDS = ["temple", "hotel", "petrol", "restaurant", "bookstore", "hospital", "atm", "coffee"]
+
+# Place-type phrase -> word every relevant label contains; labels without it count as unrelated
+CALIBRATION_TERMS = {
+    "temples": "temple",
+    "hotels": "hotel",
+    "petrol pumps": "fuel",
+    "fuel stations": "fuel",
+    "restaurants": "restaurant",
+    "bookstores": "bookstore",
+    "hospitals": "hospital",
+    "atms": "atm",
+    "coffee shops": "coffee",
+    "pharmacies": "pharmacy",
+    "schools": "school",
+    "banks": "bank",
+}
+
+
+def _time_query(con, sql_query: str, params: list, repeats: int) -> float:
+    """Return the median wall time in milliseconds over `repeats` runs."""
+    timings = []
+    for _ in range(repeats):
+        start = perf_counter()
+        con.execute(sql_query, params).fetchall()
+        timings.append((perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def _labels_like(con, source: str, keyword: str) -> list[tuple[str, float | None]]:
+    """Every label the LIKE filter matches: an upper bound on what the resolver could return."""
+    return [(r[0], None) for r in con.execute(
+        f"SELECT DISTINCT category FROM {source} WHERE LOWER(category) LIKE ?", [f"%{keyword}%"]
+    ).fetchall()]
+
+
+def run_benchmark(data_path: str, keywords: list[str] = BENCHMARK_KEYWORDS, repeats: int = 5, resolver=None) -> list[dict]:
+    """
+    Time `LOWER(category) LIKE '%kw%'` against the label filter for each keyword, and compare the rows they return.
+
+    The label filter is `format_category_filter(labels)`: each label and its sub-categories.
+    With a resolver, the labels are the ones `CategoryResolver` hands to the prompt for the
+    keyword, so the label filter is the one the bot actually runs. A keyword with no label
+    within the resolver's max_distance shows 0 labels, because the bot keeps the LIKE filter
+    for it. Without a resolver, the labels are every one the LIKE filter matches.
+
+    Args:
+        data_path (str): Parquet file to scan (ideally exported sorted by category).
+        keywords (list[str]): Place-type keywords to benchmark.
+        repeats (int): Number of runs per query; the median is reported.
+        resolver (CategoryResolver | None): Resolver whose labels are benchmarked.
+    """
+    con = get_duckdb_connection(database=":memory:")
+    source = f"read_parquet('{data_path}')"
+    rows = []
+    try:
+        for keyword in keywords:
+            pattern = f"%{keyword}%"
+            matches = resolver.search(keyword) if resolver is not None else _labels_like(con, source, keyword)
+            labels = [label for label, _ in matches]
+            like_sql = f"SELECT COUNT(*) FROM {source} WHERE LOWER(category) LIKE ?"
+            like_ms = _time_query(con, like_sql, [pattern], repeats)
+            like_rows = con.execute(like_sql, [pattern]).fetchone()[0]
+            # The prompt's LIKE fallback also searches names, e.g. temples only named as such
+            name_or_category_rows = con.execute(
+                f"SELECT COUNT(*) FROM {source} WHERE LOWER(name) LIKE ? OR LOWER(category) LIKE ?", [pattern, pattern]
+            ).fetchone()[0]
+
+            in_ms, in_rows = None, None
+            if labels:
+                in_sql = f"SELECT COUNT(*) FROM {source} WHERE {format_category_filter(labels)}"
+                in_ms = _time_query(con, in_sql, [], repeats)
+                in_rows = con.execute(in_sql).fetchone()[0]
+            rows.append({
+                "keyword": keyword,
+                "labels": len(labels),
+                "resolved": matches if resolver is not None else None,
+                "like_ms": round(like_ms, 2),
+                "in_ms": round(in_ms, 2) if in_ms is not None else None,
+                "speedup": round(like_ms / in_ms, 2) if in_ms else None,
+                "like_rows": like_rows,
+                "name_or_category_rows": name_or_category_rows,
+                "in_rows": in_rows,
+            })
+    finally:
+        con.close()
+    return rows
+
+
+def calibrate(resolver, terms: dict[str, str] = CALIBRATION_TERMS, k: int = 20) -> dict:
+    """
+    Distances of relevant and unrelated labels for each phrase, to choose `max_distance` from.
+
+    Args:
+        resolver (CategoryResolver): Resolver over the category vector DB; its max_distance is ignored.
+        terms (dict[str, str]): Place-type phrase -> word that marks a relevant label.
+        k (int): Labels looked up per phrase.
+
+    Returns:
+        dict: `matches` per phrase as (label, distance, relevant), the largest relevant and smallest
+        unrelated distance, and a threshold halfway between them (None when the two overlap).
+    """
+    unfiltered = CategoryResolver(vector_db=resolver.vector_db, k=k, max_distance=None)
+    matches, relevant, unrelated = {}, [], []
+    for phrase, word in terms.items():
+        marker = re.compile(rf"\b{re.escape(word)}", re.IGNORECASE)
+        matches[phrase] = []
+        for label, distance in unfiltered.search(phrase):
+            is_relevant = bool(marker.search(label))
+            matches[phrase].append((label, distance, is_relevant))
+            (relevant if is_relevant else unrelated).append(distance)
+
+    max_relevant = max(relevant, default=None)
+    min_unrelated = min(unrelated, default=None)
+    threshold = None
+    if max_relevant is not None and min_unrelated is not None and max_relevant < min_unrelated:
+        threshold = round((max_relevant + min_unrelated) / 2, 3)
+    return {"matches": matches, "max_relevant": max_relevant, "min_unrelated": min_unrelated, "threshold": threshold}
+
+
+def load_resolver(vector_db_dir: str):
+    """CategoryResolver over the first Chroma DB in `vector_db_dir`, or None when there is none."""
+    from glob import glob
+    from src.db.duckdb_utils import load_vector_db
+
+    paths = glob(f"{vector_db_dir}/chroma*")
+    vector_db = load_vector_db(path=paths[0]) if paths else None
+    return CategoryResolver(vector_db=vector_db) if vector_db is not None else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare LIKE and IN category filters on the POI parquet.")
+    parser.add_argument("--data-path", default="data/output.geoparquet")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--vector-db", default="data/vector_db", help="Category vector DB whose resolver labels are benchmarked.")
+    parser.add_argument("--like-labels", action="store_true", help="Use every label LIKE matches instead of the resolver's.")
+    parser.add_argument("--calibrate", action="store_true", help="Print label distances for choosing DEFAULT_MAX_DISTANCE and exit.")
+    args = parser.parse_args()
+
+    if args.calibrate:
+        resolver = load_resolver(args.vector_db)
+        if resolver is None:
+            parser.error(f"No category vector DB in {args.vector_db}")
+        result = calibrate(resolver)
+        for phrase, matches in result["matches"].items():
+            print(phrase)
+            for label, distance, is_relevant in matches:
+                print(f"    {distance:.3f}  {'+' if is_relevant else '-'}  {label}")
+        print(f"Largest relevant distance: {result['max_relevant']}")
+        print(f"Smallest unrelated distance: {result['min_unrelated']}")
+        print(f"Suggested max_distance: {result['threshold'] if result['threshold'] is not None else 'none, the distances overlap'}")
+        return
+
+    resolver = None if args.like_labels else load_resolver(args.vector_db)
+    print(f"Labels from: {'CategoryResolver' if resolver is not None else 'LIKE matches'}")
+    rows = run_benchmark(args.data_path, repeats=args.repeats, resolver=resolver)
+    print(f"{'keyword':<12}{'labels':>8}{'like ms':>10}{'label ms':>10}{'speedup':>10}{'like rows':>12}{'+name rows':>12}{'label rows':>11}")
+    for row in rows:
+        print(
+            f"{row['keyword']:<12}{row['labels']:>8}{row['like_ms']:>10}{str(row['in_ms']):>10}{str(row['speedup']):>10}"
+            f"{row['like_rows']:>12}{row['name_or_category_rows']:>12}{str(row['in_rows']):>11}"
+        )
+        for label, distance in row["resolved"] or []:
+            print(f"    {distance:.3f}  {label}")
+    timed = [r for r in rows if r["in_ms"] is not None]
+    if timed:
+        like_total = sum(r["like_ms"] for r in timed)
+        in_total = sum(r["in_ms"] for r in timed)
+        print(f"Total scan time: LIKE {like_total:.2f} ms, label filter {in_total:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
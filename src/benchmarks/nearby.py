@@ -0,0 +1,123 @@
+"""
+Benchmark the grid-indexed nearby search against a brute-force ST_Distance_Sphere scan.
+
+Usage:
+    python -m src.benchmarks.nearby --rows 1000000 --queries 200
+"""
+import argparse
+import os
+import random
+from time import perf_counter
+import numpy as np
+from src.benchmarks.poi_data import generate_pois, CITIES
+from src.benchmarks.stats import summarise
+from src.db.duckdb_utils import get_duckdb_connection, geometry_expr
+from src.db.spatial_index import PoiIndex, haversine_km
+
+# /nearby accepts radius_km up to 500; wide windows are where the grid bounds matter most
+LARGE_RADII_KM = (100, 250, 500)
+
+
+def _query_points(count: int, seed: int) -> list[tuple[float, float]]:
+    """Random (lat, lon) query points near the synthetic cities."""
+    rng = random.Random(seed)
+    points = []
+    for _ in range(count):
+        _, _, lat, lon, _ = rng.choice(CITIES)
+        points.append((lat + rng.uniform(-0.1, 0.1), lon + rng.uniform(-0.1, 0.1)))
+    return points
+
+
+def check_large_radii(index: PoiIndex, points: list[tuple[float, float]], radii: tuple = LARGE_RADII_KM) -> int:
+    """Queries whose grid radius search differs from a brute-force haversine over every POI."""
+    grid = index.grid
+    mismatches = 0
+    for lat, lon in points:
+        distances = haversine_km(lon, lat, index.lon, index.lat)
+        for radius_km in radii:
+            ids, _ = grid.radius(lon, lat, radius_km)
+            if set(ids.tolist()) != set(np.nonzero(distances <= radius_km)[0].tolist()):
+                mismatches += 1
+    return mismatches
+
+
+def run_benchmark(data_path: str, queries: int = 100, k: int = 10, radius_km: float = 2.0, seed: int = 7) -> dict:
+    points = _query_points(queries, seed)
+
+    start = perf_counter()
+    index = PoiIndex.from_parquet(data_path)
+    build_seconds = perf_counter() - start
+
+    # Brute force runs on an in-memory table so it is not penalised by parquet decoding
+    con = get_duckdb_connection(database=":memory:")
+    source = f"read_parquet('{data_path}')"
+    con.execute(f"CREATE TABLE pois AS SELECT name, {geometry_expr(con, source)} AS geom FROM {source}")
+
+    # ST_Distance_Sphere expects [latitude, longitude] axis order
+    distance = "ST_Distance_Sphere(ST_Point(ST_Y(geom), ST_X(geom)), ST_Point($1, $2))"
+    knn_sql = f"SELECT name, {distance} / 1000 AS km FROM pois ORDER BY km LIMIT {k}"
+    radius_sql = f"SELECT COUNT(*) FROM pois WHERE {distance} / 1000 <= {radius_km}"
+
+    timings = {"index_knn": [], "brute_knn": [], "index_radius": [], "brute_radius": []}
+    mismatches = 0
+    for lat, lon in points:
+        start = perf_counter()
+        nearest = index.nearest(lat, lon, k=k)
+        timings["index_knn"].append(perf_counter() - start)
+
+        start = perf_counter()
+        brute_nearest = con.execute(knn_sql, [lat, lon]).fetchall()
+        timings["brute_knn"].append(perf_counter() - start)
+
+        start = perf_counter()
+        within = index.within(lat, lon, radius_km)
+        timings["index_radius"].append(perf_counter() - start)
+
+        start = perf_counter()
+        brute_count = con.execute(radius_sql, [lat, lon]).fetchone()[0]
+        timings["brute_radius"].append(perf_counter() - start)
+
+        # Different haversine radii can flip points sitting exactly on the edge; allow 1 m slack
+        if abs(nearest[-1]["distance_km"] - brute_nearest[-1][1]) > 0.001 or abs(len(within) - brute_count) > 1:
+            mismatches += 1
+    con.close()
+    large_radius_mismatches = check_large_radii(index, points)
+
+    summaries = {name: summarise(values) for name, values in timings.items()}
+    return {
+        "rows": len(index.grid),
+        "queries": queries,
+        "index_build_seconds": round(build_seconds, 2),
+        "timings_ms": summaries,
+        "knn_speedup_p50": round(summaries["brute_knn"]["p50"] / max(summaries["index_knn"]["p50"], 1e-6), 1),
+        "radius_speedup_p50": round(summaries["brute_radius"]["p50"] / max(summaries["index_radius"]["p50"], 1e-6), 1),
+        "mismatches": mismatches,
+        "large_radius_mismatches": large_radius_mismatches,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Grid index vs brute-force nearby search.")
+    parser.add_argument("--data-path", default="data/bench/pois.geoparquet")
+    parser.add_argument("--rows", type=int, default=500_000, help="Rows to synthesise when --data-path is missing.")
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--radius-km", type=float, default=2.0)
+    args = parser.parse_args()
+
+    if not os.path.exists(args.data_path):
+        print(f"Generating {args.rows} synthetic POIs at {args.data_path}")
+        generate_pois(args.data_path, rows=args.rows)
+
+    report = run_benchmark(args.data_path, args.queries, args.k, args.radius_km)
+    print(f"{report['rows']} POIs, index built in {report['index_build_seconds']} s, {report['queries']} queries")
+    print(f"{'query':<14}{'p50 ms':>10}{'p95 ms':>10}")
+    for name, summary in report["timings_ms"].items():
+        print(f"{name:<14}{summary['p50']:>10}{summary['p95']:>10}")
+    print(f"k-NN speedup (p50): {report['knn_speedup_p50']}x, radius speedup (p50): {report['radius_speedup_p50']}x")
+    print(f"Result mismatches vs brute force: {report['mismatches']}")
+    print(f"Radius mismatches at {', '.join(str(r) for r in LARGE_RADII_KM)} km vs brute-force haversine: {report['large_radius_mismatches']}")
+
+
+if __name__ == "__main__":
+    main()
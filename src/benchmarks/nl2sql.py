@@ -0,0 +1,208 @@
+"""
+Offline benchmark for the NL-to-SQL pipeline.
+
+A stub LLM replays recorded SQL for a canned question set, so the run needs no
+network access and is deterministic. Timings cover schema load, SQL generation,
+DuckDB execution and answer formatting. The bots run without the fast path, so
+every question takes the LLM route and runs stay comparable against a baseline.
+
+Usage:
+    python -m src.benchmarks.nl2sql --rows 200000 --iterations 5 --concurrency 4
+    python -m src.benchmarks.nl2sql --output bench.json
+    python -m src.benchmarks.nl2sql --baseline bench.json   # exits 1 on regression
+"""
+import argparse
+import json
+import os
+import queue
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter, sleep
+from langchain_core.messages import AIMessage
+from src.bot.models import FourSquareChatBot
+from src.langchain.pipeline import build_query_prompt_template
+from src.benchmarks.poi_data import generate_pois
+from src.benchmarks.stats import summarise, peak_rss_mb, compare_to_baseline
+
+
+# Question -> SQL the LLM is expected to produce; covers the few-shot questions and more
+RECORDED_SQL = {
+    "How many temples are there in India?":
+        "SELECT COUNT(*) as count FROM read_parquet('{data_path}') WHERE LOWER(name) LIKE '%temple%' OR LOWER(category) LIKE '%temple%' LIMIT 10;",
+    "Which hotels are located in Goa?":
+        "SELECT name, category, address, region, postcode FROM read_parquet('{data_path}') WHERE (LOWER(name) LIKE '%hotel%' OR LOWER(category) LIKE '%hotel%') AND (LOWER(region) LIKE '%goa%' OR LOWER(address) LIKE '%goa%') LIMIT 10;",
+    "List petrol pumps in Chennai.":
+        "SELECT name, category, address, region, postcode FROM read_parquet('{data_path}') WHERE LOWER(category) LIKE '%fuel%' AND (LOWER(region) LIKE '%chennai%' OR LOWER(address) LIKE '%chennai%') LIMIT 10;",
+    "How many restaurants are in Bangalore?":
+        "SELECT COUNT(*) as count FROM read_parquet('{data_path}') WHERE LOWER(category) LIKE '%restaurant%' AND (LOWER(region) LIKE '%bangalore%' OR LOWER(address) LIKE '%bangalore%') LIMIT 10;",
+    "Find bookstores in Delhi.":
+        "SELECT name, category, address, region, postcode FROM read_parquet('{data_path}') WHERE LOWER(category) LIKE '%bookstore%' AND (LOWER(region) LIKE '%delhi%' OR LOWER(address) LIKE '%delhi%') LIMIT 10;",
+    "List fuel stations in Pune.":
+        "SELECT name, category, address, region, postcode FROM read_parquet('{data_path}') WHERE (category = 'Travel and Transportation > Fuel Station' OR category LIKE 'Travel and Transportation > Fuel Station > %') AND (LOWER(region) LIKE '%pune%' OR LOWER(address) LIKE '%pune%') LIMIT 10;",
+    "How many hospitals are there in Maharashtra?":
+        "SELECT COUNT(*) as count FROM read_parquet('{data_path}') WHERE (category = 'Health and Medicine > Hospital' OR category LIKE 'Health and Medicine > Hospital > %') AND LOWER(region) LIKE '%maharashtra%' LIMIT 10;",
+    "List down some coffee shops in Jodhpur?":
+        "SELECT name, category, address, region, postcode FROM read_parquet('{data_path}') WHERE LOWER(category) LIKE '%coffee%' AND (LOWER(region) LIKE '%jodhpur%' OR LOWER(address) LIKE '%jodhpur%') LIMIT 10;",
+    "Where can I get nice sweets in Delhi?":
+        "SELECT name, category, address, region, postcode FROM read_parquet('{data_path}') WHERE (LOWER(name) LIKE '%sweet%' OR LOWER(category) LIKE '%dessert%') AND (LOWER(region) LIKE '%delhi%' OR LOWER(address) LIKE '%delhi%') LIMIT 10;",
+    "Tell me the count for all the points that are related to manufacturing?":
+        "SELECT COUNT(*) as count FROM read_parquet('{data_path}') WHERE LOWER(category) LIKE '%manufactur%' LIMIT 10;",
+    "Which regions have the most ATMs?":
+        "SELECT region, COUNT(*) as count FROM read_parquet('{data_path}') WHERE LOWER(category) LIKE '%atm%' GROUP BY region ORDER BY count DESC LIMIT 10;",
+    "Top 10 categories in Kolkata by number of places.":
+        "SELECT category, COUNT(*) as count FROM read_parquet('{data_path}') WHERE LOWER(address) LIKE '%kolkata%' GROUP BY category ORDER BY count DESC LIMIT 10;",
+}
+
+
+class StubLLM:
+    """Drop-in replacement for ChatOpenAI that replays recorded SQL and formats answers locally."""
+
+    def __init__(self, responses: dict[str, str], data_path: str, latency_ms: float = 0.0):
+        """
+        Args:
+            responses (dict[str, str]): Question -> SQL template containing `{data_path}`.
+            data_path (str): Parquet path substituted into the recorded SQL.
+            latency_ms (float): Artificial delay per call to model network round trips.
+        """
+        self.responses = {q: sql.replace("{data_path}", data_path) for q, sql in responses.items()}
+        self.latency_ms = latency_ms
+
+    def invoke(self, prompt):
+        if self.latency_ms:
+            sleep(self.latency_ms / 1000)
+
+        # The answer step sends a plain string; the SQL step sends chat messages
+        if isinstance(prompt, str):
+            return AIMessage(content=f"Stub answer based on {len(prompt)} characters of context.")
+
+        messages = prompt.to_messages() if hasattr(prompt, "to_messages") else prompt
+        # The question is the last "Question:" line of the user message (examples come before it)
+        question = messages[-1].content.rsplit("Question:", 1)[-1].strip()
+        return AIMessage(content=self.responses[question])
+
+
+def _build_bot(data_path: str, latency_ms: float) -> FourSquareChatBot:
+    return FourSquareChatBot(
+        data_path=data_path,
+        columns=['name', 'category', 'address', 'region', 'postcode'],
+        llm=StubLLM(RECORDED_SQL, data_path=data_path, latency_ms=latency_ms),
+        query_prompt_template=build_query_prompt_template(),
+        database=':memory:',
+        # Templated questions would otherwise skip the LLM stages and mix two routes into one p50/p95
+        fast_path=False
+    )
+
+
+def run_benchmark(data_path: str, iterations: int = 3, concurrency: int = 4, llm_latency_ms: float = 0.0) -> dict:
+    """
+    Replay every recorded question `iterations` times, first serially and then under concurrency.
+
+    Args:
+        data_path (str): POI parquet to query.
+        iterations (int): Passes over the question set in each phase.
+        concurrency (int): Worker threads in the throughput phase (one bot per worker).
+        llm_latency_ms (float): Simulated LLM latency per call.
+
+    Returns:
+        dict: Report with per-stage summaries (ms), throughput and peak RSS.
+    """
+    questions = list(RECORDED_SQL) * iterations
+    stages: dict[str, list[float]] = {"schema_load": []}
+    prompt_tokens: dict[str, list[int]] = {}
+
+    ## 1. Serial pass: per-stage latency without contention
+    bot = _build_bot(data_path, llm_latency_ms)
+    stages["schema_load"].append(bot.schema_load_seconds)
+    for question in questions:
+        start = perf_counter()
+        state = bot.process_question(question)["state"]
+        stages.setdefault("total", []).append(perf_counter() - start)
+        for stage, seconds in state.timings.items():
+            stages.setdefault(stage, []).append(seconds)
+        for stage, tokens in state.prompt_tokens.items():
+            prompt_tokens.setdefault(stage, []).append(tokens)
+
+    ## 2. Concurrent pass: one bot per worker, handed out through a queue
+    bots = queue.Queue()
+    for _ in range(concurrency):
+        worker_bot = _build_bot(data_path, llm_latency_ms)
+        stages["schema_load"].append(worker_bot.schema_load_seconds)
+        bots.put(worker_bot)
+
+    concurrent_latencies = []
+
+    def _ask(question):
+        worker_bot = bots.get()
+        try:
+            start = perf_counter()
+            worker_bot.process_question(question)
+            concurrent_latencies.append(perf_counter() - start)
+        finally:
+            bots.put(worker_bot)
+
+    start = perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(_ask, questions))
+    wall = perf_counter() - start
+
+    return {
+        "data_path": data_path,
+        "questions": len(RECORDED_SQL),
+        "iterations": iterations,
+        "concurrency": concurrency,
+        "llm_latency_ms": llm_latency_ms,
+        "stages": {stage: summarise(values) for stage, values in stages.items()},
+        "prompt_tokens": {stage: summarise(values, scale=1) for stage, values in prompt_tokens.items()},
+        "concurrent_latency": summarise(concurrent_latencies),
+        "throughput_qps": round(len(questions) / wall, 2) if wall else None,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def print_report(report: dict):
+    print(f"Questions: {report['questions']} x {report['iterations']} iterations, data: {report['data_path']}")
+    print(f"{'stage':<22}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}")
+    for stage, summary in report["stages"].items():
+        print(f"{stage:<22}{summary['p50']:>10}{summary['p95']:>10}{summary['max']:>10}")
+    for stage, summary in report["prompt_tokens"].items():
+        print(f"{stage + ' tokens':<22}{summary['p50']:>10}{summary['p95']:>10}{summary['max']:>10}")
+    latency = report["concurrent_latency"]
+    print(f"Concurrency {report['concurrency']}: {report['throughput_qps']} questions/s, "
+          f"p50 {latency['p50']} ms, p95 {latency['p95']} ms")
+    print(f"Peak RSS: {report['peak_rss_mb']} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline NL-to-SQL benchmark with a stub LLM.")
+    parser.add_argument("--data-path", default="data/bench/pois.geoparquet",
+                        help="POI parquet to query; generated synthetically if missing.")
+    parser.add_argument("--rows", type=int, default=200_000, help="Rows to synthesise when --data-path is missing.")
+    parser.add_argument("--iterations", type=int, default=3)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0)
+    parser.add_argument("--output", help="Write the JSON report here.")
+    parser.add_argument("--baseline", help="Compare against a previous JSON report and exit 1 on regression.")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args()
+
+    if not os.path.exists(args.data_path):
+        print(f"Generating {args.rows} synthetic POIs at {args.data_path}")
+        generate_pois(args.data_path, rows=args.rows)
+
+    report = run_benchmark(args.data_path, args.iterations, args.concurrency, args.llm_latency_ms)
+    print_report(report)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        regressions = compare_to_baseline(report, args.baseline, tolerance=args.tolerance)
+        for message in regressions:
+            print(f"REGRESSION {message}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
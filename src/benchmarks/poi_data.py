@@ -0,0 +1,117 @@
+"""
+Generate a synthetic POI GeoParquet with the same columns as `create_places_with_categories_view_and_export`.
+
+Usage:
+    python -m src.benchmarks.poi_data --rows 1000000 --output data/bench/pois.geoparquet
+"""
+import argparse
+import os
+from src.db.duckdb_utils import get_duckdb_connection
+
+
+# (city, region, lat, lon, postcode)
+CITIES = [
+    ("Chennai", "Tamil Nadu", 13.0827, 80.2707, "600001"),
+    ("Bangalore", "Karnataka", 12.9716, 77.5946, "560001"),
+    ("Delhi", "Delhi", 28.6139, 77.2090, "110001"),
+    ("Mumbai", "Maharashtra", 19.0760, 72.8777, "400001"),
+    ("Pune", "Maharashtra", 18.5204, 73.8567, "411001"),
+    ("Panaji", "Goa", 15.4909, 73.8278, "403001"),
+    ("Kolkata", "West Bengal", 22.5726, 88.3639, "700001"),
+    ("Hyderabad", "Telangana", 17.3850, 78.4867, "500001"),
+    ("Jodhpur", "Rajasthan", 26.2389, 73.0243, "342001"),
+    ("Guwahati", "Assam", 26.1445, 91.7362, "781001"),
+]
+
+# (category label, short noun used in the POI name)
+CATEGORIES = [
+    ("Community and Government > Spiritual Center > Hindu Temple", "Temple"),
+    ("Travel and Transportation > Lodging > Hotel", "Hotel"),
+    ("Travel and Transportation > Fuel Station", "Petrol Pump"),
+    ("Dining and Drinking > Restaurant", "Restaurant"),
+    ("Dining and Drinking > Restaurant > Indian Restaurant", "Dhaba"),
+    ("Dining and Drinking > Cafe, Coffee, and Tea House > Coffee Shop", "Coffee"),
+    ("Retail > Bookstore", "Books"),
+    ("Retail > Food and Beverage Retail > Dessert Shop", "Sweets"),
+    ("Health and Medicine > Hospital", "Hospital"),
+    ("Health and Medicine > Pharmacy", "Medical Store"),
+    ("Business and Professional Services > Financial Service > ATM", "ATM"),
+    ("Business and Professional Services > Financial Service > Bank", "Bank"),
+    ("Retail > Supermarket", "Mart"),
+    ("Community and Government > Education > Primary and Secondary School", "School"),
+    ("Travel and Transportation > Transport Hub > Rail Station", "Station"),
+    ("Business and Professional Services > Industrial Estate > Manufacturing", "Industries"),
+]
+
+
+def _values(rows: list[tuple]) -> str:
+    """Render Python tuples as a SQL VALUES list with a leading index column."""
+    rendered = []
+    for idx, row in enumerate(rows):
+        items = [str(idx)]
+        for value in row:
+            items.append("'" + value.replace("'", "''") + "'" if isinstance(value, str) else str(value))
+        rendered.append("(" + ", ".join(items) + ")")
+    return ",\n".join(rendered)
+
+
+def generate_pois(output_path: str, rows: int = 100_000, spread_deg: float = 0.2):
+    """
+    Write `rows` deterministic POIs spread around a fixed set of Indian cities.
+
+    Every value is derived from a hash of the row number, so two runs with the same
+    arguments produce identical files regardless of thread count.
+
+    Args:
+        output_path (str): GeoParquet file to write.
+        rows (int): Number of POI rows.
+        spread_deg (float): Width in degrees of the square each city's points are scattered over.
+    """
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    con = get_duckdb_connection(database=":memory:")
+    try:
+        con.execute(f"""
+            COPY (
+                WITH cities AS (
+                    SELECT * FROM (VALUES {_values(CITIES)}) t(idx, city, region, lat, lon, postcode)
+                ),
+                cats AS (
+                    SELECT * FROM (VALUES {_values(CATEGORIES)}) t(idx, category, noun)
+                ),
+                pts AS (
+                    SELECT
+                        i,
+                        hash(CAST(i AS VARCHAR) || '-city') % {len(CITIES)} AS city_idx,
+                        hash(CAST(i AS VARCHAR) || '-cat') % {len(CATEGORIES)} AS cat_idx,
+                        (hash(CAST(i AS VARCHAR) || '-x') % 1000001) / 1000000.0 - 0.5 AS dx,
+                        (hash(CAST(i AS VARCHAR) || '-y') % 1000001) / 1000000.0 - 0.5 AS dy
+                    FROM range({rows}) r(i)
+                )
+                SELECT
+                    cats.noun || ' ' || pts.i AS name,
+                    cats.category,
+                    CAST(pts.i % 500 AS VARCHAR) || ', Main Road, ' || cities.city AS address,
+                    cities.region,
+                    cities.postcode,
+                    ST_Point(cities.lon + pts.dx * {spread_deg}, cities.lat + pts.dy * {spread_deg}) AS geom
+                FROM pts
+                JOIN cities ON cities.idx = pts.city_idx
+                JOIN cats ON cats.idx = pts.cat_idx
+                ORDER BY category
+            ) TO '{output_path}' WITH (FORMAT PARQUET, CODEC ZSTD);
+        """)
+    finally:
+        con.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic POI GeoParquet for benchmarks.")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--output", default="data/bench/pois.geoparquet")
+    args = parser.parse_args()
+    generate_pois(args.output, rows=args.rows)
+    print(f"Wrote {args.rows} POIs to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Shared helpers for summarising benchmark runs.
+"""
+import json
+import math
+import sys
+
+
+def percentile(values: list[float], pct: float) -> float:
+    """Nearest-rank percentile; returns 0.0 for an empty list."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarise(values: list[float], scale: float = 1000.0) -> dict:
+    """Summarise timings given in seconds as milliseconds (or any other `scale`)."""
+    return {
+        "count": len(values),
+        "mean": round(sum(values) / len(values) * scale, 3) if values else 0.0,
+        "p50": round(percentile(values, 50) * scale, 3),
+        "p95": round(percentile(values, 95) * scale, 3),
+        "p99": round(percentile(values, 99) * scale, 3),
+        "max": round(max(values) * scale, 3) if values else 0.0,
+    }
+
+
+def peak_rss_mb() -> float | None:
+    """Peak resident set size of this process in MB, or None where `resource` is unavailable (Windows)."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS reports bytes
+    if sys.platform == "darwin":
+        return round(peak / (1024 * 1024), 1)
+    return round(peak / 1024, 1)
+
+
+def compare_to_baseline(report: dict, baseline_path: str, tolerance: float = 0.25, min_delta_ms: float = 1.0) -> list[str]:
+    """
+    Compare the p95 of every stage in `report` against a previously saved report.
+
+    Args:
+        report (dict): Report with a `stages` mapping of stage -> summary.
+        baseline_path (str): JSON file written by an earlier run.
+        tolerance (float): Allowed relative slowdown before a stage counts as regressed.
+        min_delta_ms (float): Ignore slowdowns smaller than this to keep noise out.
+
+    Returns:
+        list[str]: Human readable regression messages (empty when nothing regressed).
+    """
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+
+    regressions = []
+    for stage, summary in report["stages"].items():
+        previous = baseline.get("stages", {}).get(stage)
+        if not previous:
+            continue
+        old, new = previous["p95"], summary["p95"]
+        if new > old * (1 + tolerance) and new - old > min_delta_ms:
+            regressions.append(f"{stage}: p95 {old} -> {new}")
+    return regressions
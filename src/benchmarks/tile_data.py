@@ -0,0 +1,187 @@
+"""
+Synthesise a tiles.db with a `t1` buildings table shaped like the Overture export in notebook 16,
+or the Overture-shaped parquet it is built from.
+
+Usage:
+    python -m src.benchmarks.tile_data --rows 500000 --output data/bench/tiles.db
+    python -m src.benchmarks.tile_data --rows 500000 --overture-dir data/bench/overture
+"""
+import argparse
+import math
+import os
+import duckdb
+
+
+# Default centre matches the map in app.py (New York City)
+DEFAULT_CENTER = (-74.0060, 40.7128)
+
+# subtype -> classes, the same hierarchy the index page offers as filters
+CLASSES_BY_SUBTYPE = {
+    "residential": ["house", "garage", "detached", "apartments", "semidetached_house", "terrace", "residential"],
+    "commercial": ["retail", "commercial", "office", "hotel", "warehouse", "supermarket"],
+    "outbuilding": ["shed", "roof", "outbuilding", "carport"],
+    "education": ["school", "university", "college", "kindergarten"],
+    "industrial": ["industrial", "manufacture"],
+    "religious": ["church", "synagogue", "mosque", "temple"],
+    "transportation": ["parking", "transportation", "train_station"],
+    "civic": ["library", "fire_station", "post_office", "government"],
+    "medical": ["hospital"],
+}
+
+
+def lonlat_to_web_mercator(lon: float, lat: float) -> tuple[float, float]:
+    """Project WGS84 degrees to EPSG:3857 metres."""
+    x = lon * 20037508.34 / 180
+    y = math.log(math.tan((90 + lat) * math.pi / 360)) * 20037508.34 / math.pi
+    return x, y
+
+
+def _buildings_sql(rows: int, center: tuple[float, float], radius_m: float) -> str:
+    """
+    SELECT of `rows` synthetic buildings: centre x / y and footprint w / d in EPSG:3857 metres, plus subtype, class and height.
+
+    Buildings are denser near the centre and thin out towards `radius_m`, which gives
+    the mix of heavy downtown tiles and sparse suburban tiles seen in real data. All
+    values are hash-derived from the row number, so the output is deterministic.
+    """
+    cx, cy = lonlat_to_web_mercator(*center)
+    pairs = [(subtype, cls) for subtype, classes in CLASSES_BY_SUBTYPE.items() for cls in classes]
+    values = ",\n".join(f"({i}, '{subtype}', '{cls}')" for i, (subtype, cls) in enumerate(pairs))
+    return f"""
+        WITH kinds AS (
+            SELECT * FROM (VALUES {values}) t(idx, subtype, class)
+        ),
+        draws AS (
+            SELECT
+                i,
+                (hash(CAST(i AS VARCHAR) || '-r') % 1000001) / 1000000.0 AS u_r,
+                (hash(CAST(i AS VARCHAR) || '-a') % 1000001) / 1000000.0 AS u_a,
+                (hash(CAST(i AS VARCHAR) || '-w') % 1000001) / 1000000.0 AS u_w,
+                (hash(CAST(i AS VARCHAR) || '-d') % 1000001) / 1000000.0 AS u_d,
+                (hash(CAST(i AS VARCHAR) || '-h') % 1000001) / 1000000.0 AS u_h,
+                hash(CAST(i AS VARCHAR) || '-k') % {len(pairs)} AS kind_idx
+            FROM range({rows}) r(i)
+        ),
+        placed AS (
+            SELECT
+                *,
+                {cx} + {radius_m} * u_r * u_r * cos(2 * pi() * u_a) AS x,
+                {cy} + {radius_m} * u_r * u_r * sin(2 * pi() * u_a) AS y,
+                8 + 40 * u_w AS w,
+                8 + 30 * u_d AS d
+            FROM draws
+        )
+        SELECT
+            placed.i, x, y, w, d,
+            kinds.subtype,
+            kinds.class,
+            round(3 + 150 * pow(u_h, 3), 1) AS height
+        FROM placed
+        JOIN kinds ON kinds.idx = placed.kind_idx
+    """
+
+
+def generate_tiles_db(
+    db_path: str,
+    rows: int = 200_000,
+    center: tuple[float, float] = DEFAULT_CENTER,
+    radius_m: float = 25_000,
+    create_index: bool = True,
+):
+    """
+    Create (or replace) `t1` with `rows` rectangular building footprints in EPSG:3857.
+
+    Args:
+        db_path (str): DuckDB file to write.
+        rows (int): Number of buildings.
+        center (tuple[float, float]): (lon, lat) of the densest point.
+        radius_m (float): Maximum distance of a building from the centre in metres.
+        create_index (bool): Build the RTREE index on geometry, as notebook 16 does.
+    """
+    os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+    con = duckdb.connect(db_path)
+    try:
+        con.execute("INSTALL spatial; LOAD spatial;")
+        con.execute(f"""
+            CREATE OR REPLACE TABLE t1 AS
+            SELECT
+                ST_MakeEnvelope(x - w / 2, y - d / 2, x + w / 2, y + d / 2) AS geometry,
+                subtype,
+                class,
+                height
+            FROM ({_buildings_sql(rows, center, radius_m)})
+        """)
+        if create_index:
+            con.execute("CREATE INDEX t1_geometry_idx ON t1 USING RTREE (geometry);")
+        con.execute("CHECKPOINT")
+    finally:
+        con.close()
+
+
+def generate_overture_parquet(
+    out_dir: str,
+    rows: int = 200_000,
+    center: tuple[float, float] = DEFAULT_CENTER,
+    radius_m: float = 25_000,
+    files: int = 4,
+):
+    """
+    Write the same buildings as Overture-shaped parquet, for offline runs of src.tiles.build_tiles_db.
+
+    Files land in `out_dir/theme=buildings/type=building/` with WKB `geometry` in EPSG:4326,
+    the `bbox` struct and subtype, class and height, like the Overture release.
+
+    Args:
+        out_dir (str): Root directory of the fake release.
+        files (int): Number of parquet files the buildings are spread over.
+    """
+    part_dir = os.path.join(out_dir, "theme=buildings", "type=building")
+    os.makedirs(part_dir, exist_ok=True)
+    con = duckdb.connect()
+    try:
+        con.execute("INSTALL spatial; LOAD spatial;")
+        con.execute(f"""
+            CREATE TEMP TABLE buildings AS
+            SELECT i, ST_Transform(
+                       ST_MakeEnvelope(x - w / 2, y - d / 2, x + w / 2, y + d / 2),
+                       'EPSG:3857', 'EPSG:4326', always_xy := true
+                   ) AS geometry,
+                   subtype, class, height
+            FROM ({_buildings_sql(rows, center, radius_m)})
+        """)
+        for part in range(files):
+            con.execute(f"""
+                COPY (
+                    SELECT
+                        ST_AsWKB(geometry) AS geometry,
+                        {{'xmin': CAST(ST_XMin(geometry) AS FLOAT), 'xmax': CAST(ST_XMax(geometry) AS FLOAT),
+                          'ymin': CAST(ST_YMin(geometry) AS FLOAT), 'ymax': CAST(ST_YMax(geometry) AS FLOAT)}} AS bbox,
+                        subtype,
+                        class,
+                        height
+                    FROM buildings
+                    WHERE i % {files} = {part}
+                ) TO '{os.path.join(part_dir, f"part-{part:05d}.parquet")}' (FORMAT PARQUET, CODEC ZSTD)
+            """)
+    finally:
+        con.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic tiles.db for the tile server benchmark.")
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--output", default="data/bench/tiles.db")
+    parser.add_argument("--radius-m", type=float, default=25_000)
+    parser.add_argument("--no-index", action="store_true", help="Skip the RTREE index to compare plans.")
+    parser.add_argument("--overture-dir", help="Write Overture-shaped parquet here instead of a tiles.db.")
+    args = parser.parse_args()
+    if args.overture_dir:
+        generate_overture_parquet(args.overture_dir, rows=args.rows, radius_m=args.radius_m)
+        print(f"Wrote {args.rows} buildings to {args.overture_dir}")
+        return
+    generate_tiles_db(args.output, rows=args.rows, radius_m=args.radius_m, create_index=not args.no_index)
+    print(f"Wrote {args.rows} buildings to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
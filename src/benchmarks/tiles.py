@@ -0,0 +1,215 @@
+"""
+Load test for the Flask tile server in app.py.
+
+Replays pan/zoom viewport sequences across z10-z18 against `/tiles/{z}/{x}/{y}.pbf`
+with and without class/subtype filters, and times `/stats`. Runs against a
+synthetic tiles.db, which is generated when missing.
+
+Usage:
+    python -m src.benchmarks.tiles --rows 500000 --viewports 200 --concurrency 8
+"""
+import argparse
+import json
+import math
+import os
+import random
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+from src.benchmarks.tile_data import generate_tiles_db, DEFAULT_CENTER
+from src.benchmarks.stats import summarise, percentile, peak_rss_mb
+
+
+# Filter combinations the index page sends; None means no filter
+SCENARIOS = {
+    "unfiltered": {},
+    "subtype": {"subtype": "residential"},
+    "subtype+class": {"subtype": "commercial", "class": "office"},
+}
+
+
+def lonlat_to_tile_fraction(lon: float, lat: float, z: int) -> tuple[float, float]:
+    """Fractional XYZ tile coordinates of a WGS84 point at zoom `z`."""
+    n = 2 ** z
+    lat_rad = math.radians(lat)
+    x = (lon + 180.0) / 360.0 * n
+    y = (1.0 - math.asinh(math.tan(lat_rad)) / math.pi) / 2.0 * n
+    return x, y
+
+
+def viewport_tiles(lon: float, lat: float, z: int, width: int = 1280, height: int = 800) -> list[tuple[int, int, int]]:
+    """Tiles a map client requests to fill a `width` x `height` pixel viewport centred on (lon, lat)."""
+    fx, fy = lonlat_to_tile_fraction(lon, lat, z)
+    half_w, half_h = width / 512, height / 512  # viewport half-size in 256px tiles
+    tiles = []
+    for x in range(math.floor(fx - half_w), math.floor(fx + half_w) + 1):
+        for y in range(math.floor(fy - half_h), math.floor(fy + half_h) + 1):
+            tiles.append((z, x, y))
+    return tiles
+
+
+def viewport_sequence(
+    center: tuple[float, float] = DEFAULT_CENTER,
+    steps: int = 100,
+    seed: int = 42,
+    min_zoom: int = 10,
+    max_zoom: int = 18,
+    max_offset_deg: float = 0.2,
+) -> list[list[tuple[int, int, int]]]:
+    """
+    Simulate a user panning and zooming around `center`.
+
+    Each step either zooms in, zooms out or pans by up to half a viewport, and the
+    camera is pulled back whenever it drifts more than `max_offset_deg` from the centre.
+    """
+    rng = random.Random(seed)
+    lon, lat = center
+    z = 12
+    sequence = []
+    for _ in range(steps):
+        action = rng.random()
+        if action < 0.25 and z < max_zoom:
+            z += 1
+        elif action < 0.4 and z > min_zoom:
+            z -= 1
+        else:
+            deg_per_px = 360 / (256 * 2 ** z)
+            lon += rng.uniform(-640, 640) * deg_per_px
+            lat += rng.uniform(-400, 400) * deg_per_px * math.cos(math.radians(lat))
+        if abs(lon - center[0]) > max_offset_deg or abs(lat - center[1]) > max_offset_deg:
+            lon = (lon + center[0]) / 2
+            lat = (lat + center[1]) / 2
+        sequence.append(viewport_tiles(lon, lat, z))
+    return sequence
+
+
+def _tile_url(z: int, x: int, y: int, filters: dict) -> str:
+    query = "&".join(f"{k}={v}" for k, v in filters.items())
+    return f"/tiles/{z}/{x}/{y}.pbf" + (f"?{query}" if query else "")
+
+
+def run_benchmark(db_path: str, viewports: int = 100, concurrency: int = 4, seed: int = 42) -> dict:
+    """
+    Replay the same viewport sequence for every filter scenario.
+
+    Three passes per scenario:
+      1. DuckDB only: `render_tile` on a cursor, giving query time and tile bytes per tile.
+      2. HTTP serial: Flask test client, giving end-to-end latency per tile.
+      3. HTTP concurrent: `concurrency` clients draining the tile list, giving tiles/sec.
+    """
+    # app.py opens TILES_DB at import time, so point it at the benchmark database first
+    os.environ["TILES_DB"] = db_path
+    import app as tile_server
+
+    sequence = viewport_sequence(steps=viewports, seed=seed)
+    tiles = [tile for viewport in sequence for tile in viewport]
+    report = {"db_path": db_path, "viewports": viewports, "tiles_per_scenario": len(tiles), "scenarios": {}}
+
+    for name, filters in SCENARIOS.items():
+        ## 1. DuckDB time and tile size
+        duckdb_times, sizes, by_zoom = [], [], {}
+        with tile_server.pool.cursor() as cur:
+            for z, x, y in tiles:
+                start = perf_counter()
+                tile = tile_server.render_tile(cur, z, x, y, filters.get("class"), filters.get("subtype"))
+                elapsed = perf_counter() - start
+                duckdb_times.append(elapsed)
+                sizes.append(len(tile))
+                zoom_stats = by_zoom.setdefault(z, {"times": [], "sizes": []})
+                zoom_stats["times"].append(elapsed)
+                zoom_stats["sizes"].append(len(tile))
+
+        ## 2. Serial end-to-end latency
+        client = tile_server.app.test_client()
+        latencies = []
+        for z, x, y in tiles:
+            start = perf_counter()
+            response = client.get(_tile_url(z, x, y, filters))
+            latencies.append(perf_counter() - start)
+            assert response.status_code == 200, response.data
+
+        ## 3. Concurrent throughput
+        def _fetch(chunk):
+            worker_client = tile_server.app.test_client()
+            for z, x, y in chunk:
+                worker_client.get(_tile_url(z, x, y, filters))
+
+        chunks = [tiles[i::concurrency] for i in range(concurrency)]
+        start = perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            list(executor.map(_fetch, chunks))
+        wall = perf_counter() - start
+
+        report["scenarios"][name] = {
+            "filters": filters,
+            "duckdb_ms": summarise(duckdb_times),
+            "latency_ms": summarise(latencies),
+            "tile_bytes": summarise(sizes, scale=1),
+            "empty_tiles": sum(1 for s in sizes if s == 0),
+            "tiles_per_sec_serial": round(len(tiles) / sum(latencies), 1) if latencies else None,
+            "tiles_per_sec_concurrent": round(len(tiles) / wall, 1) if wall else None,
+            "by_zoom": {
+                z: {
+                    "tiles": len(stats["times"]),
+                    "duckdb_p95_ms": round(percentile(stats["times"], 95) * 1000, 3),
+                    "bytes_p95": percentile(stats["sizes"], 95),
+                    "bytes_max": max(stats["sizes"]),
+                }
+                for z, stats in sorted(by_zoom.items())
+            },
+        }
+
+    ## /stats for the same filters
+    client = tile_server.app.test_client()
+    stats_latency = {}
+    for name, filters in SCENARIOS.items():
+        query = "&".join(f"{k}={v}" for k, v in filters.items())
+        timings = []
+        for _ in range(20):
+            start = perf_counter()
+            client.get("/stats" + (f"?{query}" if query else ""))
+            timings.append(perf_counter() - start)
+        stats_latency[name] = summarise(timings)
+    report["stats_ms"] = stats_latency
+    report["peak_rss_mb"] = peak_rss_mb()
+    return report
+
+
+def print_report(report: dict):
+    print(f"{report['tiles_per_scenario']} tiles per scenario from {report['viewports']} viewports ({report['db_path']})")
+    for name, scenario in report["scenarios"].items():
+        latency, duck, size = scenario["latency_ms"], scenario["duckdb_ms"], scenario["tile_bytes"]
+        print(f"\n[{name}] {scenario['tiles_per_sec_serial']} tiles/s serial, "
+              f"{scenario['tiles_per_sec_concurrent']} tiles/s concurrent, {scenario['empty_tiles']} empty")
+        print(f"  latency ms  p50 {latency['p50']}  p95 {latency['p95']}  p99 {latency['p99']}")
+        print(f"  duckdb ms   p50 {duck['p50']}  p95 {duck['p95']}  p99 {duck['p99']}")
+        print(f"  tile bytes  mean {size['mean']}  p95 {size['p95']}  max {size['max']}")
+        for z, stats in scenario["by_zoom"].items():
+            print(f"    z{z:<3} tiles {stats['tiles']:<6} duckdb p95 {stats['duckdb_p95_ms']} ms  "
+                  f"bytes p95 {stats['bytes_p95']}  max {stats['bytes_max']}")
+    print("\n/stats ms: " + ", ".join(f"{name} p95 {s['p95']}" for name, s in report["stats_ms"].items()))
+    print(f"Peak RSS: {report['peak_rss_mb']} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the tile server against a synthetic tiles.db.")
+    parser.add_argument("--db-path", default="data/bench/tiles.db")
+    parser.add_argument("--rows", type=int, default=200_000, help="Buildings to synthesise when --db-path is missing.")
+    parser.add_argument("--viewports", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Write the JSON report here.")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db_path):
+        print(f"Generating {args.rows} synthetic buildings at {args.db_path}")
+        generate_tiles_db(args.db_path, rows=args.rows)
+
+    report = run_benchmark(args.db_path, args.viewports, args.concurrency, args.seed)
+    print_report(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
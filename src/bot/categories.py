@@ -0,0 +1,95 @@
+"""
+Resolve place-type words in a user question to exact FourSquare category labels.
+"""
+import re
+from src.utils.logger import logging
+from src.utils.metrics import record_cache
+
+
+# Words that never describe a place type and only add noise to the embedding lookup
+STOPWORDS = {
+    "a", "an", "the", "of", "for", "to", "and", "or", "is", "are", "be", "there",
+    "how", "many", "much", "what", "which", "where", "who", "list", "show", "find",
+    "give", "get", "tell", "me", "all", "some", "any", "down", "located", "count",
+    "number", "total", "can", "i", "we", "good", "nice", "best", "top", "please",
+}
+
+# Everything after the last of these is treated as the location part of the question
+LOCATION_PREPOSITIONS = ("in", "near", "around", "at", "across", "within")
+
+# Chroma's default distance is squared L2; on the unit-length text-embedding-3 vectors that is
+# 2 - 2 * cosine. 1.0 is a starting point, not a measured cut-off: calibrate it against the
+# category vector DB with `python -m src.benchmarks.category_filters --calibrate`, which prints
+# the distances of matching and unrelated labels and the threshold that separates them.
+DEFAULT_MAX_DISTANCE = 1.0
+
+
+class CategoryResolver:
+    """Looks up the closest category labels for a question in the category vector DB."""
+
+    def __init__(self, vector_db, k: int = 5, max_distance: float | None = DEFAULT_MAX_DISTANCE):
+        """
+        Args:
+            vector_db: Chroma vector store built by `create_vector_db_for_categories`.
+            k (int): Maximum number of category labels to return per question.
+            max_distance (float | None): Drop matches farther than this distance (None keeps all k).
+                When nothing is close enough, `resolve` returns [] and the prompt falls back to LIKE filters.
+        """
+        self.vector_db = vector_db
+        self.k = k
+        self.max_distance = max_distance
+        self._cache: dict[str, list[str]] = {}
+
+    @staticmethod
+    def extract_terms(question: str) -> str:
+        """Strip the location clause and filler words, leaving the place-type phrase."""
+        words = re.findall(r"[a-z0-9&'-]+", question.lower())
+        cut = len(words)
+        for i, word in enumerate(words):
+            if word in LOCATION_PREPOSITIONS and i > 0:
+                cut = i
+        terms = [w for w in words[:cut] if w not in STOPWORDS]
+        return " ".join(terms)
+
+    def resolve(self, question: str) -> list[str]:
+        """Return up to `k` exact category labels relevant to the question."""
+        terms = self.extract_terms(question)
+        if not terms:
+            return []
+        hit = terms in self._cache
+        record_cache("category_resolver", hit)
+        if hit:
+            return self._cache[terms]
+
+        labels = [label for label, _ in self.search(terms)]
+        logging.info(f"Resolved '{terms}' to categories: {labels}")
+        self._cache[terms] = labels
+        return labels
+
+    def search(self, terms: str) -> list[tuple[str, float]]:
+        """Up to `k` distinct labels for a place-type phrase with their distances, nearest first, within `max_distance`."""
+        matches = []
+        for doc, distance in self.vector_db.similarity_search_with_score(terms, k=self.k):
+            if self.max_distance is not None and distance > self.max_distance:
+                continue
+            if doc.page_content not in (label for label, _ in matches):
+                matches.append((doc.page_content, distance))
+        return matches
+
+
+def format_category_filter(labels: list[str]) -> str:
+    """
+    Render labels as a SQL condition on `category` that also matches their sub-categories.
+
+    A resolved "Dining and Drinking > Restaurant" must keep rows labelled
+    "Dining and Drinking > Restaurant > Indian Restaurant", so each label matches itself
+    and every label below it. Both are prefix tests, which still prune row groups of the
+    category-sorted export.
+    """
+    if not labels:
+        return "None"
+    conditions = []
+    for label in labels:
+        literal = label.replace("'", "''")
+        conditions.append(f"category = '{literal}' OR category LIKE '{literal} > %'")
+    return "(" + " OR ".join(conditions) + ")"
@@ -0,0 +1,176 @@
+"""
+LLM-free answers for templated questions ("how many X in Y", "list X in Y").
+
+The recogniser only answers when it is confident:
+
+- the question matches one of the templates;
+- the place type maps to labels in the category vocabulary of the data;
+- the location is the whole country or a known region, district or city.
+
+Anything else returns None and the bot falls back to the LLM pipeline. Matched
+questions run as parameterised DuckDB queries. Since output.geoparquet is sorted by
+category, the `category IN (...)` filter skips most row groups.
+"""
+import csv
+import os
+import re
+import threading
+from pydantic import BaseModel, Field
+from src.utils.logger import logging
+
+
+COUNT_PATTERN = re.compile(
+    r"^(?:how many|number of|count(?: of)?|total(?: number of)?)\s+(?P<what>.+?)"
+    r"(?:\s+(?:are|is))?(?:\s+there)?(?:\s+located)?\s+in\s+(?P<where>.+?)(?:\s+(?:are|is)\s+there)?$"
+)
+LIST_PATTERN = re.compile(
+    r"^(?:list|find|show|show me|which|what|give me)\s+(?:(?:all|some|the)\s+)?(?:(?P<limit>\d{1,3})\s+)?(?P<what>.+?)"
+    r"(?:\s+(?:are|is))?(?:\s+(?:located|there))?\s+in\s+(?P<where>.+?)$"
+)
+# Words that make a question more than a plain template; leave those to the LLM
+NOT_TEMPLATED = {"and", "or", "not", "near", "with", "without", "top", "best", "per", "by", "than", "between", "except", "within", "around"}
+WHOLE_COUNTRY = {"the country"}
+MAX_LIST_LIMIT = 100
+
+
+def singular(word: str) -> str:
+    """Crude English singular, enough to line plural questions up with category labels."""
+    if word.endswith("ies") and len(word) > 4:
+        return word[:-3] + "y"
+    if word.endswith(("ches", "shes", "sses", "xes")):
+        return word[:-2]
+    if word.endswith("s") and not word.endswith("ss") and len(word) > 3:
+        return word[:-1]
+    return word
+
+
+def _normalise(phrase: str) -> str:
+    return " ".join(singular(w) for w in re.findall(r"[a-z0-9&'-]+", phrase.lower()))
+
+
+class FastPathIntent(BaseModel):
+    intent: str = Field(..., description="'count' or 'list'")
+    place_type: str = Field(..., description="Place type as the user wrote it. Example: 'restaurants'")
+    categories: list[str] = Field(default_factory=list, description="Exact category labels matched for the place type.")
+    location: str | None = Field(default=None, description="Lower-cased location to filter on; None for the whole country.")
+    limit: int = Field(default=10, description="Rows to return for list questions.")
+
+
+class FastPathRecognizer:
+    """Matches templated questions against the category and location vocabularies and answers them in SQL."""
+
+    def __init__(self, pool, data_path: str, top_k: int = 10, exported_dir: str | None = "exported_data", country_name: str = "India"):
+        """
+        Args:
+            pool: DuckDBPool of the bot (queries run on its cursors).
+            data_path (str): POI parquet the bot queries.
+            top_k (int): Default number of rows for list questions.
+            exported_dir (str | None): Directory with railway_stations.csv and indian_airports.csv for place names.
+            country_name (str): Country the data covers, used for "in <country>" questions and answers.
+        """
+        self.pool = pool
+        self.data_path = data_path
+        self.top_k = top_k
+        self.exported_dir = exported_dir
+        self.country_name = country_name
+        self._whole_country = WHOLE_COUNTRY | {country_name.lower(), f"all of {country_name.lower()}"}
+        self._categories: dict[str, list[str]] | None = None
+        self._locations: set[str] | None = None
+        self._lock = threading.Lock()
+
+    def _load_vocabulary(self):
+        """Index category labels by every level of their hierarchy and collect known place names."""
+        with self._lock:
+            if self._categories is not None:
+                return
+            source = f"read_parquet('{self.data_path}')"
+            labels = [r[0] for r in self.pool.execute(f"SELECT DISTINCT category FROM {source} WHERE category IS NOT NULL")]
+            categories: dict[str, list[str]] = {}
+            for label in labels:
+                # "Dining and Drinking > Restaurant > Indian Restaurant" is found by any of its levels
+                for level in label.split(">"):
+                    categories.setdefault(_normalise(level), []).append(label)
+
+            locations = {r[0].strip().lower() for r in self.pool.execute(f"SELECT DISTINCT region FROM {source} WHERE region IS NOT NULL")}
+            for file_name, columns in (("railway_stations.csv", ("District", "State")), ("indian_airports.csv", ("Area served",))):
+                path = os.path.join(self.exported_dir, file_name) if self.exported_dir else None
+                if path and os.path.exists(path):
+                    with open(path, encoding="utf-8") as f:
+                        for row in csv.DictReader(f):
+                            locations.update((row.get(c) or "").strip().lower() for c in columns)
+            locations.discard("")
+
+            self._locations = locations
+            self._categories = categories
+            logging.info(f"Fast path vocabulary: {len(categories)} category terms, {len(locations)} locations")
+
+    def recognise(self, question: str) -> FastPathIntent | None:
+        """Return the intent when the question is a confident template match, else None."""
+        text = " ".join(re.findall(r"[a-z0-9&'-]+", question.lower()))
+        match, intent = COUNT_PATTERN.match(text), "count"
+        if match is None:
+            match, intent = LIST_PATTERN.match(text), "list"
+        if match is None:
+            return None
+        what, where = match.group("what"), match.group("where")
+        if NOT_TEMPLATED & set(what.split()) or NOT_TEMPLATED & set(where.split()):
+            return None
+
+        self._load_vocabulary()
+        categories = self._categories.get(_normalise(what))
+        if not categories:
+            return None
+        if where in self._whole_country:
+            location = None
+        elif where in self._locations:
+            location = where
+        else:
+            return None
+
+        limit = self.top_k
+        if intent == "list" and match.group("limit"):
+            limit = min(int(match.group("limit")), MAX_LIST_LIMIT)
+        return FastPathIntent(intent=intent, place_type=what, categories=sorted(set(categories)), location=location, limit=limit)
+
+    def _statement(self, intent: FastPathIntent) -> str:
+        """SQL for this intent shape, with `$n` placeholders for the categories, location and limit."""
+        n = len(intent.categories)
+        placeholders = ", ".join(f"${i + 1}" for i in range(n))
+        where = f"category IN ({placeholders})"
+        if intent.location:
+            where += f" AND (LOWER(region) LIKE ${n + 1} OR LOWER(address) LIKE ${n + 1})"
+        source = f"read_parquet('{self.data_path}')"
+        if intent.intent == "count":
+            sql = f"SELECT COUNT(*) AS count FROM {source} WHERE {where}"
+        else:
+            sql = f"SELECT name, category, address, region, postcode FROM {source} WHERE {where} ORDER BY name LIMIT ${n + 2 if intent.location else n + 1}"
+        return sql
+
+    def execute(self, intent: FastPathIntent) -> tuple[str, list]:
+        """Run the query with its values bound as parameters; returns the SQL (for display) and the rows."""
+        sql = self._statement(intent)
+        params = list(intent.categories)
+        if intent.location:
+            params.append(f"%{intent.location}%")
+        if intent.intent == "list":
+            params.append(intent.limit)
+        with self.pool.cursor() as cur:
+            rows = cur.execute(sql, params).fetchall()
+        return sql + ";", rows
+
+    def format_answer(self, intent: FastPathIntent, rows: list) -> str:
+        """Deterministic answer text for the result rows."""
+        place = intent.location.title() if intent.location else self.country_name
+        if intent.intent == "count":
+            count = rows[0][0] if rows else 0
+            if not count:
+                return f"I couldn't find any {intent.place_type} in {place}."
+            return f"There are {count:,} {intent.place_type} in {place}."
+
+        if not rows:
+            return f"I couldn't find any {intent.place_type} in {place}."
+        lines = [f"Here are {len(rows)} {intent.place_type} in {place}:"]
+        for i, (name, category, address, region, postcode) in enumerate(rows, start=1):
+            details = ", ".join(str(v) for v in (address, region, postcode) if v)
+            lines.append(f"{i}. {name} ({category.split('>')[-1].strip()})" + (f" - {details}" if details else ""))
+        return "\n".join(lines)
@@ -5,8 +5,19 @@ Main entry point for the AI bot.
 
 from pydantic import BaseModel, Field, field_validator
 import json
+import threading
+from time import perf_counter
 from langchain_core.prompts import ChatPromptTemplate
-from src.db.duckdb_utils import get_duckdb_connection
+from src.db.pool import DuckDBPool, data_key, get_pool
+from src.bot.categories import format_category_filter
+from src.bot.fast_path import FastPathRecognizer
+from src.langchain.prompts import PromptBuilder, TABLE_NAME, format_schema, response_usage
+from src.db.spatial_index import PoiIndex, load_anchors
+from src.utils.logger import logging
+from src.utils.metrics import (
+    LLM_SQL_SECONDS, LLM_ANSWER_SECONDS, DUCKDB_QUERY_SECONDS, QUERY_ROWS, BOT_QUESTIONS,
+    LLM_PROMPT_TOKENS, LLM_CACHED_PROMPT_TOKENS
+)
 import json
 
 
@@ -19,6 +30,10 @@ class State(BaseModel):
         default="",
         description="This is the data source of the table from where we will be querying using duckdb. This is a parquet file"
     )
+    categories: list[str] = Field(
+        default_factory=list,
+        description="Exact category labels resolved from the question through the category vector DB. Example: ['Dining and Drinking > Restaurant']"
+    )
     query: str = Field(
         default="",
         description="The generated DuckDB SQL query derived from the user's natural language question. Must conform to DuckDB's SQL syntax and conventions. Example: 'SELECT * FROM customers WHERE order_total > 100;'"
@@ -32,6 +47,28 @@ class State(BaseModel):
         description="The final natural language response generated for the user, summarizing or explaining the query results in a conversational manner. Example: 'Here are the customers with orders above 150.'"
     )
 
+    columns: list[str] = Field(
+        default_factory=list,
+        description="Column names of the result rows. Example: ['name', 'category', 'address']"
+    )
+    truncated: bool = Field(
+        default=False,
+        description="True when the query returned more rows than the bot keeps (max_result_rows); the rest can be spilled and paged."
+    )
+    fast_path: bool = Field(
+        default=False,
+        description="True when the question matched a template and was answered without the LLM."
+    )
+
+    timings: dict[str, float] = Field(
+        default_factory=dict,
+        description="Wall time in seconds spent in each pipeline stage for this question. Example: {'sql_generation': 0.82, 'duckdb_execution': 0.05}"
+    )
+    prompt_tokens: dict[str, int] = Field(
+        default_factory=dict,
+        description="Prompt tokens sent to the LLM per stage. Example: {'sql_generation': 612, 'answer_generation': 340}"
+    )
+
     @field_validator("result", mode="after")
     @classmethod
     def validate_result(cls, result: str) -> str:
@@ -54,26 +91,50 @@ class QueryOutput(BaseModel):
 class FourSquareChatBot:
     """NLP-to-SQL chatbot for querying DuckDB databases, optimized for Parquet files and FourSquare data."""
 
-    def __init__(self, data_path: str, columns: list[str], llm, query_prompt_template, database: str = ":memory:"):
+    def __init__(self, data_path: str, columns: list[str], llm, query_prompt_template, database: str = ":memory:", category_resolver=None, poi_index: PoiIndex | None = None, fast_path: bool = True, pool: DuckDBPool | None = None, country_name: str = "India", anchors_dir: str | None = "exported_data", max_result_rows: int = 1000):
         """
-        Initialize the chatbot with a DuckDB connection and schema.
+        Initialize the chatbot with a DuckDB connection pool and schema.
 
         Args:
             data_path (str): Path to the Parquet file (e.g., S3 URL or local path).
             columns (list[str]): List of column names to include in the schema.
             llm: Language model instance for generating SQL queries and answers.
-            database (str): DuckDB database path (default: ':memory:' for in-memory).
+            query_prompt_template: PromptBuilder (or any object with `invoke(values)`) for the SQL prompt.
+            database (str): DuckDB database path; selects the shared pool. The default ':memory:' becomes one in-memory database per data_path.
+            category_resolver: Optional CategoryResolver used to map place-type words to exact category labels.
+            poi_index (PoiIndex | None): Spatial index for nearby searches; built lazily from data_path when omitted.
+            fast_path (bool): Answer templated questions ("how many X in Y", "list X in Y") without the LLM.
+            pool (DuckDBPool | None): Pool to query through (default: the process-wide pool for `database`).
+            country_name (str): Country the data covers; used by the fast path's answers.
+            anchors_dir (str | None): Directory with the railway station and airport CSVs for `near=` searches (None: no anchors).
+            max_result_rows (int): Rows of a generated query's result kept in memory; larger results set `truncated`.
         """
         self.data_path = data_path
         self.columns = columns
         self.llm = llm
         self.query_prompt_template = query_prompt_template
-        self.conn = get_duckdb_connection(database=database)
+        self.category_resolver = category_resolver
+        self._poi_index = poi_index
+        self._poi_index_lock = threading.Lock()
+        self._anchors = None
+        self.anchors_dir = anchors_dir
+        self.max_result_rows = max_result_rows
+        if pool is None and database == ":memory:":
+            # One in-memory database per parquet, so bots over different data never share a `pois` view
+            database = f":memory:{data_key(data_path)}"
+        # Bots on the same data share one database instance (and its parquet metadata cache)
+        self.pool = pool or get_pool(database)
+        # Prompts and generated queries refer to the data as `pois` rather than repeating the path
+        self.pool.bind_view(TABLE_NAME, data_path)
+        # Answer prompts come from the same builder when it is one, so budgets are configured in one place
+        self.prompt_builder = query_prompt_template if isinstance(query_prompt_template, PromptBuilder) else PromptBuilder()
+        start = perf_counter()
         self.table_info = self._get_db_schema(limit=5)
+        self.schema_load_seconds = perf_counter() - start
+        self.fast_path = FastPathRecognizer(self.pool, data_path, exported_dir=anchors_dir, country_name=country_name) if fast_path else None
 
     def _get_db_schema(self, limit=5):
-        """Generate schema information from the Parquet file with sample values."""
-        data_schema = f"Columns:\n"
+        """Generate schema information from the Parquet file with sample values, within the schema token budget."""
         sql_query = f"SELECT {','.join(self.columns)} FROM read_parquet('{self.data_path}') WHERE 1=1"
         for column in self.columns:
             sql_query += f" AND {column} IS NOT NULL"
@@ -81,22 +142,38 @@ class FourSquareChatBot:
 
         sample_result = self._execute_sql(sql_query)['result']
         schema_details = self._execute_sql(f'DESCRIBE {sql_query}')['result']
-        for i, column in enumerate(self.columns):
-            data_type = schema_details[i][1]
-            sample_values = ",".join([str(r[i]) for r in sample_result])
-            data_schema += f"{i+1}. Name: {column} | Data Type: {data_type} | Sample values: {sample_values}"
-            data_schema += "\n"
-        return data_schema
-
-    def _execute_sql(self, sql_query: str) -> list:
-        """Execute a SQL query and return results."""
+        types = [schema_details[i][1] for i in range(len(self.columns))]
+        samples = [[r[i] for r in sample_result] for i in range(len(self.columns))]
+        return "Columns:\n" + format_schema(self.columns, types, samples, max_tokens=self.prompt_builder.schema_tokens)
+
+    def _execute_sql(self, sql_query: str, max_rows: int | None = None) -> list:
+        """Execute a SQL query and return results; with `max_rows`, at most that many rows are fetched."""
         try:
-            result = self.conn.execute(sql_query).fetchall()
+            if max_rows is not None:
+                # The LIMIT is pushed into the query so DuckDB stops early instead of materialising everything
+                sql_query = f"SELECT * FROM ({sql_query.strip().rstrip(';')}) LIMIT {max_rows + 1}"
+            with self.pool.cursor() as cur:
+                cur.execute(sql_query)
+                columns = [d[0] for d in cur.description] if cur.description else None
+                result = cur.fetchall()
 
-            return {"result": result, "error": None}
+            truncated = max_rows is not None and len(result) > max_rows
+            if truncated:
+                result = result[:max_rows]
+            return {"result": result, "columns": columns, "truncated": truncated, "error": None}
         except Exception as e:
             return f"Error executing SQL: {str(e)}"
 
+    def resolve_categories(self, state: State) -> list[str]:
+        """Resolve the question's place-type words to exact category labels before prompting."""
+        if self.category_resolver is None:
+            return []
+        try:
+            return self.category_resolver.resolve(state.question)
+        except Exception as e:
+            logging.error(f"Category resolution failed, falling back to LIKE filters: {e}")
+            return []
+
     def generate_sql_query(self, state: State) -> QueryOutput:
         """Generate a DuckDB SQL query from the user's question."""
         prompt = self.query_prompt_template.invoke(
@@ -104,10 +181,13 @@ class FourSquareChatBot:
                 "top_k": 10,
                 "table_info": self.table_info,
                 "input": state.question,
-                "data_path": self.data_path
+                "data_path": self.data_path,
+                "categories": format_category_filter(state.categories)
             }
         )
-        response = self.llm.invoke(prompt)
+        with LLM_SQL_SECONDS.time():
+            response = self.llm.invoke(prompt)
+        self._record_prompt_tokens(state, "sql_generation", response, prompt.to_string())
         cleaned_query = response.content.strip()
 
         if cleaned_query.startswith("```sql"):
@@ -122,36 +202,131 @@ class FourSquareChatBot:
         """Generate a conversational answer using query results."""
         # Execute the query and store JSON result
 
-        result = self._execute_sql(state.query)
+        start = perf_counter()
+        result = self._execute_sql(state.query, max_rows=self.max_result_rows)
+        state.timings["duckdb_execution"] = perf_counter() - start
+        DUCKDB_QUERY_SECONDS.observe(state.timings["duckdb_execution"], source="bot")
 
         if isinstance(result, str) and result.startswith("Error"):
             state.result = json.dumps({"error": result})
             state.answer = f"Sorry, I couldn't process your query due to an error: {result}"
         else:
             state.result = result['result']
+            state.columns = result["columns"] or []
+            state.truncated = result["truncated"]
+            QUERY_ROWS.observe(len(state.result), source="bot")
 
-            # Generate conversational answer
-            prompt = (
-                "Given the following user question, corresponding SQL query, "
-                "and SQL result, answer the user question in a conversational manner.\n\n"
-                f"Question: {state.question}\n"
-                f"SQL Query: {state.query}\n"
-                f"SQL Result: {state.result}"
-            )
+            # Generate conversational answer from a token-budgeted rendering of the result
+            prompt = self.prompt_builder.answer_prompt(state.question, state.query, result["columns"], state.result, state.truncated)
+            start = perf_counter()
             response = self.llm.invoke(prompt)
             state.answer = response.content
+            state.timings["answer_generation"] = perf_counter() - start
+            self._record_prompt_tokens(state, "answer_generation", response, prompt)
+            LLM_ANSWER_SECONDS.observe(state.timings["answer_generation"])
 
         return {"state": state}
 
+    @staticmethod
+    def _record_prompt_tokens(state: State, stage: str, response, prompt_text: str):
+        """Store the prompt tokens of one LLM call on the state and in the metrics."""
+        tokens, cached = response_usage(response, prompt_text)
+        state.prompt_tokens[stage] = tokens
+        LLM_PROMPT_TOKENS.observe(tokens, stage=stage)
+        if cached:
+            LLM_CACHED_PROMPT_TOKENS.inc(cached, stage=stage)
+
+    @property
+    def poi_index(self) -> PoiIndex:
+        """Spatial index over the POIs, loaded on first use."""
+        if self._poi_index is None:
+            with self._poi_index_lock:
+                if self._poi_index is None:
+                    self._poi_index = PoiIndex.from_parquet(self.data_path)
+        return self._poi_index
+
+    def find_nearby(
+        self,
+        lat: float | None = None,
+        lon: float | None = None,
+        near: str | None = None,
+        radius_km: float | None = None,
+        k: int = 10,
+        category: str | None = None,
+    ) -> dict:
+        """
+        Find POIs around a point or around a named railway station / airport from exported_data.
+
+        Args:
+            lat (float | None): Latitude of the search centre.
+            lon (float | None): Longitude of the search centre.
+            near (str | None): Station name/code or airport name/IATA/ICAO; overrides lat/lon.
+            radius_km (float | None): Return POIs within this radius (up to k); k nearest when omitted.
+            k (int): Maximum number of POIs to return.
+            category (str | None): Keep only categories containing this text, e.g. "Fuel Station".
+        """
+        anchor = None
+        if near:
+            if self._anchors is None:
+                self._anchors = load_anchors(self.anchors_dir) if self.anchors_dir else {}
+            anchor = self._anchors.get(near.strip().lower())
+            if anchor is None:
+                raise ValueError(f"Unknown railway station or airport: {near}")
+            lat, lon = anchor["lat"], anchor["lon"]
+        if lat is None or lon is None:
+            raise ValueError("Provide lat and lon, or the name of a railway station or airport")
+
+        if radius_km:
+            results = self.poi_index.within(lat, lon, radius_km, category=category, limit=k)
+        else:
+            results = self.poi_index.nearest(lat, lon, k=k, category=category)
+        QUERY_ROWS.observe(len(results), source="nearby")
+        return {"anchor": anchor, "center": {"lat": lat, "lon": lon}, "results": results}
+
+    def answer_fast_path(self, state: State) -> bool:
+        """Answer a templated question with a parameterised query; False when the LLM is needed."""
+        if self.fast_path is None:
+            return False
+        try:
+            start = perf_counter()
+            intent = self.fast_path.recognise(state.question)
+            state.timings["fast_path_recognition"] = perf_counter() - start
+            if intent is None:
+                return False
+            start = perf_counter()
+            state.query, rows = self.fast_path.execute(intent)
+            state.timings["duckdb_execution"] = perf_counter() - start
+        except Exception as e:
+            logging.error(f"Fast path failed, falling back to the LLM: {e}")
+            return False
+        DUCKDB_QUERY_SECONDS.observe(state.timings["duckdb_execution"], source="fast_path")
+        QUERY_ROWS.observe(len(rows), source="fast_path")
+        state.categories = intent.categories
+        state.result = rows
+        state.columns = ["count"] if intent.intent == "count" else ["name", "category", "address", "region", "postcode"]
+        state.answer = self.fast_path.format_answer(intent, rows)
+        state.fast_path = True
+        return True
+
     def process_question(self, question: str) -> dict:
         """Process a user question end-to-end and return the updated state."""
         state = State(question=question)
+
+        if self.answer_fast_path(state):
+            BOT_QUESTIONS.inc(route="fast_path")
+            logging.info(f"Answered question on the fast path with stage timings {state.timings}")
+            return {"state": state}
+        BOT_QUESTIONS.inc(route="llm")
+
+        start = perf_counter()
+        state.categories = self.resolve_categories(state)
+        state.timings["category_resolution"] = perf_counter() - start
+
+        start = perf_counter()
         query_output = self.generate_sql_query(state)
         state.query = query_output.query
+        state.timings["sql_generation"] = perf_counter() - start
+
         result = self.generate_answer(state)
+        logging.info(f"Answered question with stage timings {state.timings} and prompt tokens {state.prompt_tokens}")
         return result
-
-    def __del__(self):
-        """Clean up by closing the DuckDB connection."""
-        if hasattr(self, "conn"):
-            self.conn.close()
\ No newline at end of file
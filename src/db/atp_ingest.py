@@ -0,0 +1,225 @@
+"""
+Parallel ingestion of AllThePlaces spider GeoJSON files into a parquet POI store.
+
+Spider files are split into batches and handed to a pool of worker processes. Each
+worker keeps its own DuckDB connection with the country boundary loaded once, clips
+every file against it and writes the batch straight to a parquet part file, so no
+process ever holds more than one batch and nothing goes through pandas. A file that
+fails to read is recorded in `_failures.json` and the run carries on.
+
+Usage:
+    python -m src.db.atp_ingest --input "atp_data/output/*.geojson" --output-dir data/atp --boundary india.geojson
+"""
+import argparse
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from glob import glob
+from time import time
+import duckdb
+from src.db.boundary_mask import BoundaryMask
+from src.utils.logger import logging
+
+
+# Per-process state, created once by `_init_worker`
+_WORKER_CON = None
+_BOUNDARY_BBOX = None
+_BOUNDARY_MASK = None
+
+
+def _init_worker(boundary_path: str, mask_path: str | None = None):
+    """Open the worker's DuckDB connection and prepare the clipping boundary."""
+    global _WORKER_CON, _BOUNDARY_BBOX, _BOUNDARY_MASK
+    con = duckdb.connect()
+    # One DuckDB thread per worker process; the pool provides the parallelism
+    con.execute("SET threads = 1;")
+    con.execute("LOAD spatial;")
+    _WORKER_CON = con
+
+    if mask_path:
+        # Pre-tiled mask: most features are decided by a cell lookup, see src/db/boundary_mask.py
+        _BOUNDARY_MASK = BoundaryMask.load(mask_path)
+        _BOUNDARY_MASK.register(con)
+        return
+
+    # Split the boundary into its polygons, each with its own bbox, so a point only
+    # pays for an exact test against the one or two polygons whose bbox contains it
+    con.execute(f"""
+        CREATE TABLE boundary_parts AS
+        WITH parts AS (
+            SELECT UNNEST(ST_Dump(ST_MakeValid(geom)), recursive := true)
+            FROM ST_Read('{boundary_path}')
+        )
+        SELECT
+            geom,
+            ST_XMin(geom) AS xmin, ST_YMin(geom) AS ymin,
+            ST_XMax(geom) AS xmax, ST_YMax(geom) AS ymax
+        FROM parts
+    """)
+    _BOUNDARY_BBOX = con.execute(
+        "SELECT MIN(xmin), MIN(ymin), MAX(xmax), MAX(ymax) FROM boundary_parts"
+    ).fetchone()
+
+
+def _clip_filter(alias: str) -> str:
+    """WHERE clause keeping features of `alias` that intersect the boundary."""
+    if _BOUNDARY_MASK is not None:
+        # Features are placed by their centroid (ATP spiders emit points almost exclusively)
+        point = f"ST_Centroid({alias}.geom)"
+        return _BOUNDARY_MASK.sql_filter(f"ST_X({point})", f"ST_Y({point})")
+
+    xmin, ymin, xmax, ymax = _BOUNDARY_BBOX
+    return f"""
+        ST_XMax({alias}.geom) >= {xmin} AND ST_XMin({alias}.geom) <= {xmax}
+        AND ST_YMax({alias}.geom) >= {ymin} AND ST_YMin({alias}.geom) <= {ymax}
+        AND EXISTS (
+            SELECT 1 FROM boundary_parts b
+            WHERE ST_XMax({alias}.geom) >= b.xmin AND ST_XMin({alias}.geom) <= b.xmax
+              AND ST_YMax({alias}.geom) >= b.ymin AND ST_YMin({alias}.geom) <= b.ymax
+              AND ST_Intersects(b.geom, {alias}.geom)
+        )
+    """
+
+
+def _ingest_batch(batch_id: int, files: list[str], output_dir: str) -> dict:
+    """Clip every file of a batch and write the survivors to one parquet part."""
+    con = _WORKER_CON
+    tables, failures, rows = [], [], 0
+    for i, file_path in enumerate(files):
+        spider = os.path.splitext(os.path.basename(file_path))[0]
+        table = f"clipped_{i}"
+        try:
+            con.execute(f"""
+                CREATE OR REPLACE TEMP TABLE {table} AS
+                SELECT '{spider.replace("'", "''")}' AS spider, poi.*
+                FROM ST_Read('{file_path}') AS poi
+                WHERE {_clip_filter('poi')}
+            """)
+            count = con.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+            if count:
+                tables.append(table)
+                rows += count
+        except Exception as e:
+            failures.append({"file": file_path, "error": str(e)})
+
+    output_path = None
+    if tables:
+        # Spiders expose different properties, so align the batch by column name
+        union = " UNION ALL BY NAME ".join(f"SELECT * FROM {t}" for t in tables)
+        output_path = os.path.join(output_dir, f"part-{batch_id:05d}.parquet")
+        con.execute(f"COPY ({union}) TO '{output_path}' WITH (FORMAT PARQUET, CODEC ZSTD);")
+
+    for i in range(len(files)):
+        con.execute(f"DROP TABLE IF EXISTS clipped_{i}")
+
+    return {
+        "batch_id": batch_id,
+        "files": len(files),
+        "bytes": sum(os.path.getsize(f) for f in files if os.path.exists(f)),
+        "rows": rows,
+        "output": output_path,
+        "failures": failures,
+    }
+
+
+def ingest_atp(
+    input_glob: str,
+    output_dir: str,
+    boundary_path: str = "india.geojson",
+    workers: int | None = None,
+    batch_size: int = 32,
+    mask_path: str | None = None,
+) -> dict:
+    """
+    Clip all spider files matching `input_glob` to the boundary and write parquet parts.
+
+    Args:
+        input_glob (str): Glob for the spider GeoJSON files, e.g. "atp_data/output/*.geojson".
+        output_dir (str): Directory for `part-*.parquet` files and the failure manifest.
+        boundary_path (str): Boundary readable by ST_Read (GeoJSON, GeoPackage, ...).
+        workers (int | None): Worker processes (default: all cores).
+        batch_size (int): Files per task; larger batches mean fewer, bigger parts.
+        mask_path (str | None): Saved BoundaryMask (.npz) to clip with instead of the raw boundary.
+
+    Returns:
+        dict: Summary with file, row and failure counts.
+    """
+    start_time = time()
+    files = sorted(glob(input_glob))
+    os.makedirs(output_dir, exist_ok=True)
+    # Clear parts from an earlier run so the store only reflects this one
+    for stale in glob(os.path.join(output_dir, "part-*.parquet")):
+        os.remove(stale)
+
+    batches = [files[i:i + batch_size] for i in range(0, len(files), batch_size)]
+    logging.info(f"Ingesting {len(files)} spider files in {len(batches)} batches")
+
+    rows, processed, total_bytes, failures = 0, 0, 0, []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(boundary_path, mask_path)) as executor:
+        futures = [executor.submit(_ingest_batch, i, batch, output_dir) for i, batch in enumerate(batches)]
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                # A crashed batch must not take the run down; its files are reported as failed
+                batch = batches[futures.index(future)]
+                failures.extend({"file": f, "error": f"batch failed: {e}"} for f in batch)
+                continue
+            rows += result["rows"]
+            processed += result["files"]
+            total_bytes += result["bytes"]
+            failures.extend(result["failures"])
+            elapsed = time() - start_time
+            logging.info(
+                f"{processed}/{len(files)} files, {rows} rows, "
+                f"{processed / elapsed:.1f} files/s, {total_bytes / elapsed / 1e6:.1f} MB/s"
+            )
+
+    with open(os.path.join(output_dir, "_failures.json"), "w") as f:
+        json.dump(failures, f, indent=2)
+
+    summary = {
+        "files": len(files),
+        "rows": rows,
+        "failed_files": len(failures),
+        "seconds": round(time() - start_time, 2),
+    }
+    logging.info(f"ATP ingestion finished: {summary}")
+    return summary
+
+
+def load_into_duckdb(parts_dir: str, db_path: str, table: str = "atp_pois"):
+    """Materialise the parquet parts as one DuckDB table (columns aligned by name)."""
+    con = duckdb.connect(db_path)
+    try:
+        con.execute("INSTALL spatial; LOAD spatial;")
+        con.execute(f"""
+            CREATE OR REPLACE TABLE {table} AS
+            SELECT * FROM read_parquet('{os.path.join(parts_dir, "part-*.parquet")}', union_by_name = true)
+        """)
+    finally:
+        con.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest AllThePlaces spider GeoJSON files in parallel.")
+    parser.add_argument("--input", default="atp_data/output/*.geojson")
+    parser.add_argument("--output-dir", default="data/atp")
+    parser.add_argument("--boundary", default="india.geojson")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--mask", help="Saved boundary mask (.npz) from src.db.boundary_mask; replaces --boundary.")
+    parser.add_argument("--duckdb", help="Also load the parts into this DuckDB file as table atp_pois.")
+    args = parser.parse_args()
+
+    # Make sure the extension is installed before workers try to LOAD it
+    duckdb.connect().execute("INSTALL spatial;")
+
+    summary = ingest_atp(args.input, args.output_dir, args.boundary, args.workers, args.batch_size, args.mask)
+    print(summary)
+    if args.duckdb:
+        load_into_duckdb(args.output_dir, args.duckdb)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,358 @@
+"""
+Pre-tiled country / disputed-area masks for fast point-in-boundary filtering.
+
+The boundary's bounding box is cut into a regular grid, and each cell is marked as
+one of three states:
+
+- outside (0): no part of the boundary reaches the cell.
+- inside (1): the whole cell lies within the boundary.
+- boundary (2): an edge of the boundary passes through the cell.
+
+A point in an inside or outside cell is answered by an array lookup. Only points
+in boundary cells pay for an exact test:
+
+- in numpy, against just the edges that cross the point's grid row;
+- in SQL, against the small piece of the boundary clipped to that cell.
+
+Polygons are evaluated with the even-odd rule, so holes are handled. Overlapping
+features should be unioned first.
+
+Usage:
+    python -m src.db.boundary_mask --boundary india.geojson --cell-deg 0.05 --output data/masks/india.npz
+"""
+import argparse
+import json
+import math
+import os
+from time import time
+import numpy as np
+from src.utils.logger import logging
+
+
+OUTSIDE, INSIDE, BOUNDARY = 0, 1, 2
+
+
+def _rings(geometry: dict) -> list[np.ndarray]:
+    """Every linear ring of a GeoJSON geometry, feature or collection as an (n, 2) array."""
+    kind = geometry.get("type")
+    if kind == "FeatureCollection":
+        return [ring for feature in geometry["features"] for ring in _rings(feature)]
+    if kind == "Feature":
+        return _rings(geometry["geometry"]) if geometry.get("geometry") else []
+    if kind == "GeometryCollection":
+        return [ring for part in geometry["geometries"] for ring in _rings(part)]
+    if kind == "Polygon":
+        polygons = [geometry["coordinates"]]
+    elif kind == "MultiPolygon":
+        polygons = geometry["coordinates"]
+    else:
+        return []
+    rings = []
+    for polygon in polygons:
+        for ring in polygon:
+            coords = np.asarray(ring, dtype=np.float64)[:, :2]
+            if len(coords) >= 3:
+                if not np.array_equal(coords[0], coords[-1]):
+                    coords = np.vstack([coords, coords[:1]])
+                rings.append(coords)
+    return rings
+
+
+class BoundaryMask:
+    """Grid of inside/outside/boundary cells plus the edges needed for exact tests."""
+
+    def __init__(self, geometry: dict, cell_deg: float = 0.05):
+        """
+        Args:
+            geometry (dict): GeoJSON Polygon/MultiPolygon, Feature or FeatureCollection in EPSG:4326.
+            cell_deg (float): Grid cell size in degrees; smaller cells mean fewer exact tests but a bigger mask.
+        """
+        start_time = time()
+        self.geometry = geometry
+        self.cell_deg = cell_deg
+
+        rings = _rings(geometry)
+        if not rings:
+            raise ValueError("Boundary geometry has no polygon rings")
+        # Every ring segment as (x1, y1, x2, y2)
+        self.edges = np.concatenate([np.hstack([r[:-1], r[1:]]) for r in rings])
+
+        points = np.concatenate(rings)
+        self.x0, self.y0 = points.min(axis=0) - cell_deg / 2
+        self.ncols = int(math.ceil((points[:, 0].max() - self.x0) / cell_deg)) + 1
+        self.nrows = int(math.ceil((points[:, 1].max() - self.y0) / cell_deg)) + 1
+
+        boundary = self._boundary_cells()
+        inside = self._inside_cells()
+        self.states = np.where(boundary, BOUNDARY, np.where(inside, INSIDE, OUTSIDE)).astype(np.int8)
+        self._index_row_edges()
+
+        counts = np.bincount(self.states.ravel(), minlength=3)
+        logging.info(
+            f"Built {self.nrows}x{self.ncols} boundary mask in {time() - start_time:.2f} seconds: "
+            f"{counts[INSIDE]} inside, {counts[BOUNDARY]} boundary, {counts[OUTSIDE]} outside cells"
+        )
+
+    ## Construction
+
+    def _boundary_cells(self) -> np.ndarray:
+        """Cells touched by any edge: edges are sampled at half a cell and the hits dilated by one cell."""
+        x1, y1, x2, y2 = self.edges.T
+        lengths = np.hypot(x2 - x1, y2 - y1)
+        samples = np.maximum(np.ceil(lengths / (self.cell_deg / 2)).astype(np.int64), 1) + 1
+        edge_of_sample = np.repeat(np.arange(len(self.edges)), samples)
+        starts = np.cumsum(samples) - samples
+        t = (np.arange(samples.sum()) - np.repeat(starts, samples)) / np.repeat(samples - 1, samples)
+        xs = x1[edge_of_sample] + t * (x2 - x1)[edge_of_sample]
+        ys = y1[edge_of_sample] + t * (y2 - y1)[edge_of_sample]
+
+        hit = np.zeros((self.nrows, self.ncols), dtype=bool)
+        rows, cols = self._cells(xs, ys)
+        hit[rows, cols] = True
+
+        # A segment clipping a cell corner between two samples lands in a neighbour of a sampled cell
+        dilated = hit.copy()
+        dilated[1:, :] |= hit[:-1, :]
+        dilated[:-1, :] |= hit[1:, :]
+        dilated[:, 1:] |= dilated[:, :-1].copy()
+        dilated[:, :-1] |= dilated[:, 1:].copy()
+        return dilated
+
+    def _inside_cells(self) -> np.ndarray:
+        """Even-odd scanline fill through the cell centres of each grid row."""
+        x1, y1, x2, y2 = self.edges.T
+        centers_x = self.x0 + (np.arange(self.ncols) + 0.5) * self.cell_deg
+        inside = np.zeros((self.nrows, self.ncols), dtype=bool)
+        for row in range(self.nrows):
+            yc = self.y0 + (row + 0.5) * self.cell_deg
+            crossing = (y1 <= yc) != (y2 <= yc)
+            if not crossing.any():
+                continue
+            xs = x1[crossing] + (yc - y1[crossing]) * (x2 - x1)[crossing] / (y2 - y1)[crossing]
+            inside[row] = np.searchsorted(np.sort(xs), centers_x) % 2 == 1
+        return inside
+
+    def _index_row_edges(self):
+        """CSR list of the edges whose y-range overlaps each grid row, for exact tests."""
+        y_lo = np.minimum(self.edges[:, 1], self.edges[:, 3])
+        y_hi = np.maximum(self.edges[:, 1], self.edges[:, 3])
+        row_lo = np.clip(((y_lo - self.y0) // self.cell_deg).astype(np.int64), 0, self.nrows - 1)
+        row_hi = np.clip(((y_hi - self.y0) // self.cell_deg).astype(np.int64), 0, self.nrows - 1)
+        spans = row_hi - row_lo + 1
+        edge_ids = np.repeat(np.arange(len(self.edges)), spans)
+        rows = np.repeat(row_lo, spans) + (np.arange(spans.sum()) - np.repeat(np.cumsum(spans) - spans, spans))
+        order = np.argsort(rows, kind="stable")
+        self.row_edge_ids = edge_ids[order]
+        self.row_edge_offsets = np.searchsorted(rows[order], np.arange(self.nrows + 1))
+
+    ## Lookups
+
+    def _cells(self, lon: np.ndarray, lat: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        rows = np.clip(((lat - self.y0) // self.cell_deg).astype(np.int64), 0, self.nrows - 1)
+        cols = np.clip(((lon - self.x0) // self.cell_deg).astype(np.int64), 0, self.ncols - 1)
+        return rows, cols
+
+    def cell_states(self, lon, lat) -> np.ndarray:
+        """OUTSIDE / INSIDE / BOUNDARY state of the cell each point falls in."""
+        lon = np.asarray(lon, dtype=np.float64)
+        lat = np.asarray(lat, dtype=np.float64)
+        rows, cols = self._cells(lon, lat)
+        states = self.states[rows, cols]
+        off_grid = (
+            (lon < self.x0) | (lon >= self.x0 + self.ncols * self.cell_deg)
+            | (lat < self.y0) | (lat >= self.y0 + self.nrows * self.cell_deg)
+        )
+        states[off_grid] = OUTSIDE
+        return states
+
+    def _exact(self, lon: np.ndarray, lat: np.ndarray, chunk: int = 5_000_000) -> np.ndarray:
+        """Even-odd ray cast, one grid row at a time, against only that row's edges."""
+        result = np.zeros(len(lon), dtype=bool)
+        rows, _ = self._cells(lon, lat)
+        for row in np.unique(rows):
+            members = np.nonzero(rows == row)[0]
+            edges = self.edges[self.row_edge_ids[self.row_edge_offsets[row]:self.row_edge_offsets[row + 1]]]
+            if not len(edges):
+                continue
+            x1, y1, x2, y2 = (c[None, :] for c in edges.T)
+            step = max(1, chunk // len(edges))
+            for start in range(0, len(members), step):
+                idx = members[start:start + step]
+                px, py = lon[idx, None], lat[idx, None]
+                crossing = (y1 <= py) != (y2 <= py)
+                with np.errstate(divide="ignore", invalid="ignore"):
+                    x_at = x1 + (py - y1) * (x2 - x1) / (y2 - y1)
+                result[idx] = (crossing & (x_at > px)).sum(axis=1) % 2 == 1
+        return result
+
+    def contains(self, lon, lat) -> np.ndarray:
+        """True for points inside the boundary; exact tests only run for boundary-cell points."""
+        lon = np.asarray(lon, dtype=np.float64)
+        lat = np.asarray(lat, dtype=np.float64)
+        states = self.cell_states(lon, lat)
+        result = states == INSIDE
+        boundary = np.nonzero(states == BOUNDARY)[0]
+        if len(boundary):
+            result[boundary] = self._exact(lon[boundary], lat[boundary])
+        return result
+
+    ## SQL integration
+
+    def register(self, con, name: str = "boundary_mask"):
+        """
+        Create temp table `name` (cell_id, state, piece) in a DuckDB connection with spatial loaded.
+
+        Only inside and boundary cells are stored; `piece` is the boundary clipped to the
+        cell and is only set for boundary cells. The table lives as long as the connection,
+        so registering against a persistent database (tiles.db) leaves nothing in the file.
+        """
+        import pandas as pd
+
+        flat = self.states.ravel()
+        cells = np.nonzero(flat != OUTSIDE)[0]
+        con.register(f"_{name}_cells", pd.DataFrame({"cell_id": cells.astype(np.int64), "state": flat[cells]}))
+        con.execute(
+            f"CREATE OR REPLACE TEMP TABLE _{name}_geom AS SELECT ST_GeomFromGeoJSON(?) AS geom",
+            [json.dumps(self._union_geometry())],
+        )
+        size = self.cell_deg
+        con.execute(f"""
+            CREATE OR REPLACE TEMP TABLE {name} AS
+            SELECT
+                c.cell_id,
+                c.state,
+                CASE WHEN c.state = {BOUNDARY} THEN ST_Intersection(
+                    ST_MakeEnvelope(
+                        {self.x0} + (c.cell_id % {self.ncols}) * {size},
+                        {self.y0} + (c.cell_id // {self.ncols}) * {size},
+                        {self.x0} + (c.cell_id % {self.ncols} + 1) * {size},
+                        {self.y0} + (c.cell_id // {self.ncols} + 1) * {size}
+                    ),
+                    g.geom
+                ) END AS piece
+            FROM _{name}_cells c, _{name}_geom g
+        """)
+        con.unregister(f"_{name}_cells")
+        con.execute(f"DROP TABLE _{name}_geom")
+
+    def sql_filter(self, x: str, y: str, name: str = "boundary_mask") -> str:
+        """
+        SQL predicate that is true when point (x, y) lies in the boundary registered as `name`.
+
+        Example:
+            f"SELECT * FROM pois WHERE {mask.sql_filter('ST_X(geom)', 'ST_Y(geom)')}"
+        """
+        size = self.cell_deg
+        x_max = self.x0 + self.ncols * size
+        y_max = self.y0 + self.nrows * size
+        cell_id = f"CAST(floor(({y} - {self.y0}) / {size}) AS BIGINT) * {self.ncols} + CAST(floor(({x} - {self.x0}) / {size}) AS BIGINT)"
+        return f"""(
+            {x} >= {self.x0} AND {x} < {x_max} AND {y} >= {self.y0} AND {y} < {y_max}
+            AND EXISTS (
+                SELECT 1 FROM {name} m
+                WHERE m.cell_id = {cell_id}
+                  AND (m.state = {INSIDE} OR ST_Intersects(m.piece, ST_Point({x}, {y})))
+            )
+        )"""
+
+    def _union_geometry(self) -> dict:
+        """The boundary as a single GeoJSON geometry (features flattened into a MultiPolygon)."""
+        geometry = self.geometry
+        if geometry.get("type") in ("FeatureCollection", "Feature", "GeometryCollection"):
+            polygons = []
+
+            def _collect(g):
+                kind = g.get("type")
+                if kind == "FeatureCollection":
+                    for feature in g["features"]:
+                        _collect(feature)
+                elif kind == "Feature" and g.get("geometry"):
+                    _collect(g["geometry"])
+                elif kind == "GeometryCollection":
+                    for part in g["geometries"]:
+                        _collect(part)
+                elif kind == "Polygon":
+                    polygons.append(g["coordinates"])
+                elif kind == "MultiPolygon":
+                    polygons.extend(g["coordinates"])
+
+            _collect(geometry)
+            geometry = {"type": "MultiPolygon", "coordinates": polygons}
+        return geometry
+
+    ## Persistence
+
+    def save(self, path: str):
+        """Write the mask to a compressed .npz file."""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        np.savez_compressed(
+            path,
+            states=self.states,
+            edges=self.edges,
+            row_edge_ids=self.row_edge_ids,
+            row_edge_offsets=self.row_edge_offsets,
+            grid=np.array([self.x0, self.y0, self.cell_deg, self.nrows, self.ncols], dtype=np.float64),
+            geometry=np.array(json.dumps(self.geometry)),
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "BoundaryMask":
+        """Read a mask written by `save` without rebuilding it."""
+        data = np.load(path)
+        mask = cls.__new__(cls)
+        mask.states = data["states"]
+        mask.edges = data["edges"]
+        mask.row_edge_ids = data["row_edge_ids"]
+        mask.row_edge_offsets = data["row_edge_offsets"]
+        x0, y0, cell_deg, nrows, ncols = data["grid"]
+        mask.x0, mask.y0, mask.cell_deg = float(x0), float(y0), float(cell_deg)
+        mask.nrows, mask.ncols = int(nrows), int(ncols)
+        mask.geometry = json.loads(str(data["geometry"]))
+        return mask
+
+    @classmethod
+    def from_file(cls, path: str, cell_deg: float = 0.05, where: str | None = None) -> "BoundaryMask":
+        """
+        Build a mask from a boundary file.
+
+        GeoJSON is parsed directly; other formats (GeoParquet such as docs/India_land.parquet,
+        GeoPackage, shapefiles) are read through DuckDB spatial, optionally filtered by `where`.
+        """
+        if path.lower().endswith((".geojson", ".json")) and where is None:
+            with open(path, encoding="utf-8") as f:
+                return cls(json.load(f), cell_deg=cell_deg)
+
+        from src.db.duckdb_utils import get_duckdb_connection, geometry_expr
+
+        con = get_duckdb_connection(database=":memory:")
+        try:
+            if path.lower().endswith(".parquet"):
+                source = f"read_parquet('{path}')"
+                geom = geometry_expr(con, source, column="geometry")
+            else:
+                source = f"ST_Read('{path}')"
+                geom = "geom"
+            where_clause = f"WHERE {where}" if where else ""
+            geojson = con.execute(
+                f"SELECT ST_AsGeoJSON(ST_Union_Agg(ST_MakeValid({geom}))) FROM {source} {where_clause}"
+            ).fetchone()[0]
+        finally:
+            con.close()
+        return cls(json.loads(geojson), cell_deg=cell_deg)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build a tiled boundary mask for fast point-in-boundary filtering.")
+    parser.add_argument("--boundary", default="india.geojson")
+    parser.add_argument("--where", help="Row filter for multi-feature files, e.g. \"Name = 'India'\"")
+    parser.add_argument("--cell-deg", type=float, default=0.05)
+    parser.add_argument("--output", default="data/masks/india.npz")
+    args = parser.parse_args()
+
+    mask = BoundaryMask.from_file(args.boundary, cell_deg=args.cell_deg, where=args.where)
+    mask.save(args.output)
+    print(f"Saved {mask.nrows}x{mask.ncols} mask to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+"""
+Multi-country build of the bot's artefacts, parameterised by ISO country code.
+
+The global places dataset is scanned once. That pass writes every wanted country
+(or every country) into a local staging area partitioned by `country`. Each
+country is then built from its own partition only, producing:
+
+    data/countries/<ISO>/output.geoparquet    POIs sorted by category (as the bot expects)
+    data/countries/<ISO>/boundary_mask.npz    when a boundary file is available
+    data/countries/<ISO>/categories.json      distinct category labels
+    data/countries/<ISO>/vector_db/chroma-*   category embeddings (optional)
+    data/countries/<ISO>/country.json         manifest read by src.langchain.pipeline
+
+A country that is already staged is never scanned for again, so adding it later costs
+only its own partition.
+
+Usage:
+    python -m src.db.country_build --countries IN LK NP --boundary IN=india.geojson
+    python -m src.db.country_build --countries IN --stage-all --no-vector-db
+"""
+import argparse
+import json
+import os
+from glob import glob
+from time import time
+import duckdb
+from src.db.boundary_mask import BoundaryMask
+from src.db.duckdb_utils import create_vector_db_for_categories
+from src.utils.logger import logging
+
+
+FSQ_PLACES_PATH = 's3://fsq-os-places-us-east-1/release/dt=2025-09-09/places/parquet/places-*.zstd.parquet'
+COUNTRIES_DIR = os.path.join("data", "countries")
+STAGING_DIR = os.path.join("data", "staging", "places")
+
+# Names used in prompts and answers; other codes fall back to the ISO code itself
+COUNTRY_NAMES = {
+    "IN": "India", "LK": "Sri Lanka", "NP": "Nepal", "BD": "Bangladesh", "BT": "Bhutan",
+    "PK": "Pakistan", "AE": "United Arab Emirates", "SG": "Singapore", "ID": "Indonesia",
+    "GB": "United Kingdom", "US": "United States",
+}
+
+
+def country_name(iso: str) -> str:
+    return COUNTRY_NAMES.get(iso.upper(), iso.upper())
+
+
+def country_dir(iso: str, countries_dir: str = COUNTRIES_DIR) -> str:
+    return os.path.join(countries_dir, iso.upper())
+
+
+def staged_countries(staging_dir: str = STAGING_DIR) -> set[str]:
+    """ISO codes that already have a partition in the staging area."""
+    return {os.path.basename(p).split("=", 1)[1] for p in glob(os.path.join(staging_dir, "country=*"))}
+
+
+def stage_places(places_path: str, countries: list[str] | None, staging_dir: str = STAGING_DIR) -> dict:
+    """
+    Scan the global dataset once and write one parquet partition per country.
+
+    Args:
+        places_path (str): Source places parquet (glob or S3 path).
+        countries (list[str] | None): Countries to stage; None stages every country in the dataset.
+        staging_dir (str): Hive-partitioned output directory (`country=XX/...`).
+    """
+    start_time = time()
+    con = duckdb.connect()
+    try:
+        con.execute("INSTALL httpfs; LOAD httpfs;")
+        where = ""
+        if countries is not None:
+            where = "WHERE country IN (" + ", ".join(f"'{c.upper()}'" for c in countries) + ")"
+        # Categories are exploded here so the per-country steps never touch the list column
+        con.execute(f"""
+            COPY (
+                SELECT
+                    country,
+                    name,
+                    UNNEST(fsq_category_labels) AS category,
+                    address,
+                    region,
+                    postcode,
+                    longitude,
+                    latitude,
+                    geom
+                FROM read_parquet('{places_path}')
+                {where}
+            ) TO '{staging_dir}' (FORMAT PARQUET, CODEC ZSTD, PARTITION_BY (country), OVERWRITE_OR_IGNORE true);
+        """)
+    finally:
+        con.close()
+    logging.info(f"Staged {'all countries' if countries is None else countries} in {time() - start_time:.1f} seconds")
+    return {"seconds": round(time() - start_time, 2)}
+
+
+def build_country(
+    iso: str,
+    staging_dir: str = STAGING_DIR,
+    countries_dir: str = COUNTRIES_DIR,
+    boundary_path: str | None = None,
+    mask_cell_deg: float = 0.05,
+    vector_db: bool = True,
+    model_name: str = "Qwen/Qwen3-Embedding-0.6B",
+) -> dict:
+    """
+    Build one country's artefacts from its staged partition.
+
+    Args:
+        iso (str): ISO 3166-1 alpha-2 code, e.g. "IN".
+        staging_dir (str): Staging area written by `stage_places`.
+        countries_dir (str): Root of the per-country artefact directories.
+        boundary_path (str | None): Boundary file; when given, a mask is built and POIs are clipped to it.
+        mask_cell_deg (float): Cell size of the boundary mask.
+        vector_db (bool): Also embed the country's categories into a Chroma DB.
+        model_name (str): Passed through to `create_vector_db_for_categories`.
+
+    Returns:
+        dict: The manifest written to country.json.
+    """
+    start_time = time()
+    iso = iso.upper()
+    out_dir = country_dir(iso, countries_dir)
+    os.makedirs(out_dir, exist_ok=True)
+    partition = os.path.join(staging_dir, f"country={iso}", "*.parquet")
+    if not glob(partition):
+        raise FileNotFoundError(f"No staged partition for {iso} in {staging_dir}; run stage_places first")
+
+    con = duckdb.connect()
+    try:
+        con.execute("INSTALL spatial; LOAD spatial;")
+
+        ## 1. Boundary mask (optional)
+        mask_path, mask_filter = None, ""
+        if boundary_path:
+            mask = BoundaryMask.from_file(boundary_path, cell_deg=mask_cell_deg)
+            mask_path = os.path.join(out_dir, "boundary_mask.npz")
+            mask.save(mask_path)
+            mask.register(con)
+            mask_filter = "WHERE " + mask.sql_filter("longitude", "latitude")
+
+        ## 2. POI export, sorted by category for row-group pruning on `category IN (...)`
+        output_path = os.path.join(out_dir, "output.geoparquet")
+        con.execute(f"""
+            COPY (
+                SELECT name, category, address, region, postcode, geom
+                FROM read_parquet('{partition}')
+                {mask_filter}
+                ORDER BY category
+            ) TO '{output_path}' WITH (FORMAT PARQUET, CODEC ZSTD);
+        """)
+        rows = con.execute(f"SELECT COUNT(*) FROM read_parquet('{output_path}')").fetchone()[0]
+
+        ## 3. Category index
+        categories = [r[0] for r in con.execute(f"""
+            SELECT DISTINCT category FROM read_parquet('{output_path}') WHERE category IS NOT NULL ORDER BY 1
+        """).fetchall()]
+    finally:
+        con.close()
+
+    with open(os.path.join(out_dir, "categories.json"), "w", encoding="utf-8") as f:
+        json.dump(categories, f, indent=2, ensure_ascii=False)
+
+    vector_db_dir = None
+    if vector_db:
+        vector_db_dir = os.path.join(out_dir, "vector_db")
+        create_vector_db_for_categories(vector_db_dir, model_name, categories=categories)
+
+    manifest = {
+        "iso": iso,
+        "name": country_name(iso),
+        "rows": rows,
+        "categories": len(categories),
+        "data_path": output_path,
+        "mask_path": mask_path,
+        "vector_db_dir": vector_db_dir,
+        "built_seconds": round(time() - start_time, 2),
+    }
+    with open(os.path.join(out_dir, "country.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    logging.info(f"Built {iso}: {manifest}")
+    return manifest
+
+
+def build_countries(
+    countries: list[str],
+    places_path: str = FSQ_PLACES_PATH,
+    staging_dir: str = STAGING_DIR,
+    countries_dir: str = COUNTRIES_DIR,
+    boundaries: dict[str, str] | None = None,
+    stage_all: bool = False,
+    vector_db: bool = True,
+) -> list[dict]:
+    """
+    Stage whatever is missing in one scan, then build every requested country from its partition.
+
+    Args:
+        countries (list[str]): ISO codes to build.
+        boundaries (dict[str, str] | None): ISO code -> boundary file for the mask.
+        stage_all (bool): When a scan is needed anyway, stage every country so later additions need no scan.
+    """
+    countries = [c.upper() for c in countries]
+    missing = [c for c in countries if c not in staged_countries(staging_dir)]
+    if missing:
+        stage_places(places_path, None if stage_all else missing, staging_dir)
+    else:
+        logging.info(f"All of {countries} already staged; skipping the source scan")
+
+    boundaries = {k.upper(): v for k, v in (boundaries or {}).items()}
+    return [
+        build_country(iso, staging_dir, countries_dir, boundaries.get(iso), vector_db=vector_db)
+        for iso in countries
+    ]
+
+
+def available_countries(countries_dir: str = COUNTRIES_DIR) -> dict[str, dict]:
+    """Manifests of every built country, keyed by ISO code."""
+    manifests = {}
+    for path in glob(os.path.join(countries_dir, "*", "country.json")):
+        with open(path, encoding="utf-8") as f:
+            manifest = json.load(f)
+        manifests[manifest["iso"]] = manifest
+    return manifests
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build per-country POI exports, category indexes and masks.")
+    parser.add_argument("--countries", nargs="+", required=True, help="ISO codes, e.g. IN LK NP")
+    parser.add_argument("--places-path", default=FSQ_PLACES_PATH)
+    parser.add_argument("--staging-dir", default=STAGING_DIR)
+    parser.add_argument("--output-dir", default=COUNTRIES_DIR)
+    parser.add_argument("--boundary", action="append", default=[], help="ISO=path, e.g. IN=india.geojson (repeatable)")
+    parser.add_argument("--stage-all", action="store_true", help="Stage every country while scanning anyway.")
+    parser.add_argument("--no-vector-db", action="store_true", help="Skip the category embeddings.")
+    args = parser.parse_args()
+
+    boundaries = dict(item.split("=", 1) for item in args.boundary)
+    for manifest in build_countries(
+        args.countries, args.places_path, args.staging_dir, args.output_dir,
+        boundaries, args.stage_all, vector_db=not args.no_vector_db,
+    ):
+        print(manifest)
+
+
+if __name__ == "__main__":
+    main()
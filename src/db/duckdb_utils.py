@@ -26,10 +26,25 @@ def get_duckdb_connection(database: str) -> duckdb.DuckDBPyConnection:
     return con
 
 
+def geometry_expr(con: duckdb.DuckDBPyConnection, source: str, column: str = "geom") -> str:
+    """
+    Return a SQL expression yielding `column` as GEOMETRY.
+
+    GeoParquet columns come back as GEOMETRY when the spatial extension recognises the
+    file metadata and as raw WKB BLOBs otherwise, so wrap them only when needed.
+    """
+    column_type = con.execute(f"DESCRIBE SELECT {column} FROM {source}").fetchone()[1]
+    if column_type.upper().startswith("GEOMETRY"):
+        return column
+    return f"ST_GeomFromWKB({column})"
+
+
 def create_places_with_categories_view_and_export(
     s3_places_path: str,
     output_path: str = r'data\output.geoparquet',
-    db_path: str = ':memory:'
+    db_path: str = ':memory:',
+    boundary_mask=None,
+    country: str = 'IN'
 ):
     """
     Creates a DuckDB view joining places and categories from S3 parquet files and exports the result to a GeoParquet file.
@@ -38,12 +53,19 @@ def create_places_with_categories_view_and_export(
         s3_categories_path (str): S3 path to categories parquet file.
         output_path (str): Output file path for GeoParquet export.
         db_path (str): DuckDB database path (default: in-memory).
+        boundary_mask (BoundaryMask | None): Optional mask (see src/db/boundary_mask.py); only places inside it are exported.
+        country (str): ISO country code to export (see src/db/country_build.py for several countries in one pass).
     """
     con = duckdb.connect(database=db_path)
     try:
         # Load required extensions
         con.execute("INSTALL httpfs; LOAD httpfs; INSTALL spatial; LOAD spatial;")
 
+        mask_filter = ""
+        if boundary_mask is not None:
+            boundary_mask.register(con)
+            mask_filter = "AND " + boundary_mask.sql_filter("longitude", "latitude")
+
         # Create the view
         con.execute(f"""
             COPY (
@@ -54,37 +76,44 @@ def create_places_with_categories_view_and_export(
                     region,
                     postcode,
                     geom
-                FROM read_parquet('{s3_places_path}')  WHERE country = 'IN'      
+                FROM read_parquet('{s3_places_path}')  WHERE country = '{country.upper()}' {mask_filter}
+                -- Sorting by category keeps each row group to a narrow category range, so the
+                -- parquet min/max statistics let `category IN (...)` skip most of the file
+                ORDER BY category
             ) TO '{output_path}' WITH (FORMAT PARQUET, CODEC ZSTD);
         """)
 
     finally:
         con.close()
 
-def create_vector_db_for_categories(vector_db_dir: str, model_name: str):
+def create_vector_db_for_categories(vector_db_dir: str, model_name: str, country: str = 'IN', categories: list[str] | None = None):
     """
     Creates a distinct list of categories from the places parquet files.
     Args:
         s3_places_path (str): S3 path to places parquet files.
+        country (str): ISO country code whose categories are embedded.
+        categories (list[str] | None): Category labels to embed; skips the S3 scan when given.
     """
     start_time = time() 
     ## 1. First Get all the Distinct Categories from Places
-    # Initialize DuckDB connection
-    con = duckdb.connect()
+    if categories is None:
+        # Initialize DuckDB connection
+        con = duckdb.connect()
 
-    # Load required extensions
-    con.execute("INSTALL httpfs; LOAD httpfs; INSTALL spatial; LOAD spatial;")
+        # Load required extensions
+        con.execute("INSTALL httpfs; LOAD httpfs; INSTALL spatial; LOAD spatial;")
 
-    s3_places_path = 's3://fsq-os-places-us-east-1/release/dt=2025-09-09/places/parquet/places-*.zstd.parquet'
+        s3_places_path = 's3://fsq-os-places-us-east-1/release/dt=2025-09-09/places/parquet/places-*.zstd.parquet'
 
-    # Execute the SELECT query and create a view
-    result = con.execute(f"""
-    SELECT
-        DISTINCT UNNEST(fsq_category_labels) as category
-    FROM read_parquet('{s3_places_path}') WHERE country='IN';
-    """).df()
+        # Execute the SELECT query and create a view
+        result = con.execute(f"""
+        SELECT
+            DISTINCT UNNEST(fsq_category_labels) as category
+        FROM read_parquet('{s3_places_path}') WHERE country='{country.upper()}';
+        """).df()
 
-    con.close()
+        con.close()
+        categories = result['category'].drop_duplicates().tolist()
 
     ## 2. Intialize the Embedding Model
     logging.info("Downloading Embeddings Model   ")
@@ -104,8 +133,6 @@ def create_vector_db_for_categories(vector_db_dir: str, model_name: str):
     logging.info("Creating Embeddings for Categories")
 
     ## First Create documents
-    categories = result['category'].drop_duplicates().tolist()
-
     documents = [
             Document(
                 page_content=cat, metadata={"category_id": i, "source": "foursquare poi"}
@@ -0,0 +1,155 @@
+"""
+Multi-resolution H3 density layers for POIs, computed in bulk inside DuckDB.
+
+Points are assigned to H3 cells once, at the finest resolution, with the DuckDB `h3`
+community extension. Every coarser resolution is rolled up from the next finer one
+with `h3_cell_to_parent`, so the POI file is scanned exactly once.
+
+Usage:
+    python -m src.db.h3_aggregation --poi-path data/output.geoparquet --output-dir data/h3 --resolutions 9 7 5 3
+"""
+import argparse
+import os
+from time import time
+import duckdb
+from src.db.duckdb_utils import get_duckdb_connection, geometry_expr
+from src.utils.logger import logging
+
+
+def load_h3_extension(con: duckdb.DuckDBPyConnection):
+    """Install (once) and load the H3 community extension."""
+    con.execute("INSTALL h3 FROM community;")
+    con.execute("LOAD h3;")
+
+
+def aggregate_poi_density(
+    poi_path: str,
+    output_dir: str,
+    resolutions: tuple[int, ...] = (9, 7, 5, 3),
+    category_column: str = "category",
+    database: str = ":memory:",
+) -> dict[int, str]:
+    """
+    Count POIs per (H3 cell, category) at several resolutions and write one parquet per resolution.
+
+    Output files are `poi_density_r{res}.parquet` with columns `cell` (UBIGINT H3 index),
+    `category` and `count`, sorted by cell so range lookups and joins stay cheap.
+
+    Args:
+        poi_path (str): GeoParquet produced by `create_places_with_categories_view_and_export`.
+        output_dir (str): Directory for the per-resolution parquet files.
+        resolutions (tuple[int, ...]): H3 resolutions to produce (any order).
+        category_column (str): Column to split counts by.
+        database (str): DuckDB database used for intermediate tables.
+
+    Returns:
+        dict[int, str]: Resolution -> written parquet path.
+    """
+    start_time = time()
+    resolutions = sorted(set(resolutions), reverse=True)
+    finest = resolutions[0]
+    os.makedirs(output_dir, exist_ok=True)
+
+    con = get_duckdb_connection(database=database)
+    try:
+        load_h3_extension(con)
+        source = f"read_parquet('{poi_path}')"
+        geom = geometry_expr(con, source)
+
+        ## 1. Single scan: assign every point to its finest-resolution cell
+        con.execute(f"""
+            CREATE OR REPLACE TEMP TABLE h3_r{finest} AS
+            SELECT
+                h3_latlng_to_cell(ST_Y({geom}), ST_X({geom}), {finest}) AS cell,
+                {category_column} AS category,
+                COUNT(*)::BIGINT AS count
+            FROM {source}
+            WHERE geom IS NOT NULL
+            GROUP BY ALL
+        """)
+        logging.info(f"Assigned POIs to H3 resolution {finest} in {time() - start_time:.2f} seconds")
+
+        ## 2. Roll each coarser resolution up from the previous (finer) one
+        previous = finest
+        for res in resolutions[1:]:
+            con.execute(f"""
+                CREATE OR REPLACE TEMP TABLE h3_r{res} AS
+                SELECT h3_cell_to_parent(cell, {res}) AS cell, category, SUM(count)::BIGINT AS count
+                FROM h3_r{previous}
+                GROUP BY ALL
+            """)
+            previous = res
+
+        ## 3. Write compact parquet keyed by the cell integer
+        outputs = {}
+        for res in resolutions:
+            output_path = os.path.join(output_dir, f"poi_density_r{res}.parquet")
+            con.execute(f"""
+                COPY (SELECT cell, category, count FROM h3_r{res} ORDER BY cell, category)
+                TO '{output_path}' WITH (FORMAT PARQUET, CODEC ZSTD);
+            """)
+            outputs[res] = output_path
+    finally:
+        con.close()
+
+    logging.info(f"Time taken to build H3 density layers {resolutions}: {time() - start_time} seconds")
+    return outputs
+
+
+def polyfill_boundary(
+    boundary_path: str,
+    output_path: str,
+    resolution: int,
+    where: str = "Name = 'India'",
+    with_geometry: bool = True,
+) -> str:
+    """
+    Cover a boundary polygon with H3 cells (the polyfill notebook 17 runs polygon by polygon).
+
+    Args:
+        boundary_path (str): Boundary parquet, e.g. docs/India_land.parquet.
+        output_path (str): Parquet file for the cells.
+        resolution (int): H3 resolution.
+        where (str): SQL filter selecting the boundary rows to union.
+        with_geometry (bool): Also write each cell's hexagon as a geometry column.
+    """
+    con = get_duckdb_connection(database=":memory:")
+    try:
+        load_h3_extension(con)
+        geometry_column = ", ST_GeomFromText(h3_cell_to_boundary_wkt(cell)) AS geometry" if with_geometry else ""
+        con.execute(f"""
+            COPY (
+                WITH geom AS (
+                    SELECT ST_Union_Agg(ST_MakeValid(geometry)) AS g
+                    FROM read_parquet('{boundary_path}')
+                    WHERE {where}
+                ),
+                parts AS (
+                    SELECT geom FROM (SELECT UNNEST(ST_Dump(g), recursive := true) FROM geom)
+                ),
+                cells AS (
+                    SELECT DISTINCT UNNEST(h3_polygon_wkt_to_cells(ST_AsText(geom), {resolution})) AS cell
+                    FROM parts
+                )
+                SELECT cell{geometry_column} FROM cells ORDER BY cell
+            ) TO '{output_path}' WITH (FORMAT PARQUET, CODEC ZSTD);
+        """)
+    finally:
+        con.close()
+    return output_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build multi-resolution H3 POI density layers.")
+    parser.add_argument("--poi-path", default="data/output.geoparquet")
+    parser.add_argument("--output-dir", default="data/h3")
+    parser.add_argument("--resolutions", type=int, nargs="+", default=[9, 7, 5, 3])
+    args = parser.parse_args()
+
+    outputs = aggregate_poi_density(args.poi_path, args.output_dir, tuple(args.resolutions))
+    for res, path in sorted(outputs.items()):
+        print(f"Resolution {res}: {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+Shared DuckDB connection pool.
+
+One database instance is opened per (database, read_only) pair and process, with
+extensions loaded and settings applied once. Requests borrow one of its pre-opened
+cursors. Cursors of a DuckDB connection share the database instance, so they all see
+the same catalog, loaded extensions and object cache: parquet footers and metadata
+parsed by one query are reused by the next instead of being read again.
+"""
+import hashlib
+import queue
+import threading
+from contextlib import contextmanager
+import duckdb
+from src.utils.logger import logging
+
+
+# Caches that keep parquet / HTTP metadata between queries; applied when the DuckDB version has them
+METADATA_CACHE_SETTINGS = ("enable_object_cache", "parquet_metadata_cache", "enable_http_metadata_cache")
+
+
+def data_key(data_path: str) -> str:
+    """Short stable id of a data path, for names that must not collide between datasets."""
+    return hashlib.blake2b(data_path.encode("utf-8"), digest_size=4).hexdigest()
+
+
+class DuckDBPool:
+    """A fixed set of cursors over one DuckDB database instance, handed out one per request."""
+
+    def __init__(
+        self,
+        database: str = ":memory:",
+        size: int = 8,
+        read_only: bool = True,
+        threads: int | None = None,
+        memory_limit: str | None = None,
+        extensions: tuple[str, ...] = ("httpfs", "spatial"),
+        config: dict | None = None,
+    ):
+        """
+        Args:
+            database (str): DuckDB file, or ':memory:' (':memory:<name>' for a separate one) for an in-memory catalog over external files.
+            size (int): Number of cursors, i.e. queries that can run at the same time.
+            read_only (bool): Open the database file read-only (ignored for ':memory:', which DuckDB cannot open read-only).
+            threads (int | None): DuckDB worker threads shared by all cursors (default: DuckDB's choice).
+            memory_limit (str | None): e.g. "4GB" (default: DuckDB's choice).
+            extensions (tuple[str, ...]): Extensions to load; installed only when loading fails.
+            config (dict | None): Extra DuckDB configuration options.
+        """
+        self.database = database
+        self.size = size
+        self.read_only = read_only and not database.startswith(":memory:")
+
+        settings = dict(config or {})
+        if threads:
+            settings["threads"] = threads
+        if memory_limit:
+            settings["memory_limit"] = memory_limit
+        self._root = duckdb.connect(database, read_only=self.read_only, config=settings)
+
+        for extension in extensions:
+            try:
+                self._root.execute(f"LOAD {extension};")
+            except duckdb.Error:
+                self._root.execute(f"INSTALL {extension};")
+                self._root.execute(f"LOAD {extension};")
+
+        available = {r[0] for r in self._root.execute("SELECT name FROM duckdb_settings()").fetchall()}
+        for setting in METADATA_CACHE_SETTINGS:
+            if setting in available:
+                self._root.execute(f"SET GLOBAL {setting} = true;")
+
+        self._cursors: queue.Queue = queue.Queue()
+        for _ in range(size):
+            self._cursors.put(self._root.cursor())
+        self._views: dict[str, str] = {}
+        self._views_lock = threading.Lock()
+        self._closed = False
+        logging.info(f"Opened DuckDB pool on {database} with {size} cursors (read_only={self.read_only})")
+
+    def _healthy(self, cur) -> bool:
+        try:
+            cur.execute("SELECT 1").fetchone()
+            return True
+        except Exception:
+            return False
+
+    @contextmanager
+    def cursor(self, timeout: float | None = 30.0):
+        """
+        Borrow a health-checked cursor for the duration of a `with` block.
+
+        Raises:
+            queue.Empty: When no cursor frees up within `timeout` seconds.
+        """
+        if self._closed:
+            raise RuntimeError("DuckDB pool is closed")
+        cur = self._cursors.get(timeout=timeout)
+        if not self._healthy(cur):
+            logging.warning(f"Replacing unhealthy DuckDB cursor in pool for {self.database}")
+            cur = self._replace(cur)
+        try:
+            yield cur
+        finally:
+            self._cursors.put(cur)
+
+    def _replace(self, cur):
+        try:
+            cur.close()
+        except Exception:
+            pass
+        return self._root.cursor()
+
+    def bind_view(self, name: str, data_path: str):
+        """
+        Create view `name` over the parquet at `data_path`, once per pool.
+
+        Raises:
+            ValueError: The view already reads another parquet; its users' SQL would silently change data.
+        """
+        with self._views_lock:
+            bound = self._views.get(name)
+            if bound == data_path:
+                return
+            if bound is not None:
+                raise ValueError(
+                    f"View {name} on DuckDB pool {self.database} already reads {bound}, not {data_path}; "
+                    "use a separate database for each data path"
+                )
+            self.execute(f"CREATE OR REPLACE VIEW {name} AS SELECT * FROM read_parquet('{data_path}')")
+            self._views[name] = data_path
+
+    def execute(self, sql: str, params: list | None = None) -> list:
+        """Run one statement on a borrowed cursor and return all rows."""
+        with self.cursor() as cur:
+            return cur.execute(sql, params).fetchall() if params is not None else cur.execute(sql).fetchall()
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                self._cursors.get_nowait().close()
+            except queue.Empty:
+                break
+        self._root.close()
+
+
+_POOLS: dict[tuple[str, bool], DuckDBPool] = {}
+_POOLS_LOCK = threading.Lock()
+
+
+def get_pool(database: str = ":memory:", read_only: bool = True, **settings) -> DuckDBPool:
+    """
+    The process-wide pool for `database`, created on first use with `settings`.
+
+    Every bot instance and request handler in a process shares it; each server worker
+    process gets its own.
+    """
+    key = (database, read_only and not database.startswith(":memory:"))
+    with _POOLS_LOCK:
+        pool = _POOLS.get(key)
+        if pool is None:
+            pool = DuckDBPool(database, read_only=read_only, **settings)
+            _POOLS[key] = pool
+        return pool
@@ -0,0 +1,234 @@
+"""
+In-memory spatial grid index for nearest-POI and radius queries.
+
+Points are bucketed into a regular lon/lat grid and stored sorted by cell, with a
+CSR-style offsets array per cell. A query only touches the cells overlapping its
+search window; within one grid row those cells are contiguous in memory, so each row
+is a single numpy slice and distances are computed vectorised on the candidates only.
+"""
+import csv
+import math
+import os
+import threading
+import numpy as np
+from collections import OrderedDict
+from collections.abc import Callable
+from time import time
+from src.db.duckdb_utils import get_duckdb_connection, geometry_expr
+from src.utils.logger import logging
+
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = 111.32
+MAX_CATEGORY_TERMS = 256
+
+
+def haversine_km(lon1, lat1, lon2, lat2):
+    """Great-circle distance in km; works on scalars and numpy arrays."""
+    lon1, lat1, lon2, lat2 = map(np.radians, (lon1, lat1, lon2, lat2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+class GridIndex:
+    """Packed uniform-grid index over point coordinates."""
+
+    def __init__(self, lon: np.ndarray, lat: np.ndarray, cell_deg: float = 0.05):
+        """
+        Args:
+            lon (np.ndarray): Point longitudes in degrees.
+            lat (np.ndarray): Point latitudes in degrees.
+            cell_deg (float): Grid cell size in degrees (0.05 is roughly 5 km).
+        """
+        lon = np.asarray(lon, dtype=np.float64)
+        lat = np.asarray(lat, dtype=np.float64)
+        self.cell_deg = cell_deg
+        self.x0 = float(lon.min()) if len(lon) else 0.0
+        self.y0 = float(lat.min()) if len(lat) else 0.0
+        cols = ((lon - self.x0) // cell_deg).astype(np.int64)
+        rows = ((lat - self.y0) // cell_deg).astype(np.int64)
+        self.ncols = int(cols.max()) + 1 if len(cols) else 1
+        self.nrows = int(rows.max()) + 1 if len(rows) else 1
+
+        keys = rows * self.ncols + cols
+        order = np.argsort(keys, kind="stable")
+        # `ids[i]` is the original row of the i-th point in cell order
+        self.ids = order
+        self.lon = lon[order]
+        self.lat = lat[order]
+        self.offsets = np.searchsorted(keys[order], np.arange(self.nrows * self.ncols + 1))
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _candidates(self, lon: float, lat: float, radius_km: float) -> np.ndarray:
+        """Positions (in cell order) of the points in cells overlapping the search window."""
+        # Bounding box of the spherical cap, on the same sphere as haversine_km
+        angle = radius_km / EARTH_RADIUS_KM
+        dlat = math.degrees(angle)
+        if abs(lat) + dlat >= 90 or angle >= math.pi / 2:
+            # The circle covers a pole: every longitude is in range
+            c0, c1 = 0, self.ncols - 1
+        else:
+            dlon = math.degrees(math.asin(min(math.sin(angle) / math.cos(math.radians(lat)), 1.0)))
+            c0 = max(int((lon - dlon - self.x0) // self.cell_deg), 0)
+            c1 = min(int((lon + dlon - self.x0) // self.cell_deg), self.ncols - 1)
+        r0 = max(int((lat - dlat - self.y0) // self.cell_deg), 0)
+        r1 = min(int((lat + dlat - self.y0) // self.cell_deg), self.nrows - 1)
+        if c0 > c1 or r0 > r1:
+            return np.empty(0, dtype=np.int64)
+
+        # Cells c0..c1 of one grid row are adjacent in the sorted arrays: one slice per row
+        slices = [
+            np.arange(self.offsets[r * self.ncols + c0], self.offsets[r * self.ncols + c1 + 1])
+            for r in range(r0, r1 + 1)
+        ]
+        return np.concatenate(slices) if slices else np.empty(0, dtype=np.int64)
+
+    def radius(self, lon: float, lat: float, radius_km: float, keep: Callable[[np.ndarray], np.ndarray] | None = None) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Points within `radius_km` of (lon, lat), nearest first.
+
+        Args:
+            keep (Callable | None): Takes original row ids of the candidates and returns a boolean
+                array; only True rows are returned. Called on the candidates only, never on every row.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: Original row ids and distances in km.
+        """
+        positions = self._candidates(lon, lat, radius_km)
+        if keep is not None and len(positions):
+            positions = positions[keep(self.ids[positions])]
+        distances = haversine_km(lon, lat, self.lon[positions], self.lat[positions])
+        keep = distances <= radius_km
+        positions, distances = positions[keep], distances[keep]
+        order = np.argsort(distances, kind="stable")
+        return self.ids[positions[order]], distances[order]
+
+    def knn(self, lon: float, lat: float, k: int, keep: Callable[[np.ndarray], np.ndarray] | None = None, max_radius_km: float = 2500.0) -> tuple[np.ndarray, np.ndarray]:
+        """
+        The `k` nearest points to (lon, lat), optionally restricted by `keep` (see `radius`).
+
+        Searches a growing radius: once at least k points lie within r, no point outside r
+        can be nearer than the k-th, so the answer is exact.
+        """
+        radius_km = self.cell_deg * KM_PER_DEGREE
+        while True:
+            ids, distances = self.radius(lon, lat, radius_km, keep)
+            if len(ids) >= k or radius_km >= max_radius_km:
+                return ids[:k], distances[:k]
+            radius_km = min(radius_km * 2, max_radius_km)
+
+
+class PoiIndex:
+    """POI attributes from output.geoparquet together with a GridIndex over their coordinates."""
+
+    COLUMNS = ["name", "category", "address", "region", "postcode"]
+
+    def __init__(self, columns: dict[str, np.ndarray], lon: np.ndarray, lat: np.ndarray, cell_deg: float = 0.05):
+        self.columns = columns
+        self.lon = lon
+        self.lat = lat
+        self.grid = GridIndex(lon, lat, cell_deg=cell_deg)
+        # Factorise categories once so filters are integer comparisons
+        self.category_labels, self.category_codes = np.unique(
+            columns["category"].astype(str), return_inverse=True
+        )
+        self._lowered_labels = [label.lower() for label in self.category_labels]
+        # Category term -> matching codes, most recently used last
+        self._matching: OrderedDict[str, np.ndarray] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_parquet(cls, data_path: str, cell_deg: float = 0.05) -> "PoiIndex":
+        """Load POI attributes and coordinates with a single DuckDB scan."""
+        start_time = time()
+        con = get_duckdb_connection(database=":memory:")
+        try:
+            source = f"read_parquet('{data_path}')"
+            geom = geometry_expr(con, source)
+            data = con.execute(f"""
+                SELECT {", ".join(cls.COLUMNS)}, ST_X({geom}) AS lon, ST_Y({geom}) AS lat
+                FROM {source}
+                WHERE geom IS NOT NULL
+            """).fetchnumpy()
+        finally:
+            con.close()
+
+        columns = {c: np.asarray(data[c], dtype=object) for c in cls.COLUMNS}
+        index = cls(columns, np.asarray(data["lon"], dtype=np.float64), np.asarray(data["lat"], dtype=np.float64), cell_deg)
+        logging.info(f"Built spatial index over {len(index.grid)} POIs in {time() - start_time:.2f} seconds")
+        return index
+
+    def _matching_codes(self, term: str) -> np.ndarray:
+        """Codes of the category labels containing `term`, memoised for the last MAX_CATEGORY_TERMS terms."""
+        with self._lock:
+            matching = self._matching.get(term)
+            if matching is not None:
+                self._matching.move_to_end(term)
+                return matching
+        matching = np.array([i for i, label in enumerate(self._lowered_labels) if term in label], dtype=np.int64)
+        with self._lock:
+            self._matching[term] = matching
+            if len(self._matching) > MAX_CATEGORY_TERMS:
+                self._matching.popitem(last=False)
+        return matching
+
+    def category_filter(self, category: str | None) -> Callable[[np.ndarray], np.ndarray] | None:
+        """Filter for `GridIndex.radius` keeping rows whose category label contains `category` (case-insensitive); None means no filter."""
+        if not category:
+            return None
+        matching = self._matching_codes(category.lower())
+        return lambda ids: np.isin(self.category_codes[ids], matching)
+
+    def _rows(self, ids: np.ndarray, distances: np.ndarray) -> list[dict]:
+        rows = []
+        for row_id, distance in zip(ids, distances):
+            row = {c: self.columns[c][row_id] for c in self.COLUMNS}
+            row.update(lat=float(self.lat[row_id]), lon=float(self.lon[row_id]), distance_km=round(float(distance), 3))
+            rows.append(row)
+        return rows
+
+    def within(self, lat: float, lon: float, radius_km: float, category: str | None = None, limit: int | None = None) -> list[dict]:
+        """POIs within `radius_km`, nearest first."""
+        ids, distances = self.grid.radius(lon, lat, radius_km, self.category_filter(category))
+        if limit is not None:
+            ids, distances = ids[:limit], distances[:limit]
+        return self._rows(ids, distances)
+
+    def nearest(self, lat: float, lon: float, k: int = 10, category: str | None = None) -> list[dict]:
+        """The `k` nearest POIs."""
+        ids, distances = self.grid.knn(lon, lat, k, self.category_filter(category))
+        return self._rows(ids, distances)
+
+
+def load_anchors(exported_dir: str = "exported_data") -> dict[str, dict]:
+    """
+    Named reference points (railway stations and airports) to search around.
+
+    Keys are lower-cased names and codes (station code, IATA, ICAO).
+    """
+    anchors = {}
+
+    def _add(keys, name, kind, lat, lon):
+        try:
+            point = {"name": name, "type": kind, "lat": float(lat), "lon": float(lon)}
+        except (TypeError, ValueError):
+            return
+        for key in keys:
+            if key:
+                anchors.setdefault(key.strip().lower(), point)
+
+    stations = os.path.join(exported_dir, "railway_stations.csv")
+    if os.path.exists(stations):
+        with open(stations, encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                _add([row.get("name"), row.get("station_code")], row.get("name"), "railway_station", row.get("lat"), row.get("lon"))
+
+    airports = os.path.join(exported_dir, "indian_airports.csv")
+    if os.path.exists(airports):
+        with open(airports, encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                _add([row.get("Airport name"), row.get("IATA"), row.get("ICAO")], row.get("Airport name"), "airport", row.get("lat"), row.get("lon"))
+
+    return anchors
@@ -3,61 +3,65 @@ LangChain pipeline setup and utilities.
 """
 # Example placeholder for LangChain integration
 from langchain_openai import ChatOpenAI
-from langchain_core.prompts import ChatPromptTemplate
 # from langchain_core.runnables import RunnablePassthrough
 # from langchain_core.output_parsers import StrOutputParser
 from src.bot.models import FourSquareChatBot
+from src.bot.categories import CategoryResolver
+from src.langchain.prompts import PromptBuilder
+from src.db.duckdb_utils import load_vector_db
+from src.db.country_build import available_countries, country_name
+from glob import glob
 
 from dotenv import load_dotenv
 load_dotenv(dotenv_path = ".env", override=True)
 
-def initiate_chat_bot():
-    SYSTEM_MESSAGE = """
-    Given an input question, create a syntactically correct DuckDB SQL query to answer it using data from Parquet files at {data_path}.
-    Limit results to {top_k} unless the user specifies a different number, ordering by a relevant column for the most interesting results.
-    Use only columns: `name`, `category`, `address`, `region`, `postcode`.
-    For keyword searches (e.g., "temple," "hotel"),
-    search across `name`, `category`, and `address` using LOWER() and LIKE, prioritizing matches in `category` via ORDER BY CASE.
-    For region-specific queries, check `region` and `address` columns.
 
-    Restrict outlets (POIs) to India only.
-    If a non-India country is mentioned, respond with "Query beyond scope, restricted to India" and do not generate a query.
+def build_query_prompt_template(country_name: str = "India") -> PromptBuilder:
+    """Build the SQL generation prompt shared by the live bot and the offline benchmarks."""
+    return PromptBuilder(top_k=10, max_examples=2, schema_tokens=400, result_tokens=1500, country_name=country_name)
 
-    Use read_parquet('{data_path}') as the data source.
 
-    Schema: {table_info}
-    User question: {input}
-    Limit: {top_k}
-    Output only the Duckdb query without explanations.
-    Strictly stick to the above mentioned schema only.
-
-    Few Shot Examples:
-    - Question: How many temples are there in India?
-    - Query: SELECT COUNT(*) as count FROM read_parquet('{data_path}') WHERE LOWER(name) LIKE '%temple%' OR LOWER(category) LIKE '%temple%' LIMIT {top_k};
-
-    - Question: Which hotels are located in Goa?
-    - Query: SELECT name, category_level_1, category_level_2, address, region, postcode FROM read_parquet('{data_path}') WHERE (LOWER(name) LIKE '%hotel%' OR LOWER(category) LIKE '%hotel%') AND (LOWER(region) LIKE '%goa%' OR LOWER(address) LIKE '%goa%') LIMIT {top_k};
-
-    - Question: List petrol pumps in Chennai.
-    - Query: SELECT name, category_level_1, category_level_2, address, region, postcode FROM read_parquet('{data_path}') WHERE LOWER(category) LIKE '%petrol%' AND (LOWER(region) LIKE '%chennai%' OR LOWER(address) LIKE '%chennai%') LIMIT {top_k};
-
-    - Question: How many restaurants are in Bangalore?
-    - Query: SELECT COUNT(*) as count FROM read_parquet('{data_path}') WHERE LOWER(category) LIKE '%restaurant%' AND (LOWER(region) LIKE '%bangalore%' OR LOWER(address) LIKE '%bangalore%') LIMIT {top_k};
+def initiate_chat_bot(country: str = "IN"):
+    """
+    Build the bot for one country.
 
-    - Question: Find bookstores in Delhi.
-    - Query: SELECT name, category_level_1, category_level_2, address, region, postcode FROM read_parquet('{data_path}') WHERE LOWER(category) LIKE '%bookstore%' AND (LOWER(region) LIKE '%delhi%' OR LOWER(address) LIKE '%delhi%') LIMIT {top_k};
+    Artefacts come from data/countries/<ISO>/ (see src/db/country_build.py); India falls back
+    to the original single-country layout (data/output.geoparquet, data/vector_db) when not built there.
     """
-    user_prompt = "Question: {input}"
-    query_prompt_template = ChatPromptTemplate.from_messages([("system", SYSTEM_MESSAGE), ("user", user_prompt)])
+    country = country.upper()
+    manifest = available_countries().get(country)
+    if manifest is not None:
+        data_path = manifest["data_path"]
+        vector_db_dir = manifest["vector_db_dir"]
+    elif country == "IN":
+        data_path = "data\output.geoparquet"
+        vector_db_dir = "data/vector_db"
+    else:
+        raise ValueError(f"No data built for country {country}; run python -m src.db.country_build --countries {country}")
+
+    query_prompt_template = build_query_prompt_template(country_name(country))
 
     llm = ChatOpenAI(model="gpt-4o-mini", temperature=0)
 
+    ## Resolve place types through the category vector DB when one has been built
+    category_resolver = None
+    vector_dbs = glob(f"{vector_db_dir}/chroma*") if vector_db_dir else []
+    if len(vector_dbs) > 0:
+        vector_db = load_vector_db(path=vector_dbs[0])
+        if vector_db is not None:
+            category_resolver = CategoryResolver(vector_db=vector_db, k=5)
+
     fsq_chat_bot = FourSquareChatBot(
-        data_path = "data\output.geoparquet",
+        data_path = data_path,
         columns = ['name', 'category', 'address', 'region', 'postcode'],
         llm = llm,
         query_prompt_template = query_prompt_template,
-        database=':memory:'
+        # A named in-memory database per country keeps each country's `pois` view apart
+        database=f':memory:{country.lower()}',
+        category_resolver=category_resolver,
+        country_name=country_name(country),
+        # The station and airport lists in exported_data are Indian
+        anchors_dir="exported_data" if country == "IN" else None
     )
 
     return fsq_chat_bot
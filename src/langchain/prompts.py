@@ -0,0 +1,257 @@
+"""
+Prompt construction for SQL generation and answers, with token budgets.
+
+The SQL prompt is split so that everything that is identical across requests comes
+first, in one system message: rules, schema and the sample values, which are
+computed once per bot. Providers cache identical prompt prefixes; OpenAI does so
+from 1024 tokens. The parts that vary per request follow in the user message:
+
+- the few-shot examples picked for this question;
+- the resolved category filter;
+- the question.
+
+Queries go against the `pois` view the bot registers, so no example repeats the
+parquet path.
+"""
+import json
+import re
+from langchain_core.messages import HumanMessage, SystemMessage
+from langchain_core.prompt_values import ChatPromptValue
+from src.bot.categories import STOPWORDS
+from src.bot.fast_path import singular
+from src.utils.logger import logging
+
+
+TABLE_NAME = "pois"
+
+SYSTEM_RULES = """Given an input question, create a syntactically correct DuckDB SQL query against the table `pois`.
+Limit results to {top_k} unless the user specifies a different number, ordering by a relevant column for the most interesting results.
+Use only columns: `name`, `category`, `address`, `region`, `postcode`.
+For keyword searches (e.g., "temple", "hotel"), search across `name`, `category`, and `address` using LOWER() and LIKE, prioritizing matches in `category` via ORDER BY CASE.
+For region-specific queries, check `region` and `address` columns.
+When a resolved category filter is given (not None), use it verbatim as the condition on `category` instead of LIKE on `category`; it already covers sub-categories.
+Only fall back to LIKE keyword searches when the resolved category filter is None.
+Restrict outlets (POIs) to {country_name} only. If a country other than {country_name} is mentioned, respond with "Query beyond scope, restricted to {country_name}" and do not generate a query.
+Output only the DuckDB query, ending with a semicolon, without explanations. Strictly stick to the schema below.
+
+Schema of `pois`:
+{table_info}"""
+
+ANSWER_RULES = (
+    "Given the following user question, corresponding SQL query, and SQL result, "
+    "answer the user question in a conversational manner. "
+    "If the result says rows were omitted, mention that more results exist.\n\n"
+)
+
+FEW_SHOT_EXAMPLES = [
+    {
+        "question": "How many temples are there in {country_name}?",
+        "query": "SELECT COUNT(*) AS count FROM pois WHERE LOWER(name) LIKE '%temple%' OR LOWER(category) LIKE '%temple%';",
+        "categories": False,
+    },
+    {
+        "question": "Which hotels are located in Goa?",
+        "query": "SELECT name, category, address, region, postcode FROM pois WHERE (LOWER(name) LIKE '%hotel%' OR LOWER(category) LIKE '%hotel%') AND (LOWER(region) LIKE '%goa%' OR LOWER(address) LIKE '%goa%') LIMIT {top_k};",
+        "categories": False,
+    },
+    {
+        "question": "List petrol pumps in Chennai.",
+        "query": "SELECT name, category, address, region, postcode FROM pois WHERE LOWER(category) LIKE '%petrol%' AND (LOWER(region) LIKE '%chennai%' OR LOWER(address) LIKE '%chennai%') LIMIT {top_k};",
+        "categories": False,
+    },
+    {
+        "question": "List fuel stations in Pune. (Resolved category filter: (category = 'Travel and Transportation > Fuel Station' OR category LIKE 'Travel and Transportation > Fuel Station > %'))",
+        "query": "SELECT name, category, address, region, postcode FROM pois WHERE (category = 'Travel and Transportation > Fuel Station' OR category LIKE 'Travel and Transportation > Fuel Station > %') AND (LOWER(region) LIKE '%pune%' OR LOWER(address) LIKE '%pune%') LIMIT {top_k};",
+        "categories": True,
+    },
+    {
+        "question": "How many restaurants are in Bangalore?",
+        "query": "SELECT COUNT(*) AS count FROM pois WHERE LOWER(category) LIKE '%restaurant%' AND (LOWER(region) LIKE '%bangalore%' OR LOWER(address) LIKE '%bangalore%');",
+        "categories": False,
+    },
+    {
+        "question": "How many hospitals are there in Maharashtra? (Resolved category filter: (category = 'Health and Medicine > Hospital' OR category LIKE 'Health and Medicine > Hospital > %'))",
+        "query": "SELECT COUNT(*) AS count FROM pois WHERE (category = 'Health and Medicine > Hospital' OR category LIKE 'Health and Medicine > Hospital > %') AND LOWER(region) LIKE '%maharashtra%';",
+        "categories": True,
+    },
+    {
+        "question": "Find bookstores in Delhi.",
+        "query": "SELECT name, category, address, region, postcode FROM pois WHERE LOWER(category) LIKE '%bookstore%' AND (LOWER(region) LIKE '%delhi%' OR LOWER(address) LIKE '%delhi%') LIMIT {top_k};",
+        "categories": False,
+    },
+    {
+        "question": "Which regions have the most ATMs?",
+        "query": "SELECT region, COUNT(*) AS count FROM pois WHERE LOWER(category) LIKE '%atm%' GROUP BY region ORDER BY count DESC LIMIT {top_k};",
+        "categories": False,
+    },
+]
+
+COUNT_WORDS = re.compile(r"\b(how many|count|number of|total)\b")
+RANK_WORDS = re.compile(r"\b(most|top|least|fewest|per|each|by number)\b")
+
+
+## Token counting
+
+_ENCODING = None
+
+
+def _encoding():
+    """tiktoken's o200k_base (the gpt-4o family) when available; loaded once."""
+    global _ENCODING
+    if _ENCODING is None:
+        try:
+            import tiktoken
+            _ENCODING = tiktoken.get_encoding("o200k_base")
+        except Exception as e:
+            logging.info(f"tiktoken unavailable ({e}); estimating tokens as characters / 4")
+            _ENCODING = False
+    return _ENCODING
+
+
+def count_tokens(text: str) -> int:
+    encoding = _encoding()
+    if encoding:
+        return len(encoding.encode(text, disallowed_special=()))
+    return (len(text) + 3) // 4
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut `text` to at most `max_tokens`, marking the cut with an ellipsis."""
+    if count_tokens(text) <= max_tokens:
+        return text
+    encoding = _encoding()
+    if encoding:
+        return encoding.decode(encoding.encode(text, disallowed_special=())[:max(max_tokens - 1, 0)]) + "…"
+    return text[:max(max_tokens - 1, 0) * 4] + "…"
+
+
+def response_usage(response, prompt_text: str) -> tuple[int, int]:
+    """Prompt tokens and provider-cached prompt tokens; counted locally when the provider reports none."""
+    usage = getattr(response, "usage_metadata", None)
+    if usage and usage.get("input_tokens"):
+        cached = (usage.get("input_token_details") or {}).get("cache_read", 0) or 0
+        return usage["input_tokens"], cached
+    return count_tokens(prompt_text), 0
+
+
+## Schema and results
+
+def format_schema(columns: list[str], types: list[str], samples: list[list], max_tokens: int = 400) -> str:
+    """
+    Column list with types and a few short distinct sample values, within `max_tokens`.
+
+    Args:
+        columns (list[str]): Column names.
+        types (list[str]): DuckDB types, aligned with `columns`.
+        samples (list[list]): Sample values per column.
+        max_tokens (int): Budget for the whole schema block.
+    """
+    per_column = max(max_tokens // max(len(columns), 1), 16)
+    lines = []
+    for i, (column, data_type) in enumerate(zip(columns, types)):
+        line = f"{i + 1}. Name: {column} | Data Type: {data_type} | Sample values: "
+        values = []
+        for value in dict.fromkeys(str(v) for v in samples[i] if v is not None):
+            candidate = ", ".join(values + [truncate_to_tokens(value, 12)])
+            if count_tokens(line + candidate) > per_column:
+                break
+            values.append(truncate_to_tokens(value, 12))
+        lines.append(line + ", ".join(values))
+    return "\n".join(lines)
+
+
+def format_result(columns: list[str] | None, rows: list, max_tokens: int = 1500) -> str:
+    """Rows as compact JSON lines, cut off once `max_tokens` is reached with a count of the rest."""
+    lines, used = [], 0
+    for row in rows:
+        record = dict(zip(columns, row)) if columns else list(row)
+        line = json.dumps(record, default=str, ensure_ascii=False, separators=(",", ":"))
+        tokens = count_tokens(line) + 1
+        if used + tokens > max_tokens:
+            break
+        lines.append(line)
+        used += tokens
+    omitted = len(rows) - len(lines)
+    if omitted:
+        lines.append(f"... {omitted} more rows omitted")
+    return "\n".join(lines)
+
+
+## Prompts
+
+def _terms(text: str) -> set[str]:
+    return {singular(w) for w in re.findall(r"[a-z]+", text.lower()) if w not in STOPWORDS}
+
+
+class PromptBuilder:
+    """Builds the SQL-generation and answer prompts; drop-in for the ChatPromptTemplate the bot invoked."""
+
+    def __init__(self, top_k: int = 10, max_examples: int = 2, schema_tokens: int = 400, result_tokens: int = 1500, country_name: str = "India"):
+        """
+        Args:
+            top_k (int): Default row limit written into the rules and examples.
+            max_examples (int): Few-shot examples included per question.
+            schema_tokens (int): Token budget for the schema block (see `format_schema`).
+            result_tokens (int): Token budget for the SQL result in the answer prompt.
+            country_name (str): Country the data covers; questions about other countries are refused.
+        """
+        self.top_k = top_k
+        self.max_examples = max_examples
+        self.schema_tokens = schema_tokens
+        self.result_tokens = result_tokens
+        self.country_name = country_name
+        self._system_cache: dict[str, str] = {}
+
+    def system_prefix(self, table_info: str) -> str:
+        """The request-independent system message; the same string for every question of a bot."""
+        prefix = self._system_cache.get(table_info)
+        if prefix is None:
+            prefix = SYSTEM_RULES.format(top_k=self.top_k, table_info=table_info, country_name=self.country_name)
+            self._system_cache[table_info] = prefix
+        return prefix
+
+    def select_examples(self, question: str, has_categories: bool) -> list[dict]:
+        """The examples sharing the most words and the same shape (count, ranking, listing) as the question."""
+        terms = _terms(question)
+        lowered = question.lower()
+        is_count, is_rank = bool(COUNT_WORDS.search(lowered)), bool(RANK_WORDS.search(lowered))
+
+        def _score(example):
+            example_question = example["question"].lower()
+            score = len(terms & _terms(example_question))
+            score += 2 * (bool(COUNT_WORDS.search(example_question)) == is_count)
+            score += 2 * (bool(RANK_WORDS.search(example_question)) == is_rank)
+            score += 2 * (example["categories"] == has_categories)
+            return score
+
+        ranked = sorted(FEW_SHOT_EXAMPLES, key=_score, reverse=True)
+        return ranked[:self.max_examples]
+
+    def invoke(self, values: dict) -> ChatPromptValue:
+        """
+        Build the SQL prompt.
+
+        Args:
+            values (dict): `input` (the question), `table_info`, `categories` (the category filter from `format_category_filter`, or "None").
+        """
+        categories = values.get("categories", "None")
+        examples = self.select_examples(values["input"], categories != "None")
+        lines = [f"Resolved category filter: {categories}", "", "Examples:"]
+        for example in examples:
+            lines.append(f"- Question: {example['question'].format(country_name=self.country_name)}")
+            lines.append(f"  Query: {example['query'].format(top_k=self.top_k)}")
+        lines += ["", f"Question: {values['input']}"]
+        return ChatPromptValue(messages=[
+            SystemMessage(content=self.system_prefix(values["table_info"])),
+            HumanMessage(content="\n".join(lines)),
+        ])
+
+    def answer_prompt(self, question: str, query: str, columns: list[str] | None, rows: list, truncated: bool = False) -> str:
+        """Answer prompt with the fixed instructions first and the result cut to the token budget."""
+        row_count = f"more than {len(rows)}" if truncated else str(len(rows))
+        return (
+            ANSWER_RULES
+            + f"Question: {question}\n"
+            + f"SQL Query: {query}\n"
+            + f"SQL Result ({row_count} rows):\n{format_result(columns, rows, self.result_tokens)}"
+        )
@@ -0,0 +1 @@
+# src/tiles/__init__.py
@@ -0,0 +1,370 @@
+"""
+Chunked, resumable build of tiles.db (table `t1`) from Overture buildings.
+
+Notebook 16 builds `t1` with one CREATE TABLE ... AS SELECT over the whole bbox. That
+is a single transaction, so large areas run out of memory and an interruption loses
+everything. This builder works in chunks instead:
+
+- grid chunks: bbox cells of `chunk_deg` degrees; a building belongs to the cell that
+  holds its bbox.xmin / bbox.ymin, so no building is loaded twice;
+- file chunks: one source parquet file at a time.
+
+The bbox statistics of every source file are read once, from the parquet footers, and
+stored in `t1_build_files`. Each chunk then reads only the files whose buildings can fall
+in it, instead of listing and opening the whole release again.
+
+Each chunk is appended to `t1` in its own transaction, together with its row in
+`t1_build_chunks`. A rerun skips the chunks recorded there. DuckDB spills to
+`temp_directory` when a chunk does not fit in `memory_limit`. Geometries are projected
+to EPSG:3857 as in the notebook. The RTREE index is created once, after the last
+chunk.
+
+The source is the Overture S3 release or a local directory of Overture-shaped parquet
+(see `python -m src.benchmarks.tile_data --overture-dir`).
+
+Usage:
+    python -m src.tiles.build_tiles_db --bbox -74.2 40.5 -73.6 40.9 --output data/tiles.db
+    python -m src.tiles.build_tiles_db --boundary india.geojson --chunk-deg 1 --memory-limit 2GB
+    python -m src.tiles.build_tiles_db --source data/bench/overture --chunk-by file
+"""
+import argparse
+import json
+import math
+import os
+from time import time
+import duckdb
+from src.db.boundary_mask import BoundaryMask, OUTSIDE
+from src.db.duckdb_utils import geometry_expr
+from src.db.pool import METADATA_CACHE_SETTINGS
+from src.utils.logger import logging
+
+
+OVERTURE_BUILDINGS_PATH = 's3://overturemaps-us-west-2/release/2026-01-21.0/theme=buildings/type=building/*'
+INDEX_NAME = "t1_geometry_idx"
+
+
+def source_pattern(source: str) -> str:
+    """Parquet glob for a source: local directories are searched recursively."""
+    if os.path.isdir(source):
+        return os.path.join(source, "**", "*.parquet")
+    return source
+
+
+def grid_chunks(bbox: tuple[float, float, float, float], chunk_deg: float, mask: BoundaryMask | None = None) -> list[dict]:
+    """
+    Split `bbox` into cells of `chunk_deg` degrees, dropping cells entirely outside `mask`.
+
+    Args:
+        bbox (tuple): (xmin, ymin, xmax, ymax) in degrees.
+        chunk_deg (float): Cell size in degrees.
+        mask (BoundaryMask | None): Boundary the buildings are clipped to.
+    """
+    xmin, ymin, xmax, ymax = bbox
+    chunks = []
+    # Rounded so that e.g. 0.6 / 0.1 gives 6 cells rather than a seventh sliver
+    for j in range(max(math.ceil(round((ymax - ymin) / chunk_deg, 9)), 1)):
+        for i in range(max(math.ceil(round((xmax - xmin) / chunk_deg, 9)), 1)):
+            cell = (
+                xmin + i * chunk_deg,
+                ymin + j * chunk_deg,
+                min(xmin + (i + 1) * chunk_deg, xmax),
+                min(ymin + (j + 1) * chunk_deg, ymax),
+            )
+            if mask is not None and _outside_mask(mask, cell):
+                continue
+            chunks.append({"id": f"grid:{i}:{j}", "bbox": cell})
+    return chunks
+
+
+def _outside_mask(mask: BoundaryMask, cell: tuple[float, float, float, float]) -> bool:
+    """True when no mask cell overlapping `cell` is inside or on the boundary."""
+    c0 = math.floor((cell[0] - mask.x0) / mask.cell_deg)
+    r0 = math.floor((cell[1] - mask.y0) / mask.cell_deg)
+    c1 = math.floor((cell[2] - mask.x0) / mask.cell_deg)
+    r1 = math.floor((cell[3] - mask.y0) / mask.cell_deg)
+    if c1 < 0 or r1 < 0 or c0 >= mask.ncols or r0 >= mask.nrows:
+        return True
+    states = mask.states[max(r0, 0):min(r1, mask.nrows - 1) + 1, max(c0, 0):min(c1, mask.ncols - 1) + 1]
+    return bool((states == OUTSIDE).all())
+
+
+def _file_extents(con, pattern: str) -> list[tuple]:
+    """
+    (file, xmin_lo, xmin_hi, ymin_lo, ymin_hi) per source file, from the footer statistics of bbox.xmin / bbox.ymin.
+
+    Computed once per build and kept in `t1_build_files`; a file without statistics gets
+    NULL bounds and is read by every chunk.
+    """
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS t1_build_files (
+            file VARCHAR PRIMARY KEY, xmin_lo DOUBLE, xmin_hi DOUBLE, ymin_lo DOUBLE, ymin_hi DOUBLE
+        )
+    """)
+    if con.execute("SELECT COUNT(*) FROM t1_build_files").fetchone()[0] == 0:
+        start_time = time()
+        con.execute("""
+            INSERT INTO t1_build_files
+            WITH stats AS (
+                SELECT
+                    file_name,
+                    bool_or(stats_min_value IS NULL OR stats_max_value IS NULL) AS missing,
+                    MIN(TRY_CAST(stats_min_value AS DOUBLE)) FILTER (WHERE path_in_schema = 'bbox, xmin') AS x_lo,
+                    MAX(TRY_CAST(stats_max_value AS DOUBLE)) FILTER (WHERE path_in_schema = 'bbox, xmin') AS x_hi,
+                    MIN(TRY_CAST(stats_min_value AS DOUBLE)) FILTER (WHERE path_in_schema = 'bbox, ymin') AS y_lo,
+                    MAX(TRY_CAST(stats_max_value AS DOUBLE)) FILTER (WHERE path_in_schema = 'bbox, ymin') AS y_hi
+                FROM parquet_metadata(?)
+                WHERE path_in_schema IN ('bbox, xmin', 'bbox, ymin')
+                GROUP BY file_name
+            )
+            SELECT
+                file_name,
+                CASE WHEN missing THEN NULL ELSE x_lo END,
+                CASE WHEN missing THEN NULL ELSE x_hi END,
+                CASE WHEN missing THEN NULL ELSE y_lo END,
+                CASE WHEN missing THEN NULL ELSE y_hi END
+            FROM stats
+        """, [pattern])
+        logging.info(f"Read bbox statistics of {con.execute('SELECT COUNT(*) FROM t1_build_files').fetchone()[0]} files in {time() - start_time:.1f} seconds")
+    return con.execute("SELECT * FROM t1_build_files ORDER BY file").fetchall()
+
+
+def _overlapping(extents: list[tuple], area: tuple) -> list[str]:
+    """Files that can hold a building whose bbox.xmin / bbox.ymin falls inside `area`."""
+    xmin, ymin, xmax, ymax = area
+    return [
+        file for file, x_lo, x_hi, y_lo, y_hi in extents
+        if x_lo is None or (x_lo <= xmax and x_hi >= xmin and y_lo <= ymax and y_hi >= ymin)
+    ]
+
+
+def _read_files(files: list[str]) -> str:
+    paths = ", ".join("'" + f.replace("'", "''") + "'" for f in files)
+    return f"read_parquet([{paths}], hive_partitioning = 1)"
+
+
+def _select_sql(source: str, geom: str, bbox: tuple, chunk_bbox: tuple | None, mask_filter: str | None) -> str:
+    """The notebook's projection and filters for one chunk."""
+    xmin, ymin, xmax, ymax = bbox
+    if chunk_bbox is None:
+        # Whole file: keep buildings entirely inside the area, as the notebook does
+        where = [f"bbox.xmin >= {xmin}", f"bbox.ymin >= {ymin}"]
+    else:
+        # Grid cell: half-open on xmin / ymin so a building is owned by exactly one cell
+        cxmin, cymin, cxmax, cymax = chunk_bbox
+        x_upper = "<=" if cxmax >= xmax else "<"
+        y_upper = "<=" if cymax >= ymax else "<"
+        where = [
+            f"bbox.xmin >= {cxmin}", f"bbox.xmin {x_upper} {cxmax}",
+            f"bbox.ymin >= {cymin}", f"bbox.ymin {y_upper} {cymax}",
+        ]
+    where += [
+        f"bbox.xmax <= {xmax}", f"bbox.ymax <= {ymax}",
+        "subtype IS NOT NULL", "class IS NOT NULL", "height IS NOT NULL",
+    ]
+    if mask_filter:
+        where.append(mask_filter)
+    return f"""
+        SELECT
+            ST_Transform({geom}, 'EPSG:4326', 'EPSG:3857', always_xy := true) AS geometry,
+            subtype,
+            class,
+            height
+        FROM {source}
+        WHERE {" AND ".join(where)}
+    """
+
+
+def build_tiles_db(
+    db_path: str,
+    source: str = OVERTURE_BUILDINGS_PATH,
+    bbox: tuple[float, float, float, float] | None = None,
+    boundary_path: str | None = None,
+    mask_cell_deg: float = 0.05,
+    chunk_by: str = "grid",
+    chunk_deg: float = 0.25,
+    memory_limit: str | None = "2GB",
+    threads: int | None = None,
+    temp_directory: str | None = None,
+    restart: bool = False,
+    create_index: bool = True,
+) -> dict:
+    """
+    Append Overture buildings to `t1` in `db_path` chunk by chunk, resuming where a previous run stopped.
+
+    Args:
+        db_path (str): DuckDB file to create or resume.
+        source (str): Overture buildings parquet (S3 glob) or a local directory of Overture-shaped parquet.
+        bbox (tuple | None): (xmin, ymin, xmax, ymax) in degrees; defaults to the boundary's extent.
+        boundary_path (str | None): Boundary file; buildings whose bbox centre falls outside it are dropped.
+        mask_cell_deg (float): Cell size of the boundary mask.
+        chunk_by (str): "grid" (bbox cells of `chunk_deg`) or "file" (one source file per chunk).
+        chunk_deg (float): Grid cell size in degrees.
+        memory_limit (str | None): DuckDB memory limit, e.g. "2GB"; larger chunks spill to disk.
+        threads (int | None): DuckDB worker threads (default: DuckDB's choice).
+        temp_directory (str | None): Spill directory (default: next to the database).
+        restart (bool): Drop `t1` and the checkpoints and build from scratch.
+        create_index (bool): Build the RTREE index on geometry after the last chunk.
+
+    Returns:
+        dict: Chunk and row counts, rows per second and build time.
+    """
+    start_time = time()
+    mask = None
+    if boundary_path:
+        mask = BoundaryMask.from_file(boundary_path, cell_deg=mask_cell_deg)
+        if bbox is None:
+            bbox = (mask.x0, mask.y0, mask.x0 + mask.ncols * mask.cell_deg, mask.y0 + mask.nrows * mask.cell_deg)
+    if bbox is None:
+        raise ValueError("Give a bbox or a boundary file to build tiles for")
+    if chunk_by not in ("grid", "file"):
+        raise ValueError(f"chunk_by must be 'grid' or 'file', not {chunk_by!r}")
+
+    os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+    settings = {
+        # Appending does not need input order, and keeping it costs memory
+        "preserve_insertion_order": False,
+        "temp_directory": temp_directory or f"{db_path}.tmp",
+    }
+    if memory_limit:
+        settings["memory_limit"] = memory_limit
+    if threads:
+        settings["threads"] = threads
+    con = duckdb.connect(db_path, config=settings)
+    try:
+        con.execute("INSTALL spatial; LOAD spatial;")
+        pattern = source_pattern(source)
+        if pattern.startswith(("s3://", "http://", "https://")):
+            con.execute("INSTALL httpfs; LOAD httpfs;")
+            con.execute("SET s3_region = 'us-west-2';")
+
+        # Keep parquet footers and HTTP metadata between chunk queries
+        available = {r[0] for r in con.execute("SELECT name FROM duckdb_settings()").fetchall()}
+        for setting in METADATA_CACHE_SETTINGS:
+            if setting in available:
+                con.execute(f"SET GLOBAL {setting} = true;")
+
+        ## 1. Build parameters: a resumed build must use the ones it started with
+        params = json.dumps({
+            "source": pattern, "bbox": list(bbox), "boundary": boundary_path, "mask_cell_deg": mask_cell_deg,
+            "chunk_by": chunk_by, "chunk_deg": chunk_deg,
+        })
+        if restart:
+            con.execute(
+                f"DROP INDEX IF EXISTS {INDEX_NAME}; DROP TABLE IF EXISTS t1; DROP TABLE IF EXISTS t1_build_chunks; "
+                "DROP TABLE IF EXISTS t1_build_params; DROP TABLE IF EXISTS t1_build_files;"
+            )
+        con.execute("CREATE TABLE IF NOT EXISTS t1_build_params (params VARCHAR)")
+        previous = con.execute("SELECT params FROM t1_build_params").fetchone()
+        if previous is None:
+            con.execute("INSERT INTO t1_build_params VALUES (?)", [params])
+        elif previous[0] != params:
+            raise ValueError(f"{db_path} was started with {previous[0]}; pass restart=True (--restart) to rebuild it with new parameters")
+        con.execute("""
+            CREATE TABLE IF NOT EXISTS t1_build_chunks (
+                chunk_id VARCHAR PRIMARY KEY, rows BIGINT, seconds DOUBLE, finished_at TIMESTAMP
+            )
+        """)
+
+        ## 2. Chunks still to do, each with the source files it needs
+        extents = _file_extents(con, pattern)
+        if not extents:
+            raise ValueError(f"No parquet files in {pattern}")
+        if chunk_by == "grid":
+            chunks = [dict(c, files=_overlapping(extents, c["bbox"])) for c in grid_chunks(bbox, chunk_deg, mask)]
+        else:
+            chunks = [{"id": f"file:{f}", "bbox": None, "files": [f]} for f in _overlapping(extents, bbox)]
+        if not chunks:
+            raise ValueError(f"No chunks to build: nothing in {pattern} for {bbox}")
+        done = {r[0] for r in con.execute("SELECT chunk_id FROM t1_build_chunks").fetchall()}
+        pending = [c for c in chunks if c["id"] not in done]
+        logging.info(f"Building {db_path}: {len(chunks)} chunks, {len(done)} already done, {len(pending)} to go")
+
+        mask_filter = None
+        if mask is not None:
+            # Earlier builds stored the mask as a table in the served file
+            con.execute("DROP TABLE IF EXISTS main.boundary_mask")
+            mask.register(con)
+            mask_filter = mask.sql_filter("(bbox.xmin + bbox.xmax) / 2", "(bbox.ymin + bbox.ymax) / 2")
+
+        if pending:
+            schema_source = _read_files([extents[0][0]])
+            geom = geometry_expr(con, schema_source, column="geometry")
+            con.execute(f"CREATE TABLE IF NOT EXISTS t1 AS {_select_sql(schema_source, geom, bbox, None, None)} LIMIT 0")
+            # Appending to an indexed table is slow; the index is rebuilt once at the end
+            con.execute(f"DROP INDEX IF EXISTS {INDEX_NAME}")
+
+        ## 3. One transaction per chunk: its rows and its checkpoint commit together
+        loaded_rows, loaded_seconds = 0, 0.0
+        for n, chunk in enumerate(pending, start=1):
+            chunk_start = time()
+            con.execute("BEGIN TRANSACTION")
+            try:
+                rows = 0
+                # Cells that no file overlaps are recorded as done without a query
+                if chunk["files"]:
+                    rows = con.execute(
+                        f"INSERT INTO t1 {_select_sql(_read_files(chunk['files']), geom, bbox, chunk['bbox'], mask_filter)}"
+                    ).fetchone()[0]
+                seconds = time() - chunk_start
+                con.execute("INSERT INTO t1_build_chunks VALUES (?, ?, ?, now())", [chunk["id"], rows, seconds])
+            except BaseException:
+                con.execute("ROLLBACK")
+                raise
+            con.execute("COMMIT")
+            # Write the chunk into the database file so the WAL stays small
+            con.execute("CHECKPOINT")
+
+            loaded_rows += rows
+            loaded_seconds += time() - chunk_start
+            rate = loaded_rows / loaded_seconds if loaded_seconds else 0.0
+            eta = loaded_seconds / n * (len(pending) - n)
+            logging.info(
+                f"Chunk {len(done) + n}/{len(chunks)} {chunk['id']}: {rows:,} rows in {seconds:.1f} seconds "
+                f"({rows / seconds if seconds else 0:,.0f} rows/s); this run {loaded_rows:,} rows at {rate:,.0f} rows/s, ETA {eta:.0f} seconds"
+            )
+
+        ## 4. Index and totals
+        if create_index and con.execute(f"SELECT COUNT(*) FROM duckdb_indexes() WHERE index_name = '{INDEX_NAME}'").fetchone()[0] == 0:
+            index_start = time()
+            con.execute(f"CREATE INDEX {INDEX_NAME} ON t1 USING RTREE (geometry);")
+            con.execute("CHECKPOINT")
+            logging.info(f"Built {INDEX_NAME} in {time() - index_start:.1f} seconds")
+        total_rows = con.execute("SELECT COUNT(*) FROM t1").fetchone()[0]
+    finally:
+        con.close()
+
+    summary = {
+        "chunks": len(chunks),
+        "chunks_built": len(pending),
+        "rows_loaded": loaded_rows,
+        "rows_total": total_rows,
+        "rows_per_second": round(loaded_rows / loaded_seconds) if loaded_seconds else None,
+        "seconds": round(time() - start_time, 2),
+    }
+    logging.info(f"Built {db_path}: {summary}")
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build tiles.db (t1) from Overture buildings in resumable, memory-bounded chunks.")
+    parser.add_argument("--source", default=OVERTURE_BUILDINGS_PATH, help="Overture buildings parquet glob or a local directory.")
+    parser.add_argument("--output", default=os.path.join("data", "tiles.db"))
+    parser.add_argument("--bbox", type=float, nargs=4, metavar=("XMIN", "YMIN", "XMAX", "YMAX"))
+    parser.add_argument("--boundary", help="Boundary file to clip to, e.g. india.geojson (also sets the bbox).")
+    parser.add_argument("--chunk-by", choices=("grid", "file"), default="grid")
+    parser.add_argument("--chunk-deg", type=float, default=0.25)
+    parser.add_argument("--memory-limit", default="2GB")
+    parser.add_argument("--threads", type=int)
+    parser.add_argument("--temp-dir")
+    parser.add_argument("--restart", action="store_true", help="Discard t1 and the checkpoints and start over.")
+    parser.add_argument("--no-index", action="store_true", help="Skip the RTREE index.")
+    args = parser.parse_args()
+    print(build_tiles_db(
+        args.output, args.source, tuple(args.bbox) if args.bbox else None, args.boundary,
+        chunk_by=args.chunk_by, chunk_deg=args.chunk_deg, memory_limit=args.memory_limit,
+        threads=args.threads, temp_directory=args.temp_dir, restart=args.restart, create_index=not args.no_index,
+    ))
+
+
+if __name__ == "__main__":
+    main()
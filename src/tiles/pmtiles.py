@@ -0,0 +1,535 @@
+"""
+Pure-Python PMTiles v3 reader, region extractor and writer.
+
+The reader memory-maps the archive and parses directories lazily (root at open, leaf
+directories on first use, kept in a small LRU), so serving a tile is a couple of
+binary searches and a slice of the mapped file. The extractor replaces
+`pmtiles extract ... --region=india.geojson`:
+
+- it rasterises the region into the tiles it covers at max zoom, then adds their parents;
+- it copies only those tile payloads, deduplicating identical ones;
+- it run-length encodes consecutive tile ids that share a payload;
+- it writes root and leaf directories as the spec lays them out.
+
+Spec: https://github.com/protomaps/PMTiles/blob/main/spec/v3/spec.md
+
+Usage:
+    python -m src.tiles.pmtiles extract planet.pmtiles india.pmtiles --region india.geojson --maxzoom 14
+    python -m src.tiles.pmtiles show india.pmtiles
+"""
+import argparse
+import bisect
+import gzip
+import hashlib
+import json
+import math
+import mmap
+import os
+import struct
+import tempfile
+import threading
+from collections import OrderedDict
+from time import time
+import numpy as np
+from src.db.boundary_mask import BoundaryMask, OUTSIDE
+from src.utils.logger import logging
+from src.utils.metrics import record_cache
+
+
+HEADER_FORMAT = "<7sB11QBBBBBBiiiiBii"
+HEADER_SIZE = 127
+ROOT_DIRECTORY_MAX = 16384 - HEADER_SIZE
+
+COMPRESSION_UNKNOWN, COMPRESSION_NONE, COMPRESSION_GZIP, COMPRESSION_BROTLI, COMPRESSION_ZSTD = range(5)
+CONTENT_ENCODING = {COMPRESSION_GZIP: "gzip", COMPRESSION_BROTLI: "br", COMPRESSION_ZSTD: "zstd"}
+TILE_MIMETYPES = {1: "application/x-protobuf", 2: "image/png", 3: "image/jpeg", 4: "image/webp", 5: "image/avif"}
+
+HEADER_FIELDS = [
+    "root_offset", "root_length", "metadata_offset", "metadata_length",
+    "leaf_directory_offset", "leaf_directory_length", "tile_data_offset", "tile_data_length",
+    "addressed_tiles_count", "tile_entries_count", "tile_contents_count",
+    "clustered", "internal_compression", "tile_compression", "tile_type", "min_zoom", "max_zoom",
+    "min_lon_e7", "min_lat_e7", "max_lon_e7", "max_lat_e7", "center_zoom", "center_lon_e7", "center_lat_e7",
+]
+
+
+## Tile ids (Hilbert curve order within each zoom)
+
+def _rotate(n, x, y, rx, ry):
+    if ry == 0:
+        if rx == 1:
+            x, y = n - 1 - x, n - 1 - y
+        x, y = y, x
+    return x, y
+
+
+def zxy_to_tileid(z: int, x: int, y: int) -> int:
+    """PMTiles tile id: tiles of all lower zooms, plus the Hilbert index of (x, y) at zoom z."""
+    n = 1 << z
+    if x >= n or y >= n or x < 0 or y < 0:
+        raise ValueError(f"Tile {z}/{x}/{y} is out of range")
+    acc = ((1 << (2 * z)) - 1) // 3
+    d = 0
+    s = n >> 1
+    while s > 0:
+        rx = 1 if x & s else 0
+        ry = 1 if y & s else 0
+        d += s * s * ((3 * rx) ^ ry)
+        x, y = _rotate(n, x, y, rx, ry)
+        s >>= 1
+    return acc + d
+
+
+def zxy_to_tileid_array(z: int, x: np.ndarray, y: np.ndarray) -> np.ndarray:
+    """Vectorised `zxy_to_tileid` for many tiles of one zoom."""
+    n = np.int64(1 << z)
+    x = np.asarray(x, dtype=np.int64).copy()
+    y = np.asarray(y, dtype=np.int64).copy()
+    d = np.zeros(len(x), dtype=np.int64)
+    s = int(n) >> 1
+    while s > 0:
+        rx = (x & s) > 0
+        ry = (y & s) > 0
+        d += s * s * ((3 * rx.astype(np.int64)) ^ ry.astype(np.int64))
+        flip = ~ry & rx
+        x = np.where(flip, n - 1 - x, x)
+        y = np.where(flip, n - 1 - y, y)
+        swap = ~ry
+        x, y = np.where(swap, y, x), np.where(swap, x, y)
+        s >>= 1
+    return d + ((1 << (2 * z)) - 1) // 3
+
+
+def tileid_to_zxy(tile_id: int) -> tuple[int, int, int]:
+    """Inverse of `zxy_to_tileid`."""
+    acc = 0
+    for z in range(32):
+        count = 1 << (2 * z)
+        if tile_id < acc + count:
+            t = tile_id - acc
+            n = 1 << z
+            x = y = 0
+            s = 1
+            while s < n:
+                rx = 1 & (t // 2)
+                ry = 1 & (t ^ rx)
+                x, y = _rotate(s, x, y, rx, ry)
+                x += s * rx
+                y += s * ry
+                t //= 4
+                s *= 2
+            return z, x, y
+        acc += count
+    raise ValueError(f"Tile id {tile_id} is out of range")
+
+
+## Varints, directories and headers
+
+def _write_varint(buf: bytearray, value: int):
+    while value >= 0x80:
+        buf.append((value & 0x7F) | 0x80)
+        value >>= 7
+    buf.append(value)
+
+
+def _read_varint(data, pos: int) -> tuple[int, int]:
+    value = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+def _decompress(data: bytes, compression: int) -> bytes:
+    if compression in (COMPRESSION_NONE, COMPRESSION_UNKNOWN):
+        return bytes(data)
+    if compression == COMPRESSION_GZIP:
+        return gzip.decompress(data)
+    if compression == COMPRESSION_ZSTD:
+        import zstandard
+        return zstandard.ZstdDecompressor().decompress(data)
+    if compression == COMPRESSION_BROTLI:
+        import brotli
+        return brotli.decompress(data)
+    raise ValueError(f"Unsupported PMTiles compression {compression}")
+
+
+class Directory:
+    """One PMTiles directory as parallel lists, ready for binary search on tile id."""
+
+    __slots__ = ("tile_ids", "offsets", "lengths", "run_lengths")
+
+    def __init__(self, tile_ids, offsets, lengths, run_lengths):
+        self.tile_ids = tile_ids
+        self.offsets = offsets
+        self.lengths = lengths
+        self.run_lengths = run_lengths
+
+    def __len__(self):
+        return len(self.tile_ids)
+
+    @classmethod
+    def deserialize(cls, data: bytes) -> "Directory":
+        count, pos = _read_varint(data, 0)
+        tile_ids, run_lengths, lengths, offsets = [0] * count, [0] * count, [0] * count, [0] * count
+        last = 0
+        for i in range(count):
+            delta, pos = _read_varint(data, pos)
+            last += delta
+            tile_ids[i] = last
+        for i in range(count):
+            run_lengths[i], pos = _read_varint(data, pos)
+        for i in range(count):
+            lengths[i], pos = _read_varint(data, pos)
+        for i in range(count):
+            value, pos = _read_varint(data, pos)
+            # 0 means "directly after the previous entry"
+            offsets[i] = offsets[i - 1] + lengths[i - 1] if value == 0 and i > 0 else value - 1
+        return cls(tile_ids, offsets, lengths, run_lengths)
+
+    def serialize(self) -> bytes:
+        buf = bytearray()
+        _write_varint(buf, len(self))
+        last = 0
+        for tile_id in self.tile_ids:
+            _write_varint(buf, tile_id - last)
+            last = tile_id
+        for run_length in self.run_lengths:
+            _write_varint(buf, run_length)
+        for length in self.lengths:
+            _write_varint(buf, length)
+        for i, offset in enumerate(self.offsets):
+            if i > 0 and offset == self.offsets[i - 1] + self.lengths[i - 1]:
+                _write_varint(buf, 0)
+            else:
+                _write_varint(buf, offset + 1)
+        return gzip.compress(bytes(buf), mtime=0)
+
+    def find(self, tile_id: int) -> int | None:
+        """Index of the entry holding `tile_id` (or the leaf pointer covering it), else None."""
+        i = bisect.bisect_right(self.tile_ids, tile_id) - 1
+        if i < 0:
+            return None
+        if self.run_lengths[i] == 0:
+            return i
+        if tile_id - self.tile_ids[i] < self.run_lengths[i]:
+            return i
+        return None
+
+
+def deserialize_header(data: bytes) -> dict:
+    values = struct.unpack(HEADER_FORMAT, data[:HEADER_SIZE])
+    magic, version = values[0], values[1]
+    if magic != b"PMTiles" or version != 3:
+        raise ValueError("Not a PMTiles v3 archive")
+    return dict(zip(HEADER_FIELDS, values[2:]))
+
+
+def serialize_header(header: dict) -> bytes:
+    return struct.pack(HEADER_FORMAT, b"PMTiles", 3, *(header[field] for field in HEADER_FIELDS))
+
+
+## Reading
+
+class PMTilesReader:
+    """Memory-mapped, lazily indexed PMTiles archive."""
+
+    def __init__(self, path: str, leaf_cache_size: int = 256):
+        self.path = path
+        self._file = open(path, "rb")
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mmap)
+        self.header = deserialize_header(self._mmap[:HEADER_SIZE])
+        self.root = self._read_directory(self.header["root_offset"], self.header["root_length"])
+        self._leaves: OrderedDict[int, Directory] = OrderedDict()
+        self._leaf_cache_size = leaf_cache_size
+        self._lock = threading.Lock()
+
+    def _read_directory(self, offset: int, length: int) -> Directory:
+        data = _decompress(self._mmap[offset:offset + length], self.header["internal_compression"])
+        return Directory.deserialize(data)
+
+    def _leaf(self, offset: int, length: int) -> Directory:
+        # Request threads share the LRU; the directory itself is decoded outside the lock
+        with self._lock:
+            leaf = self._leaves.get(offset)
+            if leaf is not None:
+                self._leaves.move_to_end(offset)
+        record_cache("pmtiles_leaf_directory", leaf is not None)
+        if leaf is not None:
+            return leaf
+
+        leaf = self._read_directory(self.header["leaf_directory_offset"] + offset, length)
+        with self._lock:
+            self._leaves[offset] = leaf
+            if len(self._leaves) > self._leaf_cache_size:
+                self._leaves.popitem(last=False)
+        return leaf
+
+    def locate(self, tile_id: int) -> tuple[int, int] | None:
+        """Absolute (offset, length) of a tile's payload in the file, or None if absent."""
+        directory = self.root
+        for _ in range(4):  # the spec caps directory depth
+            i = directory.find(tile_id)
+            if i is None:
+                return None
+            if directory.run_lengths[i] > 0:
+                return self.header["tile_data_offset"] + directory.offsets[i], directory.lengths[i]
+            directory = self._leaf(directory.offsets[i], directory.lengths[i])
+        return None
+
+    def get_tile_view(self, z: int, x: int, y: int) -> memoryview | None:
+        """The tile payload as a memoryview over the mapped file (no copy), or None."""
+        if not 0 <= x < (1 << z) or not 0 <= y < (1 << z):
+            return None
+        location = self.locate(zxy_to_tileid(z, x, y))
+        if location is None:
+            return None
+        offset, length = location
+        return self._view[offset:offset + length]
+
+    def metadata(self) -> dict:
+        offset, length = self.header["metadata_offset"], self.header["metadata_length"]
+        if not length:
+            return {}
+        return json.loads(_decompress(self._mmap[offset:offset + length], self.header["internal_compression"]))
+
+    @property
+    def content_encoding(self) -> str | None:
+        return CONTENT_ENCODING.get(self.header["tile_compression"])
+
+    @property
+    def mimetype(self) -> str:
+        return TILE_MIMETYPES.get(self.header["tile_type"], "application/octet-stream")
+
+    def close(self):
+        self._view.release()
+        self._mmap.close()
+        self._file.close()
+
+
+## Writing and extraction
+
+def _build_directories(tile_ids, offsets, lengths, run_lengths) -> tuple[bytes, bytes]:
+    """Serialised root directory and leaf directories, keeping the root within the first 16 KiB."""
+    entries = Directory(tile_ids, offsets, lengths, run_lengths)
+    if len(entries) < 16384:
+        root = entries.serialize()
+        if len(root) <= ROOT_DIRECTORY_MAX:
+            return root, b""
+
+    leaf_size = max(4096, len(entries) // 3500)
+    while True:
+        root_ids, root_offsets, root_lengths = [], [], []
+        leaves = bytearray()
+        for start in range(0, len(entries), leaf_size):
+            end = start + leaf_size
+            leaf = Directory(tile_ids[start:end], offsets[start:end], lengths[start:end], run_lengths[start:end]).serialize()
+            root_ids.append(tile_ids[start])
+            root_offsets.append(len(leaves))
+            root_lengths.append(len(leaf))
+            leaves += leaf
+        root = Directory(root_ids, root_offsets, root_lengths, [0] * len(root_ids)).serialize()
+        if len(root) <= ROOT_DIRECTORY_MAX:
+            return root, bytes(leaves)
+        leaf_size = int(leaf_size * 1.2)
+
+
+def region_tile_ids(region: dict, min_zoom: int, max_zoom: int) -> np.ndarray:
+    """
+    Sorted ids of every tile from `min_zoom` to `max_zoom` that touches the region.
+
+    The region is rasterised with a BoundaryMask whose cells match the tile size at
+    `max_zoom`, so tiles are included at roughly one max-zoom tile of precision.
+    """
+    cell_deg = 360 / (1 << max_zoom)
+    mask = BoundaryMask(region, cell_deg=cell_deg)
+    rows, cols = np.nonzero(mask.states != OUTSIDE)
+    lon0 = mask.x0 + cols * cell_deg
+    lat0 = mask.y0 + rows * cell_deg
+
+    n = 1 << max_zoom
+
+    def _tile_x(lon):
+        return np.clip(((lon + 180) / 360 * n).astype(np.int64), 0, n - 1)
+
+    def _tile_y(lat):
+        lat = np.radians(np.clip(lat, -85.0511, 85.0511))
+        return np.clip(((1 - np.arcsinh(np.tan(lat)) / math.pi) / 2 * n).astype(np.int64), 0, n - 1)
+
+    x_lo, x_hi = _tile_x(lon0), _tile_x(lon0 + cell_deg)
+    y_lo, y_hi = _tile_y(lat0 + cell_deg), _tile_y(lat0)  # tile y grows southwards
+    keys = []
+    for dx in range(int((x_hi - x_lo).max(initial=0)) + 1):
+        for dy in range(int((y_hi - y_lo).max(initial=0)) + 1):
+            ok = (x_lo + dx <= x_hi) & (y_lo + dy <= y_hi)
+            keys.append((x_lo + dx)[ok] * n + (y_lo + dy)[ok])
+    keys = np.unique(np.concatenate(keys)) if keys else np.empty(0, dtype=np.int64)
+    xs, ys = keys // n, keys % n
+
+    ids = []
+    for z in range(max_zoom, min_zoom - 1, -1):
+        ids.append(zxy_to_tileid_array(z, xs, ys))
+        parent = np.unique((xs >> 1) * (1 << (z - 1)) + (ys >> 1)) if z > 0 else None
+        if parent is not None:
+            xs, ys = parent // (1 << (z - 1)), parent % (1 << (z - 1))
+    return np.unique(np.concatenate(ids))
+
+
+def extract(input_path: str, output_path: str, region: dict, min_zoom: int | None = None, max_zoom: int | None = None) -> dict:
+    """
+    Write a new archive containing only the tiles of `input_path` that touch `region`.
+
+    Args:
+        input_path (str): Source PMTiles archive (local file).
+        output_path (str): Archive to create.
+        region (dict): GeoJSON geometry, Feature or FeatureCollection in EPSG:4326.
+        min_zoom (int | None): Lowest zoom to keep (default: the source's).
+        max_zoom (int | None): Highest zoom to keep (default: the source's).
+
+    Returns:
+        dict: Counts of addressed tiles, directory entries and unique payloads.
+    """
+    start_time = time()
+    reader = PMTilesReader(input_path)
+    header = reader.header
+    min_zoom = header["min_zoom"] if min_zoom is None else max(min_zoom, header["min_zoom"])
+    max_zoom = header["max_zoom"] if max_zoom is None else min(max_zoom, header["max_zoom"])
+    wanted = region_tile_ids(region, min_zoom, max_zoom)
+    logging.info(f"Region covers {len(wanted)} tiles between z{min_zoom} and z{max_zoom}")
+
+    tile_ids, offsets, lengths, run_lengths = [], [], [], []
+    by_source: dict[tuple[int, int], int] = {}  # source (offset, length) -> output offset
+    by_hash: dict[bytes, int] = {}              # payload digest -> output offset
+    data_length = 0
+    with tempfile.TemporaryFile() as tile_data:
+        for tile_id in wanted.tolist():
+            location = reader.locate(tile_id)
+            if location is None:
+                continue
+            out_offset = by_source.get(location)
+            if out_offset is None:
+                with reader._view[location[0]:location[0] + location[1]] as payload:
+                    digest = hashlib.blake2b(payload, digest_size=16).digest()
+                    out_offset = by_hash.get(digest)
+                    if out_offset is None:
+                        out_offset = data_length
+                        tile_data.write(payload)
+                        data_length += location[1]
+                        by_hash[digest] = out_offset
+                by_source[location] = out_offset
+
+            # Run-length encode consecutive ids pointing at the same payload
+            if tile_ids and offsets[-1] == out_offset and tile_ids[-1] + run_lengths[-1] == tile_id:
+                run_lengths[-1] += 1
+            else:
+                tile_ids.append(tile_id)
+                offsets.append(out_offset)
+                lengths.append(location[1])
+                run_lengths.append(1)
+
+        root, leaves = _build_directories(tile_ids, offsets, lengths, run_lengths)
+        metadata = gzip.compress(json.dumps(reader.metadata()).encode("utf-8"), mtime=0)
+
+        rings = [c for c in _region_points(region)]
+        lons = [p[0] for p in rings] or [-180]
+        lats = [p[1] for p in rings] or [-85]
+        new_header = dict(header)
+        new_header.update(
+            root_offset=HEADER_SIZE,
+            root_length=len(root),
+            metadata_offset=HEADER_SIZE + len(root),
+            metadata_length=len(metadata),
+            leaf_directory_offset=HEADER_SIZE + len(root) + len(metadata),
+            leaf_directory_length=len(leaves),
+            tile_data_offset=HEADER_SIZE + len(root) + len(metadata) + len(leaves),
+            tile_data_length=data_length,
+            addressed_tiles_count=sum(run_lengths),
+            tile_entries_count=len(tile_ids),
+            tile_contents_count=len(by_hash),
+            clustered=1,
+            internal_compression=COMPRESSION_GZIP,
+            min_zoom=min_zoom,
+            max_zoom=max_zoom,
+            min_lon_e7=int(min(lons) * 1e7), min_lat_e7=int(min(lats) * 1e7),
+            max_lon_e7=int(max(lons) * 1e7), max_lat_e7=int(max(lats) * 1e7),
+            center_zoom=min(max(header["center_zoom"], min_zoom), max_zoom),
+            center_lon_e7=int((min(lons) + max(lons)) / 2 * 1e7),
+            center_lat_e7=int((min(lats) + max(lats)) / 2 * 1e7),
+        )
+
+        os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+        with open(output_path, "wb") as out:
+            out.write(serialize_header(new_header))
+            out.write(root)
+            out.write(metadata)
+            out.write(leaves)
+            tile_data.seek(0)
+            while chunk := tile_data.read(1 << 20):
+                out.write(chunk)
+    reader.close()
+
+    summary = {
+        "addressed_tiles": new_header["addressed_tiles_count"],
+        "tile_entries": new_header["tile_entries_count"],
+        "tile_contents": new_header["tile_contents_count"],
+        "bytes": os.path.getsize(output_path),
+        "seconds": round(time() - start_time, 2),
+    }
+    logging.info(f"Extracted {output_path}: {summary}")
+    return summary
+
+
+def _region_points(geometry: dict):
+    """All coordinate pairs of a GeoJSON object (for its bounding box)."""
+    kind = geometry.get("type")
+    if kind == "FeatureCollection":
+        for feature in geometry["features"]:
+            yield from _region_points(feature)
+    elif kind == "Feature":
+        if geometry.get("geometry"):
+            yield from _region_points(geometry["geometry"])
+    elif kind == "GeometryCollection":
+        for part in geometry["geometries"]:
+            yield from _region_points(part)
+    elif "coordinates" in geometry:
+        stack = [geometry["coordinates"]]
+        while stack:
+            item = stack.pop()
+            if item and isinstance(item[0], (int, float)):
+                yield item
+            else:
+                stack.extend(item)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PMTiles tools without the go-pmtiles binary.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    extract_parser = sub.add_parser("extract", help="Extract the tiles touching a region into a new archive.")
+    extract_parser.add_argument("input")
+    extract_parser.add_argument("output")
+    extract_parser.add_argument("--region", required=True, help="GeoJSON file with the region polygon(s).")
+    extract_parser.add_argument("--minzoom", type=int)
+    extract_parser.add_argument("--maxzoom", type=int)
+
+    show_parser = sub.add_parser("show", help="Print an archive's header and metadata.")
+    show_parser.add_argument("input")
+
+    args = parser.parse_args()
+    if args.command == "extract":
+        with open(args.region, encoding="utf-8") as f:
+            region = json.load(f)
+        print(extract(args.input, args.output, region, args.minzoom, args.maxzoom))
+    else:
+        reader = PMTilesReader(args.input)
+        print(json.dumps(reader.header, indent=2))
+        print(json.dumps(reader.metadata(), indent=2)[:2000])
+        reader.close()
+
+
+if __name__ == "__main__":
+    main()
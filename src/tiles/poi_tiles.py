@@ -0,0 +1,248 @@
+"""
+Clustered POI vector tiles from output.geoparquet.
+
+Points are projected to web mercator and bucketed on a grid of 64 x 64 cells per tile.
+Clusters are computed once at the finest cluster zoom and rolled up zoom by zoom (a
+parent cell is `ix >> 1, iy >> 1`), so the whole pyramid costs one scan of the
+geoparquet. Each cluster carries its count and dominant category. From `point_zoom`
+upwards, tiles carry the individual POIs instead, capped per tile. Either way, every
+tile has at most a few thousand features.
+
+Usage:
+    python -m src.tiles.poi_tiles --data-path data/output.geoparquet --db data/poi_tiles.db
+    python -m src.tiles.poi_tiles --if-stale   # pre-start step: rebuild only when missing or stale
+
+The tile server never builds: run the command once before starting the app workers.
+"""
+import argparse
+import os
+import duckdb
+import threading
+from collections import OrderedDict
+from time import time
+from src.db.duckdb_utils import get_duckdb_connection, geometry_expr
+from src.db.pool import get_pool
+from src.utils.logger import logging
+from src.utils.metrics import record_cache
+
+
+WORLD_HALF = 20037508.342789244  # half the web mercator extent in metres
+CLUSTER_BITS = 6                 # 2^6 x 2^6 cluster cells per tile
+POINT_ZOOM = 14
+MAX_POINTS_PER_TILE = 4096
+SCHEMA_VERSION = 2  # bumped when the tables change; older databases are rebuilt by ensure_poi_tiles
+
+
+def build_poi_tiles(data_path: str, db_path: str, point_zoom: int = POINT_ZOOM) -> dict:
+    """
+    Build the point and cluster tables that POI tiles are rendered from.
+
+    Args:
+        data_path (str): POI geoparquet with name, category and geom columns.
+        db_path (str): DuckDB file to (re)create the tables in.
+        point_zoom (int): First zoom that serves individual points instead of clusters.
+
+    Returns:
+        dict: Row counts and build time.
+    """
+    start_time = time()
+    fine = point_zoom - 1 + CLUSTER_BITS  # grid level of the finest cluster cells
+    con = get_duckdb_connection(database=db_path)
+    try:
+        source = f"read_parquet('{data_path}')"
+        geom = geometry_expr(con, source)
+
+        ## 1. Points in web mercator, tagged with their tile at point_zoom and sorted by it.
+        # `rank` is a fixed pseudo-random priority: crowded tiles keep the same points on every render
+        con.execute(f"""
+            CREATE OR REPLACE TABLE poi_points AS
+            WITH lonlat AS (
+                SELECT name, category, ST_X({geom}) AS lon,
+                       LEAST(GREATEST(ST_Y({geom}), -85.0511), 85.0511) AS lat
+                FROM {source}
+                WHERE geom IS NOT NULL
+            ),
+            merc AS (
+                SELECT name, category,
+                       lon * {WORLD_HALF} / 180 AS x,
+                       LN(TAN((90 + lat) * PI() / 360)) * {WORLD_HALF} / PI() AS y
+                FROM lonlat
+            ),
+            cells AS (
+                SELECT *,
+                       LEAST(CAST(FLOOR((x + {WORLD_HALF}) / {2 * WORLD_HALF} * {1 << fine}) AS BIGINT), {(1 << fine) - 1}) AS ix,
+                       LEAST(CAST(FLOOR(({WORLD_HALF} - y) / {2 * WORLD_HALF} * {1 << fine}) AS BIGINT), {(1 << fine) - 1}) AS iy
+                FROM merc
+            )
+            SELECT name, category, x, y, ix, iy,
+                   CAST(ix >> {fine - point_zoom} AS INTEGER) AS tx,
+                   CAST(iy >> {fine - point_zoom} AS INTEGER) AS ty,
+                   ROW_NUMBER() OVER (ORDER BY hash(name, x, y), x, y, name) AS rank
+            FROM cells
+            ORDER BY tx, ty
+        """)
+
+        ## 2. Category counts per cell at the finest cluster zoom, then one rollup per zoom
+        con.execute("""
+            CREATE OR REPLACE TEMP TABLE level AS
+            SELECT ix, iy, category, COUNT(*) AS n, SUM(x) AS sx, SUM(y) AS sy
+            FROM poi_points
+            GROUP BY ix, iy, category
+        """)
+        con.execute("""
+            CREATE OR REPLACE TEMP TABLE clusters (
+                z INTEGER, tx INTEGER, ty INTEGER, x DOUBLE, y DOUBLE, count BIGINT, category VARCHAR
+            )
+        """)
+        for z in range(point_zoom - 1, -1, -1):
+            # Clusters sit at the mean position of their points; the label is the most common category
+            con.execute(f"""
+                INSERT INTO clusters
+                SELECT {z}, CAST(ix >> {CLUSTER_BITS} AS INTEGER), CAST(iy >> {CLUSTER_BITS} AS INTEGER),
+                       SUM(sx) / SUM(n), SUM(sy) / SUM(n), SUM(n), arg_max(category, n)
+                FROM level
+                GROUP BY ix, iy
+            """)
+            if z > 0:
+                con.execute("""
+                    CREATE OR REPLACE TEMP TABLE level AS
+                    SELECT ix >> 1 AS ix, iy >> 1 AS iy, category, SUM(n) AS n, SUM(sx) AS sx, SUM(sy) AS sy
+                    FROM level
+                    GROUP BY 1, 2, 3
+                """)
+
+        ## 3. Persist clusters sorted by tile so a tile lookup only reads a few row groups
+        con.execute("CREATE OR REPLACE TABLE poi_clusters AS SELECT * FROM clusters ORDER BY z, tx, ty")
+        con.execute("DROP TABLE level; DROP TABLE clusters;")
+        con.execute(
+            "CREATE OR REPLACE TABLE poi_tiles_meta AS SELECT ? AS data_path, ? AS point_zoom, ? AS version",
+            [data_path, point_zoom, SCHEMA_VERSION],
+        )
+
+        points = con.execute("SELECT COUNT(*) FROM poi_points").fetchone()[0]
+        clusters = con.execute("SELECT COUNT(*) FROM poi_clusters").fetchone()[0]
+    finally:
+        con.close()
+
+    summary = {"points": points, "clusters": clusters, "seconds": round(time() - start_time, 2)}
+    logging.info(f"Built POI tiles in {db_path}: {summary}")
+    return summary
+
+
+def _schema_version(db_path: str) -> int | None:
+    try:
+        con = duckdb.connect(db_path, read_only=True)
+    except duckdb.Error:
+        return None
+    try:
+        return con.execute("SELECT version FROM poi_tiles_meta").fetchone()[0]
+    except duckdb.Error:
+        return None
+    finally:
+        con.close()
+
+
+def stale_reason(data_path: str | None, db_path: str) -> str | None:
+    """Why the tile database cannot be served as is (missing, older than the geoparquet, older schema), or None when it is up to date."""
+    if not os.path.exists(db_path):
+        return f"{db_path} does not exist"
+    if data_path and os.path.exists(data_path) and os.path.getmtime(db_path) < os.path.getmtime(data_path):
+        return f"{db_path} is older than {data_path}"
+    version = _schema_version(db_path)
+    if version != SCHEMA_VERSION:
+        return f"{db_path} has schema version {version}, expected {SCHEMA_VERSION}"
+    return None
+
+
+def ensure_poi_tiles(data_path: str, db_path: str, point_zoom: int = POINT_ZOOM) -> dict | None:
+    """Build the tile tables only when the database is missing, older than the geoparquet or of an older schema."""
+    reason = stale_reason(data_path, db_path)
+    if reason is None:
+        return None
+    logging.info(f"Rebuilding POI tiles: {reason}")
+    return build_poi_tiles(data_path, db_path, point_zoom)
+
+
+class PoiTileServer:
+    """Renders POI tiles from a database made by `build_poi_tiles`, with an LRU of encoded tiles."""
+
+    def __init__(self, db_path: str, cache_size: int = 2048):
+        self.pool = get_pool(db_path, read_only=True, extensions=("spatial",))
+        self.point_zoom = self.pool.execute("SELECT point_zoom FROM poi_tiles_meta")[0][0]
+        self._cache: OrderedDict[tuple[int, int, int], bytes] = OrderedDict()
+        self._cache_size = cache_size
+        self._lock = threading.Lock()
+
+    def tile(self, z: int, x: int, y: int) -> bytes:
+        key = (z, x, y)
+        with self._lock:
+            tile = self._cache.get(key)
+            if tile is not None:
+                self._cache.move_to_end(key)
+        record_cache("poi_tiles", tile is not None)
+        if tile is not None:
+            return tile
+
+        with self.pool.cursor() as cur:
+            tile = self._render(cur, z, x, y)
+        with self._lock:
+            self._cache[key] = tile
+            if len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+        return tile
+
+    def _render(self, cur, z: int, x: int, y: int) -> bytes:
+        if z < self.point_zoom:
+            query = """
+                SELECT ST_AsMVT({
+                    "geometry": ST_AsMVTGeom(ST_Point(x, y), ST_Extent(ST_TileEnvelope($1, $2, $3))),
+                    'count': count,
+                    'category': category
+                }, 'pois')
+                FROM poi_clusters
+                WHERE z = $1 AND tx = $2 AND ty = $3
+            """
+            params = [z, x, y]
+        else:
+            # Individual points: the point_zoom tile narrows the scan, the envelope trims it to this tile
+            shift = z - self.point_zoom
+            size = 2 * WORLD_HALF / (1 << z)
+            xmin = -WORLD_HALF + x * size
+            ymax = WORLD_HALF - y * size
+            query = f"""
+                SELECT ST_AsMVT({{
+                    "geometry": ST_AsMVTGeom(ST_Point(x, y), ST_Extent(ST_TileEnvelope($1, $2, $3))),
+                    'count': 1,
+                    'name': name,
+                    'category': category
+                }}, 'pois')
+                FROM (
+                    SELECT x, y, name, category
+                    FROM poi_points
+                    WHERE tx = $4 AND ty = $5
+                      AND x >= $6 AND x < $7 AND y > $8 AND y <= $9
+                    ORDER BY rank
+                    LIMIT {MAX_POINTS_PER_TILE}
+                )
+            """
+            params = [z, x, y, x >> shift, y >> shift, xmin, xmin + size, ymax - size, ymax]
+
+        tile_blob = cur.execute(query, params).fetchone()
+        return tile_blob[0] if tile_blob and tile_blob[0] else b''
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build clustered POI tile tables from a geoparquet.")
+    parser.add_argument("--data-path", default=os.path.join("data", "output.geoparquet"))
+    parser.add_argument("--db", default=os.path.join("data", "poi_tiles.db"))
+    parser.add_argument("--point-zoom", type=int, default=POINT_ZOOM)
+    parser.add_argument("--if-stale", action="store_true", help="Only build when the database is missing or stale.")
+    args = parser.parse_args()
+    if args.if_stale:
+        print(ensure_poi_tiles(args.data_path, args.db, args.point_zoom) or f"{args.db} is up to date")
+    else:
+        print(build_poi_tiles(args.data_path, args.db, args.point_zoom))
+
+
+if __name__ == "__main__":
+    main()
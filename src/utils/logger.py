@@ -1,22 +1,191 @@
+"""
+Logging setup shared by the API, the tile server and the data pipelines.
+
+Importing this module configures the root logger. Two modes, picked with LOG_MODE:
+
+- ``async`` (default): records are put on an in-memory queue by a QueueHandler and
+  written by a background QueueListener, so request threads never block on file I/O.
+  Records are JSON lines written to a rotating file per process.
+- ``sync``: the original behaviour, a plain FileHandler on a timestamped file.
+
+Environment variables (async mode):
+    LOG_FILE               Log file path, or "-" for stderr (default: logs/foursquare_ai.{pid}.log).
+                           "{pid}" is replaced by the process id: rotation is not safe across
+                           processes, so each server worker writes its own file.
+    LOG_LEVEL              Root level (default: INFO).
+    LOG_FORMAT             "json" (default) or "text".
+    LOG_ROTATE             "size" (default) or "time".
+    LOG_MAX_BYTES          Size rotation threshold (default: 50 MB).
+    LOG_ROTATE_WHEN        Time rotation interval for TimedRotatingFileHandler (default: midnight).
+    LOG_BACKUP_COUNT       Rotated files to keep (default: 5).
+    LOG_DEBUG_SAMPLE_RATE  Fraction of DEBUG records kept (default: 0.01); other levels are never sampled.
+"""
+import atexit
+import copy
+import json
 import logging
+import logging.handlers
 import os
-from datetime import datetime
+import queue
+import random
+import sys
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
 
 # import sys
 # from exception import CustomException
 
-LOG_FILE = f"{datetime.now().strftime('%m_%d_%Y_%H_%M_%S')}.log"
+LOG_MODE = os.environ.get("LOG_MODE", "async").lower()
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+TEXT_FORMAT = "%(asctime)s - %(trace_id)s - %(lineno)d - %(name)s - %(levelname)s - %(message)s"
+
 # Create a `logs/` directory at the project root and place the log file inside it
 logs_dir = os.path.join(os.getcwd(), "logs")
-os.makedirs(logs_dir, exist_ok=True)  # ensure the logs directory exists
 
-LOG_FILE_PATH = os.path.join(logs_dir, LOG_FILE)
+# Trace ID of the request being handled; set by the API and tile server middleware
+trace_id_var: ContextVar[str] = ContextVar("trace_id", default="-")
+
+
+def set_trace_id(trace_id: str | None = None) -> str:
+    """Bind a trace ID (incoming X-Request-ID or a fresh one) to the current request context."""
+    trace_id = trace_id or uuid.uuid4().hex[:16]
+    trace_id_var.set(trace_id)
+    return trace_id
+
+
+class TraceIdFilter(logging.Filter):
+    """Stamp every record with the current trace ID so log lines can be joined per request."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.trace_id = trace_id_var.get()
+        return True
+
+
+class DebugSamplingFilter(logging.Filter):
+    """Keep only a fraction of DEBUG records; INFO and above always pass."""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG:
+            return True
+        return random.random() < self.rate
+
+
+# Attributes every LogRecord has; anything else was passed through `extra=` and is kept as a field
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "trace_id"}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, with `extra=` fields merged in."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "trace_id": getattr(record, "trace_id", "-"),
+            "module": record.module,
+            "lineno": record.lineno,
+            "process": record.process,
+            "thread": record.threadName,
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class StructuredQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that keeps the exception separate from the message for the JSON formatter."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Resolve everything that cannot cross the queue (args, traceback objects) in the caller thread
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.exc_info = None
+        return record
+
+
+def _build_output_handler() -> logging.Handler:
+    log_file = os.environ.get("LOG_FILE", os.path.join(logs_dir, "foursquare_ai.{pid}.log")).replace("{pid}", str(os.getpid()))
+    if log_file == "-":
+        handler = logging.StreamHandler(sys.stderr)
+    else:
+        os.makedirs(os.path.dirname(log_file) or ".", exist_ok=True)
+        backup_count = int(os.environ.get("LOG_BACKUP_COUNT", "5"))
+        if os.environ.get("LOG_ROTATE", "size").lower() == "time":
+            handler = logging.handlers.TimedRotatingFileHandler(
+                log_file, when=os.environ.get("LOG_ROTATE_WHEN", "midnight"),
+                backupCount=backup_count, encoding="utf-8", utc=True,
+            )
+        else:
+            handler = logging.handlers.RotatingFileHandler(
+                log_file, maxBytes=int(os.environ.get("LOG_MAX_BYTES", str(50 * 1024 * 1024))),
+                backupCount=backup_count, encoding="utf-8",
+            )
+    if os.environ.get("LOG_FORMAT", "json").lower() == "text":
+        handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+    else:
+        handler.setFormatter(JsonFormatter())
+    return handler
+
+
+def _configure_async_logging() -> logging.handlers.QueueListener:
+    root = logging.getLogger()
+    root.setLevel(LOG_LEVEL)
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = StructuredQueueHandler(log_queue)
+    # Filters run in the calling thread: the trace ID is read from the request context
+    # and sampled-out DEBUG records are dropped before they are ever queued
+    queue_handler.addFilter(TraceIdFilter())
+    queue_handler.addFilter(DebugSamplingFilter(float(os.environ.get("LOG_DEBUG_SAMPLE_RATE", "0.01"))))
+    queue_handler.fsq_logging = True
+    root.addHandler(queue_handler)
+
+    listener = logging.handlers.QueueListener(log_queue, _build_output_handler(), respect_handler_level=True)
+    listener.start()
+    # Flush whatever is still queued when the process exits
+    atexit.register(listener.stop)
+    return listener
+
+
+def _configure_sync_logging():
+    os.makedirs(logs_dir, exist_ok=True)  # ensure the logs directory exists
+    log_file_path = os.path.join(logs_dir, f"{datetime.now().strftime('%m_%d_%Y_%H_%M_%S')}.log")
+    logging.basicConfig(filename=log_file_path, format=TEXT_FORMAT, level=LOG_LEVEL)
+    for handler in logging.getLogger().handlers:
+        handler.addFilter(TraceIdFilter())
+        handler.fsq_logging = True
+
+
+def _configured_elsewhere() -> bool:
+    """True when another copy of this module (imported under a different name) already set up the root logger."""
+    return any(getattr(handler, "fsq_logging", False) for handler in logging.getLogger().handlers)
+
 
-logging.basicConfig(
-    filename=LOG_FILE_PATH,
-    format="%(asctime)s - %(lineno)d - %(name)s - %(levelname)s - %(message)s",
-    level=logging.INFO,
-)
+# Configure once per process, even if this module is imported under several names
+LOG_LISTENER = None
+_CONFIGURED = _configured_elsewhere()
+if not _CONFIGURED:
+    if LOG_MODE == "sync":
+        _configure_sync_logging()
+    else:
+        LOG_LISTENER = _configure_async_logging()
+    _CONFIGURED = True
 
 
 """Testing the logger file and CustomException"""
@@ -28,4 +197,4 @@ logging.basicConfig(
 #     except Exception as e:
 #         errorObject = CustomException(e, sys)
 #         logging.info(errorObject.__str__())
-#         raise errorObject
\ No newline at end of file
+#         raise errorObject
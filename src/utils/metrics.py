@@ -0,0 +1,185 @@
+"""
+In-process latency histograms and counters rendered in Prometheus text format.
+
+Both the FastAPI app (src/api/main.py) and the Flask tile server (app.py) expose
+`REGISTRY.render()` on `/metrics`. Metrics are per process; scrape every worker.
+"""
+import threading
+from contextlib import contextmanager
+from time import perf_counter
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+ROW_BUCKETS = (0, 1, 5, 10, 50, 100, 500, 1000, 10_000, 100_000)
+BYTE_BUCKETS = (0, 1024, 4096, 16_384, 65_536, 131_072, 262_144, 524_288, 1_048_576)
+TOKEN_BUCKETS = (100, 250, 500, 1000, 2000, 4000, 8000, 16_000, 32_000)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: tuple, extra: tuple = ()) -> str:
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _format_number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple((name, labels[name]) for name in self.labelnames)
+
+    def render(self) -> list[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    """Monotonically increasing count, optionally split by labels."""
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def render(self) -> list[str]:
+        lines = super().render()
+        with self._lock:
+            for key, value in self._values.items():
+                lines.append(f"{self.name}{_format_labels(key)} {_format_number(value)}")
+        return lines
+
+
+class Histogram(_Metric):
+    """Cumulative-bucket histogram, the Prometheus way of tracking latency percentiles."""
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        self._series: dict[tuple, dict] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["counts"][i] += 1
+                    break
+            series["sum"] += value
+            series["count"] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the wall time of the enclosed block in seconds."""
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(perf_counter() - start, **labels)
+
+    def render(self) -> list[str]:
+        lines = super().render()
+        with self._lock:
+            for key, series in self._series.items():
+                cumulative = 0
+                for bound, count in zip(self.buckets, series["counts"]):
+                    cumulative += count
+                    le = (("le", _format_number(bound)),)
+                    lines.append(f"{self.name}_bucket{_format_labels(key, le)} {cumulative}")
+                lines.append(f"{self.name}_sum{_format_labels(key)} {_format_number(series['sum'])}")
+                lines.append(f"{self.name}_count{_format_labels(key)} {series['count']}")
+        return lines
+
+
+class Registry:
+    """Holds every metric of the process and renders them for a `/metrics` endpoint."""
+
+    def __init__(self):
+        self._metrics: dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+HTTP_REQUEST_SECONDS = REGISTRY.register(Histogram(
+    "fsq_http_request_seconds", "End-to-end HTTP request latency.", ("app", "endpoint")
+))
+LLM_SQL_SECONDS = REGISTRY.register(Histogram(
+    "fsq_llm_sql_generation_seconds", "LLM latency for generating the SQL query."
+))
+LLM_ANSWER_SECONDS = REGISTRY.register(Histogram(
+    "fsq_llm_answer_generation_seconds", "LLM latency for generating the conversational answer."
+))
+DUCKDB_QUERY_SECONDS = REGISTRY.register(Histogram(
+    "fsq_duckdb_query_seconds", "DuckDB execution time.", ("source",)
+))
+QUERY_ROWS = REGISTRY.register(Histogram(
+    "fsq_query_rows", "Rows returned by DuckDB queries.", ("source",), buckets=ROW_BUCKETS
+))
+TILE_RENDER_SECONDS = REGISTRY.register(Histogram(
+    "fsq_tile_render_seconds", "Time to render one vector tile.", ("layer",)
+))
+TILE_BYTES = REGISTRY.register(Histogram(
+    "fsq_tile_bytes", "Size of served vector tiles in bytes.", ("layer",), buckets=BYTE_BUCKETS
+))
+LLM_PROMPT_TOKENS = REGISTRY.register(Histogram(
+    "fsq_llm_prompt_tokens", "Prompt tokens sent to the LLM per call.", ("stage",), buckets=TOKEN_BUCKETS
+))
+LLM_CACHED_PROMPT_TOKENS = REGISTRY.register(Counter(
+    "fsq_llm_cached_prompt_tokens_total", "Prompt tokens served from the provider's prompt cache.", ("stage",)
+))
+BOT_QUESTIONS = REGISTRY.register(Counter(
+    "fsq_bot_questions_total", "Questions answered by the bot, by route (fast_path or llm).", ("route",)
+))
+RESULT_SNAPSHOTS = REGISTRY.register(Counter(
+    "fsq_result_snapshots_total", "Spilled /ask result snapshots by event (created, failed or expired).", ("event",)
+))
+CACHE_REQUESTS = REGISTRY.register(Counter(
+    "fsq_cache_requests_total", "Cache lookups by cache name and result (hit or miss).", ("cache", "result")
+))
+
+
+def record_cache(cache: str, hit: bool):
+    """Count a cache lookup; hit rate = hit / (hit + miss)."""
+    CACHE_REQUESTS.inc(cache=cache, result="hit" if hit else "miss")